@@ -1,35 +1,169 @@
+import asyncio
+import logging
+import os
+from typing import Optional
+from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from decouple import config
+from .metrics import MongoCommandMetrics
+from .utils.cache import AsyncTTLCache
+from .services.menu_snapshot import MenuSnapshotStore
 
-client = AsyncIOMotorClient(config("MONGODB_URL"))
-db = client.restaurant_app
+logger = logging.getLogger(__name__)
 
-async def init_db():
-    # You can add initial setup here if needed
-    pass
+_client: Optional[AsyncIOMotorClient] = None
+_client_pid: Optional[int] = None
 
-async def filter_menu(restaurant_id: str, preferences: dict):
-    query = {"restaurantId": restaurant_id}
+def get_client() -> AsyncIOMotorClient:
+    # Created on first use in each process: a MongoClient must not cross a fork (see app/server.py)
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        _client = AsyncIOMotorClient(config("MONGODB_URL"), event_listeners=[MongoCommandMetrics()])
+        _client_pid = os.getpid()
+    return _client
 
-    if preferences["dietary"]:
-        query["$and"] = [{f"dietaryFlags.is{pref}": True} for pref in preferences["dietary"]]
+def close_client():
+    global _client, _client_pid
+    if _client is not None and _client_pid == os.getpid():
+        _client.close()
+    _client, _client_pid = None, None
 
-    if preferences["cuisine"]:
-        query["cuisine"] = {"$in": preferences["cuisine"]}
+class ProcessDatabase:
+    """The restaurant_app database of the calling process's client; lets modules bind db at import time"""
 
-    if preferences["price_range"]:
-        if preferences["price_range"] == "low":
-            query["price"] = {"$lte": 15}
-        elif preferences["price_range"] == "medium":
-            query["price"] = {"$gt": 15, "$lte": 30}
-        elif preferences["price_range"] == "high":
-            query["price"] = {"$gt": 30}
+    def __getattr__(self, name):
+        return getattr(get_client().restaurant_app, name)
 
-    if preferences["ingredients"]["exclude"]:
-        query["ingredients"] = {"$nin": preferences["ingredients"]["exclude"]}
+    def __getitem__(self, name):
+        return get_client().restaurant_app[name]
 
-    if preferences["spiciness"]:
-        query["spiciness"] = {"$lte": preferences["spiciness"]}
+db = ProcessDatabase()
 
-    menu_items = await db.dishes.find(query).sort("popularity", -1).limit(15).to_list(15)
-    return menu_items
\ No newline at end of file
+restaurant_cache = AsyncTTLCache(
+    max_entries=config("RESTAURANT_CACHE_SIZE", default=1024, cast=int),
+    ttl=config("RESTAURANT_CACHE_TTL", default=60.0, cast=float)
+)
+
+async def get_restaurant(restaurant_id):
+    # Cached documents are shared between requests and must not be mutated
+    return await restaurant_cache.get_or_load(
+        restaurant_id, lambda: db.restaurants.find_one({"_id": restaurant_id})
+    )
+
+def invalidate_restaurant(restaurant_id):
+    # Call after editing a restaurant document so the next read refetches it
+    restaurant_cache.invalidate(restaurant_id)
+
+# DB_PLAN_CHECK: "off", "warn" (log bad plans) or "strict" (refuse to start on bad plans)
+DB_PLAN_CHECK = config("DB_PLAN_CHECK", default="warn")
+
+# Compound indexes for the hot dish queries: equality fields first, then the sort keys.
+# No background option: MongoDB 4.2+ ignores it and builds every index without blocking reads and writes
+DISH_INDEXES = [
+    # The keyset-paginated menu page; its restaurantId prefix also serves load_dishes,
+    # the unsorted whole-menu read that builds the snapshot behind filter_menu and get_menu
+    IndexModel([("restaurantId", ASCENDING), ("cuisine", ASCENDING), ("popularity", DESCENDING), ("_id", DESCENDING)],
+               name="restaurant_cuisine_popularity"),
+    # get_recommendation: cuisine $in is merged in popularity order, price is bounded in the index
+    IndexModel([("cuisine", ASCENDING), ("popularity", DESCENDING), ("price", ASCENDING)],
+               name="cuisine_popularity_price"),
+]
+
+_init_task: Optional[asyncio.Task] = None
+
+def canonical_queries():
+    # Representative shape of every hot query; the ids only need the right type for explain()
+    restaurant_id = ObjectId()
+    return {
+        "get_menu_page": db.dishes.find({"restaurantId": restaurant_id, "cuisine": "italian"})
+            .sort([("popularity", DESCENDING), ("_id", DESCENDING)]).limit(51),
+        "load_dishes": db.dishes.find({"restaurantId": restaurant_id}),
+        "get_recommendation": db.dishes.find({"cuisine": {"$in": ["italian", "indian"]}, "price": {"$lte": 30}})
+            .sort("popularity", DESCENDING).limit(5),
+    }
+
+def plan_stages(plan) -> list:
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(plan_stages(value))
+    return stages
+
+async def verify_query_plans(strict: bool = False) -> dict:
+    """
+    Explain every canonical query and report collection scans and in-memory sorts.
+    Raises RuntimeError in strict mode, logs a warning otherwise.
+    """
+    problems = {}
+    for name, cursor in canonical_queries().items():
+        explain = await cursor.explain()
+        stages = plan_stages(explain["queryPlanner"]["winningPlan"])
+        bad_stages = sorted({stage for stage in stages if stage in ("COLLSCAN", "SORT")})
+        if bad_stages:
+            problems[name] = bad_stages
+
+    for name, bad_stages in problems.items():
+        logger.warning("Query plan for %s uses %s", name, ", ".join(bad_stages))
+    if problems and strict:
+        raise RuntimeError(f"Unindexed query plans: {problems}")
+    return problems
+
+async def init_db(plan_check: str = DB_PLAN_CHECK):
+    try:
+        await db.dishes.create_indexes(DISH_INDEXES)
+        if plan_check != "off":
+            await verify_query_plans(strict=plan_check == "strict")
+    except RuntimeError:
+        raise
+    except Exception as e:
+        if plan_check == "strict":
+            raise
+        logger.error("Database index setup failed: %s", e)
+
+async def start_init_db():
+    """
+    Run init_db without holding up startup: createIndexes returns only once the build is done,
+    which takes minutes on a large dishes collection. Only strict plan checking, which must
+    refuse to start, waits for it. Queries are served (more slowly) while the build runs.
+    """
+    global _init_task
+    if DB_PLAN_CHECK == "strict":
+        await init_db()
+        return
+    _init_task = asyncio.create_task(init_db())
+    _init_task.add_done_callback(_log_init_failure)
+
+def _log_init_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Database index setup failed: %s", task.exception())
+
+def cancel_init_db():
+    # The index build itself carries on in the server; only stop waiting for it
+    global _init_task
+    if _init_task is not None and not _init_task.done():
+        _init_task.cancel()
+    _init_task = None
+
+async def load_dishes(restaurant_id):
+    return await db.dishes.find({"restaurantId": restaurant_id}).to_list(None)
+
+menu_snapshots = MenuSnapshotStore(
+    load_dishes,
+    ttl=config("MENU_SNAPSHOT_TTL", default=300.0, cast=float),
+    max_restaurants=config("MENU_SNAPSHOT_SIZE", default=1024, cast=int)
+)
+
+def invalidate_menu(restaurant_id):
+    # Call after editing a restaurant's dishes so the next filter rebuilds its snapshot
+    menu_snapshots.invalidate(restaurant_id)
+
+async def filter_menu(restaurant_id: str, preferences: dict, limit: int = 15):
+    # Answered from the in-memory snapshot; returned documents are shared and must not be mutated
+    snapshot = await menu_snapshots.get(restaurant_id)
+    return snapshot.filter(preferences, limit=limit)
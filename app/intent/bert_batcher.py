@@ -0,0 +1,155 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+from .bert_client import BERTIntentClient, AsyncBERTIntentClient
+from .intent_mapping import IntentMapping
+
+
+class BatchMetrics:
+    """Rolling statistics about the batches sent to Triton"""
+
+    def __init__(self, window: int = 1000):
+        """
+        Args:
+            window: Number of most recent batches / requests kept for the averages
+        """
+        self.batches = 0
+        self.requests = 0
+        self.batch_sizes = deque(maxlen=window)
+        self.queue_waits_ms = deque(maxlen=window)
+
+    def record(self, batch_size: int, queue_waits_ms: List[float]):
+        """
+        Record one dispatched batch
+        Args:
+            batch_size: Number of texts sent in the batch
+            queue_waits_ms: Time each request spent queued before dispatch
+        """
+        self.batches += 1
+        self.requests += batch_size
+        self.batch_sizes.append(batch_size)
+        self.queue_waits_ms.extend(queue_waits_ms)
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Summarize the recorded batches
+        Returns:
+            Dictionary of batch size and queue wait statistics
+        """
+        sizes = list(self.batch_sizes)
+        waits = sorted(self.queue_waits_ms)
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "avg_batch_size": sum(sizes) / len(sizes) if sizes else 0.0,
+            "max_batch_size": max(sizes) if sizes else 0,
+            "avg_queue_wait_ms": sum(waits) / len(waits) if waits else 0.0,
+            "p95_queue_wait_ms": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+        }
+
+
+class BERTMicroBatcher:
+    """Collects concurrent BERT calls and sends them to Triton as one batch"""
+
+    def __init__(self, client: Union[BERTIntentClient, AsyncBERTIntentClient],
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        """
+        Args:
+            client: BERT client used to run the batched inference, sync or async
+            max_batch_size: Dispatch as soon as this many texts are queued
+            max_wait_ms: Dispatch at the latest this long after the first text was queued
+        """
+        self.client = client
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.metrics = BatchMetrics()
+
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight = set()
+
+    def _submit(self, text: str) -> asyncio.Future:
+        """Queue a text for the next batch; the future resolves to its probability row or None"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return future
+
+    async def get_batch_probabilities(self, texts: List[str]) -> Optional[np.ndarray]:
+        """
+        Queue texts for the next batches and wait for their probabilities.
+        A caller that is cancelled only stops waiting; the batch it joined still runs for the others.
+        Args:
+            texts: List of input texts to classify
+        Returns:
+            Array of shape [len(texts), NUM_INTENTS] on the IntentMapping axis, or None if Triton is unavailable
+        """
+        rows = await asyncio.gather(*[self._submit(text) for text in texts])
+        if any(row is None for row in rows):
+            return None
+        return np.stack(rows)
+
+    async def get_intent(self, text: str) -> Dict[str, float]:
+        """
+        Queue a text for the next batch and wait for its predictions
+        Args:
+            text: Input text to classify
+        Returns:
+            Dictionary mapping intents to confidence scores, empty if Triton is unavailable
+        """
+        row = await self._submit(text)
+        return {} if row is None else IntentMapping.to_dict(row)
+
+    def _flush(self):
+        """Dispatch everything queued so far, in chunks of at most max_batch_size"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        # Callers cancelled while queued (e.g. by a stage deadline) are not sent
+        self._pending = [entry for entry in self._pending if not entry[1].done()]
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future, float]]):
+        """Run one batched inference and hand each caller its own row"""
+        dispatched = time.perf_counter()
+        self.metrics.record(len(batch), [(dispatched - queued) * 1000.0 for _, _, queued in batch])
+
+        texts = [text for text, _, _ in batch]
+        try:
+            if asyncio.iscoroutinefunction(self.client.get_batch_probabilities):
+                probabilities = await self.client.get_batch_probabilities(texts)
+            else:
+                # BERTIntentClient keeps one Triton client per thread, so executor threads never share one
+                loop = asyncio.get_running_loop()
+                probabilities = await loop.run_in_executor(None, self.client.get_batch_probabilities, texts)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for row, (_, future, _) in enumerate(batch):
+            if not future.done():
+                future.set_result(None if probabilities is None else probabilities[row])
+
+    def stats(self) -> Dict[str, float]:
+        return self.metrics.snapshot()
+
+    async def close(self):
+        """Dispatch any queued requests and wait for all in-flight batches"""
+        self._flush()
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
@@ -1,67 +1,94 @@
+import asyncio
+import logging
+import threading
 import numpy as np
-from typing import Dict, List
+from typing import Dict, List, Optional
 import tritonclient.http as httpclient
-from intent_mapping import IntentMapping
+import tritonclient.http.aio as aiohttpclient
+from ..metrics import timed
+from .intent_mapping import IntentMapping
+from .circuit_breaker import CircuitBreaker
+
+logger = logging.getLogger(__name__)
 
 
 class BERTIntentClient:
-    def __init__(self, triton_url: str = "localhost:8000"):
+    def __init__(self, triton_url: str = "localhost:8000", model_version: str = "1"):
         """
         Initialize BERT client with Triton server URL
         Args:
             triton_url: URL of the Triton inference server
+            model_version: Version of the intent_classifier model to query
         """
-        self.client = httpclient.InferenceServerClient(url=triton_url)
-
-    def _prepare_input(self, text: str) -> httpclient.InferInput:
+        self.triton_url = triton_url
+        self.model_version = model_version
+        self._local = threading.local()
+
+    @property
+    def client(self) -> httpclient.InferenceServerClient:
+        """This thread's Triton client; InferenceServerClient must not be shared between threads"""
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = httpclient.InferenceServerClient(url=self.triton_url)
+        return client
+
+    def _prepare_input(self, texts: List[str]) -> httpclient.InferInput:
         """
         Prepare input tensor for BERT model
         Args:
-            text: Input text to prepare
+            texts: Input texts to prepare
         Returns:
-            Triton input tensor
+            Triton input tensor of shape [len(texts), 1]
         """
-        input_data = np.array([[text.encode('utf-8')]], dtype=np.object_)
+        input_data = np.array([[text.encode('utf-8')] for text in texts], dtype=np.object_)
         input_tensor = httpclient.InferInput(
             "text",
-            [1, 1],
+            [len(texts), 1],
             "BYTES"
         )
         input_tensor.set_data_from_numpy(input_data)
         return input_tensor
 
-    def get_intent(self, text: str) -> Dict[str, float]:
+    @timed("triton_inference")
+    def get_batch_probabilities(self, texts: List[str]) -> Optional[np.ndarray]:
         """
-        Get intent predictions from BERT model
+        Get the BERT probability matrix for a batch of texts
         Args:
-            text: Input text to classify
+            texts: List of input texts to classify
         Returns:
-            Dictionary mapping intents to confidence scores
+            Array of shape [len(texts), NUM_INTENTS] on the IntentMapping axis, or None on error
         """
         try:
-            input_tensor = self._prepare_input(text)
+            batch_input_tensor = self._prepare_input(texts)
             output_tensor_1 = httpclient.InferRequestedOutput("intents")
             output_tensor_2 = httpclient.InferRequestedOutput("probabilities")
 
-            response = self.client.infer(
+            batch_response = self.client.infer(
                 "intent_classifier",
-                model_version="1",
-                inputs=[input_tensor],
+                model_version=self.model_version,
+                inputs=[batch_input_tensor],
                 outputs=[output_tensor_1, output_tensor_2]
             )
 
-            probabilities = response.as_numpy("probabilities")[0]
-
-            results = {}
-            for idx, prob in enumerate(probabilities):
-                intent_name = IntentMapping.get_intent_name(idx)
-                results[intent_name] = float(prob)
-
-            return results
+            batch_probabilities = batch_response.as_numpy("probabilities")
+            return batch_probabilities[:, :IntentMapping.NUM_INTENTS].astype(np.float64)
 
         except Exception as e:
-            print(f"Error calling BERT service: {e}")
+            logger.warning("Error calling BERT service: %s", e)
+            return None
+
+    def get_intent(self, text: str) -> Dict[str, float]:
+        """
+        Get intent predictions from BERT model
+        Args:
+            text: Input text to classify
+        Returns:
+            Dictionary mapping intents to confidence scores
+        """
+        probabilities = self.get_batch_probabilities([text])
+        if probabilities is None:
             return {}
+        return IntentMapping.to_dict(probabilities[0])
 
     def get_batch_intents(self, texts: List[str]) -> List[Dict[str, float]]:
         """
@@ -71,37 +98,144 @@ class BERTIntentClient:
         Returns:
             List of dictionaries mapping intents to confidence scores
         """
-        try:
-            batch_data = np.array([[text.encode('utf-8')] for text in texts], dtype=np.object_)
-            batch_input_tensor = httpclient.InferInput(
-                "text",
-                [len(texts), 1],
-                "BYTES"
-            )
-            batch_input_tensor.set_data_from_numpy(batch_data)
+        batch_probabilities = self.get_batch_probabilities(texts)
+        if batch_probabilities is None:
+            return [{} for _ in texts]
+        return [IntentMapping.to_dict(probs) for probs in batch_probabilities]
 
-            output_tensor_1 = httpclient.InferRequestedOutput("intents")
-            output_tensor_2 = httpclient.InferRequestedOutput("probabilities")
 
-            batch_response = self.client.infer(
-                "intent_classifier",
-                model_version="1",
-                inputs=[batch_input_tensor],
-                outputs=[output_tensor_1, output_tensor_2]
+class AsyncBERTIntentClient:
+    def __init__(self, triton_url: str = "localhost:8000", model_version: str = "1", timeout: float = 1.0,
+                 hedge_after: Optional[float] = None, conn_limit: int = 100,
+                 breaker: Optional[CircuitBreaker] = None):
+        """
+        Initialize non-blocking BERT client with Triton server URL
+        Args:
+            triton_url: URL of the Triton inference server
+            model_version: Version of the intent_classifier model to query
+            timeout: Deadline in seconds for a whole call, including hedged retries
+            hedge_after: Send a second request if the first has not answered after this many seconds
+            conn_limit: Size of the shared keep-alive connection pool
+            breaker: Circuit breaker guarding the Triton server
+        """
+        self.triton_url = triton_url
+        self.model_version = model_version
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.conn_limit = conn_limit
+        self.breaker = breaker or CircuitBreaker()
+        self.client = None
+
+    def _get_client(self) -> aiohttpclient.InferenceServerClient:
+        """Create the pooled client lazily so it binds to the running event loop"""
+        if self.client is None:
+            self.client = aiohttpclient.InferenceServerClient(
+                url=self.triton_url,
+                conn_limit=self.conn_limit,
+                conn_timeout=self.timeout
             )
+        return self.client
 
-            batch_probabilities = batch_response.as_numpy("probabilities")
+    async def _infer(self, texts: List[str]) -> np.ndarray:
+        """Run one inference request and return the probability matrix"""
+        input_data = np.array([[text.encode('utf-8')] for text in texts], dtype=np.object_)
+        input_tensor = aiohttpclient.InferInput("text", [len(texts), 1], "BYTES")
+        input_tensor.set_data_from_numpy(input_data)
 
-            results = []
-            for probs in batch_probabilities:
-                intent_dict = {}
-                for idx, prob in enumerate(probs):
-                    intent_name = IntentMapping.get_intent_name(idx)
-                    intent_dict[intent_name] = float(prob)
-                results.append(intent_dict)
+        response = await self._get_client().infer(
+            "intent_classifier",
+            model_version=self.model_version,
+            inputs=[input_tensor],
+            outputs=[aiohttpclient.InferRequestedOutput("intents"),
+                     aiohttpclient.InferRequestedOutput("probabilities")]
+        )
+        return response.as_numpy("probabilities")
 
-            return results
+    async def _infer_hedged(self, texts: List[str]) -> np.ndarray:
+        """
+        Run inference, sending one extra request if the first is slow or fails
+        Returns the first successful response and cancels the other request
+        """
+        if self.hedge_after is None:
+            return await self._infer(texts)
+
+        pending = {asyncio.ensure_future(self._infer(texts))}
+        hedged = False
+        try:
+            while True:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=None if hedged else self.hedge_after,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                if not hedged:
+                    pending.add(asyncio.ensure_future(self._infer(texts)))
+                    hedged = True
+                elif not pending:
+                    raise done.pop().exception()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    @timed("triton_inference")
+    async def get_batch_probabilities(self, texts: List[str]) -> Optional[np.ndarray]:
+        """
+        Get the BERT probability matrix within the deadline, guarded by the circuit breaker
+        Args:
+            texts: List of input texts to classify
+        Returns:
+            Array of shape [len(texts), NUM_INTENTS] on the IntentMapping axis,
+            or None if Triton is unavailable
+        """
+        if not self.breaker.allow_request():
+            return None
 
+        try:
+            probabilities = await asyncio.wait_for(self._infer_hedged(texts), self.timeout)
+        except asyncio.CancelledError:
+            # The caller gave up waiting: count it as a failed call, so a cancelled
+            # half-open probe reopens the circuit instead of leaving it half-open
+            self.breaker.record_failure()
+            raise
         except Exception as e:
-            print(f"Error in batch processing: {e}")
-            return [{} for _ in texts]
\ No newline at end of file
+            self.breaker.record_failure()
+            logger.warning("Error calling BERT service: %r", e)
+            return None
+
+        self.breaker.record_success()
+        return probabilities[:, :IntentMapping.NUM_INTENTS].astype(np.float64)
+
+    async def get_intent(self, text: str) -> Dict[str, float]:
+        """
+        Get intent predictions from BERT model without blocking the event loop
+        Args:
+            text: Input text to classify
+        Returns:
+            Dictionary mapping intents to confidence scores, empty if Triton is unavailable
+        """
+        probabilities = await self.get_batch_probabilities([text])
+        if probabilities is None:
+            return {}
+        return IntentMapping.to_dict(probabilities[0])
+
+    async def get_batch_intents(self, texts: List[str]) -> List[Dict[str, float]]:
+        """
+        Get intent predictions for a batch of texts without blocking the event loop
+        Args:
+            texts: List of input texts to classify
+        Returns:
+            List of dictionaries mapping intents to confidence scores, empty if Triton is unavailable
+        """
+        batch_probabilities = await self.get_batch_probabilities(texts)
+        if batch_probabilities is None:
+            return [{} for _ in texts]
+        return [IntentMapping.to_dict(probs) for probs in batch_probabilities]
+
+    async def close(self):
+        """Close the pooled connections"""
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
\ No newline at end of file
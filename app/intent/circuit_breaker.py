@@ -0,0 +1,60 @@
+import time
+
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated errors and probes again after a cool-down.
+    Every allowed call must be resolved with record_success or record_failure; a probe that is
+    never resolved (e.g. its task was cancelled) is given up after another reset_timeout.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds to stay open before letting a probe request through,
+                and to wait for a probe's result before letting another one through
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started = 0.0
+
+    def allow_request(self) -> bool:
+        """
+        Check whether a call may be attempted
+        Returns:
+            False while the circuit is open, True otherwise
+        """
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            self.probe_started = now
+            return True
+        if self.state == self.HALF_OPEN:
+            # Only the single probe request is allowed through, unless it was lost without a result
+            if now - self.probe_started < self.reset_timeout:
+                return False
+            self.probe_started = now
+            return True
+        return True
+
+    def record_success(self):
+        """Close the circuit after a successful call"""
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        """Count a failed call, opening the circuit when the threshold is reached"""
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
@@ -0,0 +1,127 @@
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Hashable, Optional
+
+from decouple import config
+
+CONTEXT_TURNS = config("INTENT_CONTEXT_TURNS", default=3, cast=int)
+CONTEXT_IDLE_TTL = config("INTENT_CONTEXT_IDLE_TTL", default=1800.0, cast=float)
+CONTEXT_MAX_SESSIONS = config("INTENT_CONTEXT_MAX_SESSIONS", default=50000, cast=int)
+CONTEXT_MAX_BYTES = config("INTENT_CONTEXT_MAX_BYTES", default=32 * 1024 * 1024, cast=int)
+
+# Rough per-session overhead of the dict entry, the deque and the bookkeeping
+SESSION_OVERHEAD = 800
+
+
+class _Session:
+    __slots__ = ("turns", "last_seen", "size")
+
+    def __init__(self, max_turns: int, now: float):
+        self.turns: Deque[frozenset] = deque(maxlen=max_turns)
+        self.last_seen = now
+        self.size = SESSION_OVERHEAD
+
+
+class ConversationContextStore:
+    """Per-session ring buffers of recent turns, bounded by idle TTL, session count and memory"""
+
+    def __init__(self, max_turns: int = CONTEXT_TURNS, idle_ttl: float = CONTEXT_IDLE_TTL,
+                 max_sessions: int = CONTEXT_MAX_SESSIONS, max_bytes: int = CONTEXT_MAX_BYTES):
+        """
+        Args:
+            max_turns: Turns remembered per session; older ones fall out of the ring buffer
+            idle_ttl: Seconds without a new turn after which a session is forgotten
+            max_sessions: Maximum number of sessions, least recently active ones are evicted first
+            max_bytes: Approximate memory cap over all sessions
+        """
+        self.max_turns = max(1, max_turns)
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+
+        # Least recently active first, so expired and evicted sessions are always at the front
+        self._sessions: "OrderedDict[Hashable, _Session]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _turn_size(context_hits: frozenset) -> int:
+        return sys.getsizeof(context_hits) + 8
+
+    def _remove(self, session_id: Hashable):
+        self._bytes -= self._sessions.pop(session_id).size
+
+    def _expire(self, now: float):
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_seen + self.idle_ttl > now:
+                return
+            self._remove(session_id)
+            self.expirations += 1
+
+    def record(self, session_id: Hashable, context_hits: frozenset) -> Optional[frozenset]:
+        """
+        Append a turn to a session and return the turn before it
+        Args:
+            session_id: Conversation the turn belongs to
+            context_hits: Context terms found in the turn
+        Returns:
+            Context terms of the previous turn of the session, None if this is its first (remembered) turn
+        """
+        now = time.monotonic()
+        size = self._turn_size(context_hits)
+        with self._lock:
+            self._expire(now)
+
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _Session(self.max_turns, now)
+                self._bytes += session.size
+            else:
+                self._sessions.move_to_end(session_id)
+                session.last_seen = now
+
+            previous = session.turns[-1] if session.turns else None
+            if len(session.turns) == self.max_turns:
+                dropped = self._turn_size(session.turns[0])
+                session.size -= dropped
+                self._bytes -= dropped
+            session.turns.append(context_hits)
+            session.size += size
+            self._bytes += size
+
+            while len(self._sessions) > self.max_sessions or (self._bytes > self.max_bytes
+                                                              and len(self._sessions) > 1):
+                self._remove(next(iter(self._sessions)))
+                self.evictions += 1
+            return previous
+
+    def forget(self, session_id: Hashable):
+        """Drop a session, e.g. when the guest closed the chat"""
+        with self._lock:
+            if session_id in self._sessions:
+                self._remove(session_id)
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns:
+            Dictionary with the number of sessions, their approximate size and eviction counters
+        """
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
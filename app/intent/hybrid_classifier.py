@@ -1,90 +1,453 @@
-from typing import Dict, List, Tuple, Optional
-from text_preprocessor import TextPreprocessor
-from rule_based_classifier import RuleBasedIntentClassifier
-from bert_client import BERTIntentClient
+import asyncio
+import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Hashable, List, Tuple, Optional, Sequence
+from ..metrics import timed
+from .text_preprocessor import TextPreprocessor
+from .rule_based_classifier import RuleBasedIntentClassifier, RuleAnalysis
+from .bert_client import BERTIntentClient, AsyncBERTIntentClient
+from .bert_batcher import BERTMicroBatcher
+from .intent_mapping import IntentMapping
+from .intent_cache import IntentCache
+from .context_store import ConversationContextStore
+
+logger = logging.getLogger(__name__)
+
+# Weight BERT predictions higher (0.7) than rule-based (0.3)
+RULE_WEIGHT = 0.3
+BERT_WEIGHT = 0.7
+
+
+class CascadeStats:
+    """Counts how often the cascade answered from the rules alone"""
+
+    def __init__(self):
+        self.classified = 0
+        self.skipped = 0
+
+    def record(self, classified: int, skipped: int):
+        """
+        Record cascade decisions
+        Args:
+            classified: Number of texts classified
+            skipped: Number of those answered without calling BERT
+        """
+        self.classified += classified
+        self.skipped += skipped
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Returns:
+            Dictionary with decision counts and the BERT skip rate
+        """
+        return {
+            "classified": self.classified,
+            "skipped": self.skipped,
+            "skip_rate": self.skipped / self.classified if self.classified else 0.0,
+        }
 
 
 class HybridIntentClassifier:
-    def __init__(self, triton_url: str = "localhost:8000"):
+    def __init__(self, triton_url: str = "localhost:8000", bert_timeout: float = 1.0,
+                 hedge_after: Optional[float] = None, cascade: bool = False,
+                 cascade_threshold: float = 0.9, cascade_margin: float = 0.3,
+                 model_version: str = "1", cache: Optional[IntentCache] = None,
+                 context_store: Optional[ConversationContextStore] = None,
+                 batch_size: int = 32, batch_wait_ms: float = 2.0,
+                 negation_parser: Optional[Callable[[List[str]], Awaitable[List[bool]]]] = None):
         """
         Initialize hybrid classifier with all components
         Args:
             triton_url: URL of the Triton inference server
+            bert_timeout: Deadline in seconds for async BERT calls
+            hedge_after: Seconds after which async BERT calls send a hedged second request
+            cascade: Skip BERT when the rule-based scores are decisive
+            cascade_threshold: Minimum top rule score for a decisive result
+            cascade_margin: Minimum lead of the top rule score over the runner-up
+            model_version: Version of the Triton intent_classifier model
+            cache: Result cache keyed on preprocessed text, defaults to a new IntentCache
+            context_store: Per-session conversation context of the rule-based classifier
+            batch_size: Maximum number of texts the async path sends to Triton in one request
+            batch_wait_ms: How long the async path waits for concurrent calls to join a batch
+            negation_parser: Async negation check the async path runs the spaCy parse through
+                (e.g. NLPExecutor.negation); None parses on the rule scoring thread
         """
         self.preprocessor = TextPreprocessor()
-        self.rule_based = RuleBasedIntentClassifier()
-        self.bert_client = BERTIntentClient(triton_url)
+        self.rule_based = RuleBasedIntentClassifier(context_store)
+        self.bert_client = BERTIntentClient(triton_url, model_version=model_version)
+        self.async_bert_client = AsyncBERTIntentClient(triton_url, model_version=model_version,
+                                                       timeout=bert_timeout, hedge_after=hedge_after)
+        # Concurrent async calls (one per chat request) share Triton requests
+        self.bert_batcher = BERTMicroBatcher(self.async_bert_client, max_batch_size=batch_size,
+                                             max_wait_ms=batch_wait_ms)
+
+        self.cascade = cascade
+        self.cascade_threshold = cascade_threshold
+        self.cascade_margin = cascade_margin
+        self.cascade_stats = CascadeStats()
+
+        self.model_version = model_version
+        self.cache = cache if cache is not None else IntentCache()
+
+        # Rule scoring updates the conversation context; one dedicated thread keeps async calls
+        # applying the turns of a session in the order they arrived
+        self._rule_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rule-scoring")
+        self.negation_parser = negation_parser
+
+    def set_model_version(self, model_version: str):
+        """
+        Switch both BERT clients to another Triton model version and drop cached results
+        Args:
+            model_version: New version of the intent_classifier model
+        """
+        self.model_version = model_version
+        self.bert_client.model_version = model_version
+        self.async_bert_client.model_version = model_version
+        self.cache.invalidate()
+
+    @staticmethod
+    def _fuse(rule_scores: np.ndarray, bert_scores: Optional[np.ndarray]) -> np.ndarray:
+        """
+        Blend rule-based and BERT scores, falling back to rule-only scoring when BERT is unavailable
+        Args:
+            rule_scores: Rule-based scores on the IntentMapping axis, one row per text
+            bert_scores: BERT probabilities of the same shape, None if the call failed or the circuit is open
+        Returns:
+            Fused scores of the same shape
+        """
+        if bert_scores is None:
+            return rule_scores
+        return RULE_WEIGHT * rule_scores + BERT_WEIGHT * bert_scores
+
+    def _is_decisive(self, rule_scores: np.ndarray) -> np.ndarray:
+        """
+        Check which rule-based results are confident enough to skip BERT
+        Args:
+            rule_scores: Rule-based scores on the IntentMapping axis, one row per text
+        Returns:
+            Boolean array with one entry per row
+        """
+        top_two = np.sort(rule_scores, axis=-1)[..., -2:]
+        return ((top_two[..., 1] >= self.cascade_threshold)
+                & (top_two[..., 1] - top_two[..., 0] >= self.cascade_margin))
+
+    def _undecided(self, rule_scores: np.ndarray) -> np.ndarray:
+        """
+        Record cascade decisions for a batch and return the rows that still need BERT
+        Args:
+            rule_scores: Rule-based score matrix
+        Returns:
+            Boolean array, True for rows that are not decisive
+        """
+        undecided = ~self._is_decisive(rule_scores)
+        self.cascade_stats.record(len(rule_scores), int(len(rule_scores) - undecided.sum()))
+        return undecided
 
-    def classify(self, text: str) -> Dict[str, float]:
+    @staticmethod
+    def _select_top(scores: np.ndarray, threshold: float) -> List[Optional[Tuple[str, float]]]:
+        """
+        Pick the best intent of every row if it reaches the threshold
+        Args:
+            scores: Score matrix of shape [N, NUM_INTENTS]
+            threshold: Minimum confidence threshold
+        Returns:
+            One (intent, confidence) tuple or None per row
+        """
+        top_indexes = scores.argmax(axis=1)
+        top_scores = scores[np.arange(len(scores)), top_indexes]
+        return [(IntentMapping.INTENT_NAMES[index], float(score)) if score >= threshold else None
+                for index, score in zip(top_indexes.tolist(), top_scores.tolist())]
+
+    def _lookup(self, processed_texts: List[str]) -> Tuple[List[Optional[RuleAnalysis]], List[Optional[np.ndarray]]]:
+        """
+        Fetch cached rule analyses and BERT probabilities
+        Returns:
+            Two lists aligned with processed_texts, None where nothing is cached
+        """
+        entries = [self.cache.get(text, self.model_version) for text in processed_texts]
+        return ([entry[0] if entry else None for entry in entries],
+                [entry[1] if entry else None for entry in entries])
+
+    def _store(self, processed_texts: List[str], analyses: List[RuleAnalysis],
+               bert_rows: List[Optional[np.ndarray]]):
+        """Cache the context-independent results of every text"""
+        for text, analysis, bert_row in zip(processed_texts, analyses, bert_rows):
+            size = 64 * (len(analysis.scores) + len(analysis.context_hits))
+            if bert_row is not None:
+                size += bert_row.nbytes
+            self.cache.put(text, self.model_version, (analysis, bert_row), size)
+
+    @timed("rule_scoring")
+    def _rule_pass(self, processed_texts: List[str], cached_analyses: List[Optional[RuleAnalysis]],
+                   session_ids: Optional[Sequence[Optional[Hashable]]] = None
+                   ) -> Tuple[List[RuleAnalysis], np.ndarray]:
+        """
+        Analyze the texts that are not cached, then apply conversation context to all of them
+        Returns:
+            The analyses and the rule-based score matrix
+        """
+        analyses = self.rule_based.complete_analyses(processed_texts, cached_analyses)
+        return analyses, self.rule_based.classify_matrix(processed_texts, analyses, session_ids)
+
+    async def _arule_pass(self, processed_texts: List[str], cached_analyses: List[Optional[RuleAnalysis]],
+                          session_ids: Optional[Sequence[Optional[Hashable]]] = None
+                          ) -> Tuple[List[RuleAnalysis], np.ndarray]:
+        """
+        Async _rule_pass; with a negation_parser the spaCy parse of the texts that are not cached
+        runs there, and only the context scoring is left for the rule scoring thread
+        Returns:
+            The analyses and the rule-based score matrix
+        """
+        loop = asyncio.get_running_loop()
+        if self.negation_parser is None:
+            return await loop.run_in_executor(self._rule_executor, self._rule_pass, processed_texts,
+                                              cached_analyses, session_ids)
+
+        analyses = list(cached_analyses)
+        rows = [row for row, analysis in enumerate(analyses) if analysis is None]
+        if rows:
+            # Regular expressions over a short message; cheap enough for the event loop
+            fresh, negation_rows = self.rule_based.pattern_analyses([processed_texts[row] for row in rows])
+            negation_texts = [processed_texts[rows[row]] for row in negation_rows]
+            negated = []
+            if negation_texts:
+                try:
+                    negated = await self.negation_parser(negation_texts)
+                except Exception as e:
+                    logger.warning("Negation parser failed, parsing in-process: %s", e)
+                    negated = await loop.run_in_executor(self._rule_executor, self.rule_based.negation_batch,
+                                                         negation_texts)
+            for row, analysis in zip(rows, self.rule_based.apply_negations(fresh, negation_rows, negated)):
+                analyses[row] = analysis
+        return await loop.run_in_executor(self._rule_executor, self._rule_pass, processed_texts, analyses,
+                                          session_ids)
+
+    def _finish(self, processed_texts: List[str], analyses: List[RuleAnalysis], rule_scores: np.ndarray,
+                bert_rows: List[Optional[np.ndarray]], use_bert: np.ndarray) -> np.ndarray:
+        """
+        Cache the results and fuse the rows that use BERT and have its probabilities
+        Returns:
+            Final score matrix
+        """
+        self._store(processed_texts, analyses, bert_rows)
+
+        final_scores = rule_scores.copy()
+        rows = [row for row, bert_row in enumerate(bert_rows) if use_bert[row] and bert_row is not None]
+        if rows:
+            final_scores[rows] = self._fuse(rule_scores[rows], np.stack([bert_rows[row] for row in rows]))
+        return final_scores
+
+    @staticmethod
+    def _fill(bert_rows: List[Optional[np.ndarray]], rows: List[int], fetched: Optional[np.ndarray]):
+        """Put freshly fetched BERT probabilities into their rows"""
+        if fetched is not None:
+            for row, probabilities in zip(rows, fetched):
+                bert_rows[row] = probabilities
+
+    def classify_vector(self, text: str, session_id: Optional[Hashable] = None) -> np.ndarray:
+        """
+        Combine rule-based and BERT predictions on the IntentMapping axis
+        Args:
+            text: Input text to classify
+            session_id: Conversation the text belongs to, None to classify without context
+        Returns:
+            Array of shape [NUM_INTENTS]
+        """
+        return self.batch_classify_matrix([text], [session_id])[0]
+
+    def classify(self, text: str, session_id: Optional[Hashable] = None) -> Dict[str, float]:
         """
         Combine rule-based and BERT predictions for final intent classification
         Args:
             text: Input text to classify
+            session_id: Conversation the text belongs to, None to classify without context
         Returns:
             Dictionary mapping intents to confidence scores
         """
-        processed_text = self.preprocessor.preprocess(text)
-
-        rule_predictions = self.rule_based.classify(processed_text)
-        bert_predictions = self.bert_client.get_intent(processed_text)
+        return IntentMapping.to_dict(self.classify_vector(text, session_id))
 
-        final_predictions = {}
-        all_intents = set(list(rule_predictions.keys()) + list(bert_predictions.keys()))
-        print(text)
-        for intent in all_intents:
-            rule_score = rule_predictions.get(intent, 0.0)
-            bert_score = bert_predictions.get(intent, 0.0)
-            print("Scores for intent " + intent)
-            print("rule : " + rule_score.__str__() + "| bert : " + bert_score.__str__())
-            # Weight BERT predictions higher (0.7) than rule-based (0.3)
-            final_predictions[intent] = (0.3 * rule_score + 0.7 * bert_score)
-
-        return final_predictions
+    async def aclassify(self, text: str, session_id: Optional[Hashable] = None) -> Dict[str, float]:
+        """
+        Same as classify, but rule scoring runs on a worker thread while the BERT call is
+        in flight; the BERT call is bounded by the client deadline and falls back to
+        rule-only scores when Triton is degraded
+        Args:
+            text: Input text to classify
+            session_id: Conversation the text belongs to, None to classify without context
+        Returns:
+            Dictionary mapping intents to confidence scores
+        """
+        return IntentMapping.to_dict((await self.abatch_classify_matrix([text], [session_id]))[0])
 
-    def get_top_intent(self, text: str, threshold: float = 0.3) -> Optional[Tuple[str, float]]:
+    def get_top_intent(self, text: str, threshold: float = 0.3,
+                       session_id: Optional[Hashable] = None) -> Optional[Tuple[str, float]]:
         """
         Get the most likely intent if it exceeds the confidence threshold
         Args:
             text: Input text to classify
             threshold: Minimum confidence threshold
+            session_id: Conversation the text belongs to, None to classify without context
         Returns:
             Tuple of (intent, confidence) or None if below threshold
         """
-        predictions = self.classify(text)
-        if not predictions:
-            return None
+        return self._select_top(self.classify_vector(text, session_id)[np.newaxis, :], threshold)[0]
+
+    def batch_classify_matrix(self, texts: List[str],
+                              session_ids: Optional[Sequence[Optional[Hashable]]] = None) -> np.ndarray:
+        """
+        Process a batch of texts and return the fused score matrix
+        Args:
+            texts: List of input texts to classify
+            session_ids: Conversation of every text, None for no context
+        Returns:
+            Array of shape [len(texts), NUM_INTENTS] on the IntentMapping axis
+        """
+        processed_texts = self.preprocessor.preprocess_batch(texts)
+        cached_analyses, bert_rows = self._lookup(processed_texts)
+
+        analyses, rule_scores = self._rule_pass(processed_texts, cached_analyses, session_ids)
 
-        top_intent = max(predictions.items(), key=lambda x: x[1])
-        if top_intent[1] >= threshold:
-            return top_intent
-        return None
+        # In cascade mode only the rows the rules could not settle use BERT
+        use_bert = self._undecided(rule_scores) if self.cascade else np.ones(len(texts), dtype=bool)
+        rows = [row for row, bert_row in enumerate(bert_rows) if use_bert[row] and bert_row is None]
+        if rows:
+            self._fill(bert_rows, rows,
+                       self.bert_client.get_batch_probabilities([processed_texts[row] for row in rows]))
 
-    def batch_classify(self, texts: List[str]) -> List[Dict[str, float]]:
+        return self._finish(processed_texts, analyses, rule_scores, bert_rows, use_bert)
+
+    async def abatch_classify_matrix(self, texts: List[str],
+                                     session_ids: Optional[Sequence[Optional[Hashable]]] = None) -> np.ndarray:
+        """
+        Async batch_classify_matrix: rule scoring runs on a worker thread while the
+        BERT request is in flight, so latency is about max(rule, BERT) instead of the sum.
+        BERT rows go through the micro-batcher, together with those of concurrent calls.
+        In cascade mode BERT has to wait for the rule scores to know which rows to send.
+        Args:
+            texts: List of input texts to classify
+            session_ids: Conversation of every text, None for no context
+        Returns:
+            Array of shape [len(texts), NUM_INTENTS] on the IntentMapping axis
+        """
+        processed_texts = self.preprocessor.preprocess_batch(texts)
+        cached_analyses, bert_rows = self._lookup(processed_texts)
+
+        rule_call = asyncio.ensure_future(self._arule_pass(processed_texts, cached_analyses, session_ids))
+
+        if not self.cascade:
+            use_bert = np.ones(len(texts), dtype=bool)
+            rows = [row for row, bert_row in enumerate(bert_rows) if bert_row is None]
+            if rows:
+                (analyses, rule_scores), fetched = await asyncio.gather(
+                    rule_call,
+                    self.bert_batcher.get_batch_probabilities([processed_texts[row] for row in rows])
+                )
+                self._fill(bert_rows, rows, fetched)
+            else:
+                analyses, rule_scores = await rule_call
+            return self._finish(processed_texts, analyses, rule_scores, bert_rows, use_bert)
+
+        analyses, rule_scores = await rule_call
+        use_bert = self._undecided(rule_scores)
+        rows = [row for row, bert_row in enumerate(bert_rows) if use_bert[row] and bert_row is None]
+        if rows:
+            self._fill(bert_rows, rows, await self.bert_batcher.get_batch_probabilities(
+                [processed_texts[row] for row in rows]
+            ))
+        return self._finish(processed_texts, analyses, rule_scores, bert_rows, use_bert)
+
+    def rule_only_matrix(self, texts: List[str]) -> np.ndarray:
+        """
+        Score texts with the rules alone, cheaply enough to run on the event loop when a
+        classification missed its deadline. Cached analyses are reused; the others skip the
+        spaCy negation parse, so negated requests score as if they were not negated.
+        No conversation context is read or recorded.
+        Args:
+            texts: List of input texts to classify
+        Returns:
+            Array of shape [len(texts), NUM_INTENTS] on the IntentMapping axis
+        """
+        processed_texts = self.preprocessor.preprocess_batch(texts)
+        analyses, _ = self._lookup(processed_texts)
+        rows = [row for row, analysis in enumerate(analyses) if analysis is None]
+        if rows:
+            fresh, _ = self.rule_based.pattern_analyses([processed_texts[row] for row in rows])
+            for row, analysis in zip(rows, fresh):
+                analyses[row] = analysis
+        return self._fuse(self.rule_based.classify_matrix(processed_texts, analyses), None)
+
+    def batch_classify(self, texts: List[str],
+                       session_ids: Optional[Sequence[Optional[Hashable]]] = None) -> List[Dict[str, float]]:
         """
         Process a batch of texts and return intent classifications
         Args:
             texts: List of input texts to classify
+            session_ids: Conversation of every text, None for no context
+        Returns:
+            List of dictionaries mapping intents to confidence scores
+        """
+        return [IntentMapping.to_dict(row) for row in self.batch_classify_matrix(texts, session_ids)]
+
+    async def abatch_classify(self, texts: List[str],
+                              session_ids: Optional[Sequence[Optional[Hashable]]] = None) -> List[Dict[str, float]]:
+        """
+        Async batch_classify with rule scoring and BERT inference overlapped
+        Args:
+            texts: List of input texts to classify
+            session_ids: Conversation of every text, None for no context
         Returns:
             List of dictionaries mapping intents to confidence scores
         """
-        processed_texts = [self.preprocessor.preprocess(text) for text in texts]
+        return [IntentMapping.to_dict(row) for row in await self.abatch_classify_matrix(texts, session_ids)]
 
-        bert_predictions = self.bert_client.get_batch_intents(processed_texts)
-        rule_predictions = [self.rule_based.classify(text) for text in processed_texts]
+    def batch_top_intents(self, texts: List[str], threshold: float = 0.3,
+                          session_ids: Optional[Sequence[Optional[Hashable]]] = None
+                          ) -> List[Optional[Tuple[str, float]]]:
+        """
+        Get the most likely intent of every text if it exceeds the confidence threshold
+        Args:
+            texts: List of input texts to classify
+            threshold: Minimum confidence threshold
+            session_ids: Conversation of every text, None for no context
+        Returns:
+            One (intent, confidence) tuple or None per text
+        """
+        return self._select_top(self.batch_classify_matrix(texts, session_ids), threshold)
 
-        final_predictions = []
-        for bert_pred, rule_pred in zip(bert_predictions, rule_predictions):
-            combined = {}
-            all_intents = set(list(rule_pred.keys()) + list(bert_pred.keys()))
+    def evaluate_cascade(self, texts: List[str]) -> Dict[str, float]:
+        """
+        Replay a corpus through both paths to measure what the cascade would skip
+        and how often its rule-only answer agrees with the full hybrid answer
+        Args:
+            texts: Replay corpus
+        Returns:
+            Dictionary with skip and agreement rates
+        Raises:
+            RuntimeError: BERT is unavailable, so there is no full hybrid answer to compare with
+        """
+        processed_texts = self.preprocessor.preprocess_batch(texts)
 
-            for intent in all_intents:
-                rule_score = rule_pred.get(intent, 0.0)
-                bert_score = bert_pred.get(intent, 0.0)
-                print("Scores for intent " + intent)
-                print("rule : " + rule_score.__str__() + "| bert : " + bert_score.__str__())
-                print(" ")
-                combined[intent] = (0.3 * rule_score + 0.7 * bert_score)
+        rule_scores = self.rule_based.classify_matrix(processed_texts)
+        bert_scores = self.bert_client.get_batch_probabilities(processed_texts)
+        if bert_scores is None:
+            # _fuse would fall back to the rule scores and every decision would trivially agree
+            raise RuntimeError("BERT is unavailable; the cascade cannot be evaluated without it")
+        full_scores = self._fuse(rule_scores, bert_scores)
 
-            final_predictions.append(combined)
+        decisive = self._is_decisive(rule_scores)
+        skipped = int(decisive.sum())
+        agreed = int((rule_scores[decisive].argmax(axis=1) == full_scores[decisive].argmax(axis=1)).sum())
+        return {
+            "texts": len(texts),
+            "skipped": skipped,
+            "skip_rate": skipped / len(texts) if len(texts) else 0.0,
+            "agreed": agreed,
+            "agreement_rate": agreed / skipped if skipped else 1.0,
+        }
 
-        return final_predictions
\ No newline at end of file
+    async def aclose(self):
+        """Release the rule scoring thread and the pooled Triton connections"""
+        self._rule_executor.shutdown(wait=False)
+        await self.bert_batcher.close()
+        await self.async_bert_client.close()
@@ -0,0 +1,108 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class IntentCache:
+    """Bounded LRU cache with per-entry TTL for intent classification results"""
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 16 * 1024 * 1024, ttl: float = 3600.0):
+        """
+        Args:
+            max_entries: Maximum number of cached texts
+            max_bytes: Approximate memory cap for keys and values
+            ttl: Seconds an entry stays valid after it was stored
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, text: str, model_version: str) -> Optional[Any]:
+        """
+        Look up a cached result
+        Args:
+            text: Normalized (preprocessed) text
+            model_version: Version of the BERT model the result was computed with
+        Returns:
+            Cached value, or None on a miss or an expired entry
+        """
+        key = (model_version, text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, size, value = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, text: str, model_version: str, value: Any, size: int):
+        """
+        Store a result, evicting least recently used entries to stay within bounds
+        Args:
+            text: Normalized (preprocessed) text
+            model_version: Version of the BERT model the result was computed with
+            value: Value to cache
+            size: Approximate size of the value in bytes
+        """
+        key = (model_version, text)
+        size += sys.getsizeof(text)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: Tuple[str, str]):
+        """Drop an entry; the caller holds the lock"""
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def invalidate(self):
+        """Drop every entry, e.g. after the Triton model version changed"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns:
+            Dictionary with size and hit/miss/eviction counters
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
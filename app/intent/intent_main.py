@@ -1,4 +1,4 @@
-from hybrid_classifier import HybridIntentClassifier
+from .hybrid_classifier import HybridIntentClassifier
 
 
 def main():
@@ -22,7 +22,8 @@ def main():
         "What cards do you accept?"
     ]
 
-    batch_results = classifier.batch_classify(texts)
+    # One conversation, so every message is scored in the context of the one before it
+    batch_results = classifier.batch_classify(texts, session_ids=["demo"] * len(texts))
     print("\nBatch Results:")
     for text, predictions in zip(texts, batch_results):
         print(f"\nQuery: {text}")
@@ -15,6 +15,11 @@ class IntentMapping:
         10: "RECOMMENDATION"
     }
 
+    # Fixed intent axis shared by the rule-based scores and BERT probabilities
+    INTENT_NAMES = tuple(name for _, name in sorted(INTENT_MAP.items()))
+    NUM_INTENTS = len(INTENT_NAMES)
+    _INDEX_MAP = {name: index for index, name in INTENT_MAP.items()}
+
     @classmethod
     def get_intent_name(cls, index: int) -> str:
         """
@@ -35,4 +40,15 @@ class IntentMapping:
         Returns:
             Integer index of the intent, or -1 if name not found
         """
-        return {v: k for k, v in cls.INTENT_MAP.items()}.get(name, -1)
\ No newline at end of file
+        return cls._INDEX_MAP.get(name, -1)
+
+    @classmethod
+    def to_dict(cls, scores) -> dict:
+        """
+        Convert a score vector on the intent axis to a dictionary
+        Args:
+            scores: Sequence of NUM_INTENTS scores ordered by intent index
+        Returns:
+            Dictionary mapping intent names to float scores
+        """
+        return dict(zip(cls.INTENT_NAMES, map(float, scores)))
\ No newline at end of file
@@ -1,13 +1,26 @@
 import re
-from typing import Dict, List, Tuple
-from collections import defaultdict
-import spacy
+import numpy as np
+from typing import Dict, Hashable, List, NamedTuple, Optional, Sequence, Tuple
+from ..utils.model_registry import model_registry
+from .context_store import ConversationContextStore
+from .intent_mapping import IntentMapping
+
+
+class RuleAnalysis(NamedTuple):
+    """Context-independent part of a rule-based classification, safe to cache per text"""
+    scores: List[float]
+    negative_matches: List[int]
+    context_hits: frozenset
 
 
 class RuleBasedIntentClassifier:
-    def __init__(self):
+    def __init__(self, context_store: Optional[ConversationContextStore] = None):
+        """
+        Args:
+            context_store: Per-session conversation context, defaults to a new ConversationContextStore
+        """
         # Load spaCy model for linguistic analysis
-        self.nlp = spacy.load('en_core_web_sm')
+        self.nlp = model_registry.spacy()
 
         # Define weighted patterns with scores and contextual variations
         self.intent_patterns = {
@@ -93,8 +106,41 @@ class RuleBasedIntentClassifier:
             }
         }
 
-        # Initialize contextual memory
-        self.conversation_context = []
+        # Contextual memory, kept per conversation so sessions never boost each other's scores
+        self.context_store = context_store if context_store is not None else ConversationContextStore()
+
+        # Compile every pattern once so classify() never goes through the re cache
+        self._compiled_intents = self._compile_patterns(self.intent_patterns)
+        self._pattern_scanner = re.compile('|'.join(
+            f'(?:{pattern})'
+            for patterns in self.intent_patterns.values()
+            for key in ('high_confidence', 'medium_confidence')
+            for pattern, _ in patterns[key]
+        ))
+        self._intent_names = [intent for intent, *_ in self._compiled_intents]
+        self._intent_axis = np.array([IntentMapping.get_intent_index(intent) for intent in self._intent_names])
+        self._all_context_terms = tuple(dict.fromkeys(
+            term for patterns in self.intent_patterns.values() for term in patterns['context_terms']
+        ))
+
+    @staticmethod
+    def _compile_patterns(intent_patterns: Dict) -> List[Tuple]:
+        """
+        Compile the intent pattern table into a flat, ordered list
+        Args:
+            intent_patterns: Pattern table in the format of self.intent_patterns
+        Returns:
+            List of (intent, weighted patterns, context terms, uses time, negative patterns)
+        """
+        compiled = []
+        for intent, patterns in intent_patterns.items():
+            weighted = [(re.compile(pattern), weight)
+                        for key in ('high_confidence', 'medium_confidence')
+                        for pattern, weight in patterns[key]]
+            negative = [re.compile(pattern) for pattern in patterns.get('negative_patterns', [])]
+            compiled.append((intent, weighted, tuple(patterns['context_terms']),
+                             'time_patterns' in patterns, negative))
+        return compiled
 
     def _check_time_relevance(self, text: str) -> float:
         """Check for time-related patterns and return relevance score"""
@@ -110,83 +156,218 @@ class RuleBasedIntentClassifier:
                 score += 0.2
         return min(score, 0.5)
 
-    def _check_negation(self, text: str) -> bool:
-        """Check for negation in the text using spaCy"""
-        doc = self.nlp(text)
+    @staticmethod
+    def has_negation(doc) -> bool:
+        """Check a parsed spaCy doc for a negation dependency"""
         for token in doc:
             if token.dep_ == 'neg':
                 return True
         return False
 
-    def _get_context_score(self, text: str, context_terms: List[str]) -> float:
+    def _check_negation(self, text: str) -> bool:
+        """Check for negation in the text using spaCy"""
+        return self.has_negation(self.nlp(text))
+
+    def _get_context_hits(self, lowered: str) -> frozenset:
+        """Return the set of context terms (across all intents) found in lowercased text"""
+        return frozenset(term for term in self._all_context_terms if term in lowered)
+
+    @staticmethod
+    def _get_context_score(context_hits: frozenset, context_terms: Tuple[str, ...]) -> float:
         """Calculate context relevance score"""
-        words = set(text.lower().split())
-        context_matches = sum(term in text.lower() for term in context_terms)
+        context_matches = sum(term in context_hits for term in context_terms)
         return min(context_matches * 0.15, 0.5)
 
-    def classify(self, text: str) -> Dict[str, float]:
+    def classify(self, text: str, negated: Optional[bool] = None,
+                 session_id: Optional[Hashable] = None) -> Dict[str, float]:
         """
-        Enhanced classification with contextual awareness and sophisticated pattern matching
+        Enhanced classification with contextual awareness and sophisticated pattern matching;
+        pass negated when the negation check already ran (see analyze), and session_id to
+        use and extend the context of that conversation
         """
-        results = defaultdict(float)
-        doc = self.nlp(text.lower())
+        return dict(zip(self._intent_names, self._score(text, negated, session_id)))
 
-        # Store conversation context
-        self.conversation_context.append(text)
-        if len(self.conversation_context) > 3:
-            self.conversation_context.pop(0)
+    def classify_vector(self, text: str, negated: Optional[bool] = None,
+                        session_id: Optional[Hashable] = None) -> np.ndarray:
+        """
+        Classify text and return scores on the IntentMapping axis
+        Args:
+            text: Input text to classify
+            negated: Precomputed negation check, parsed here when None
+            session_id: Conversation the text belongs to, None to classify without context
+        Returns:
+            Array of shape [NUM_INTENTS], zero for intents without rules
+        """
+        scores = np.zeros(IntentMapping.NUM_INTENTS)
+        scores[self._intent_axis] = self._score(text, negated, session_id)
+        return scores
+
+    def classify_matrix(self, texts: List[str], analyses: Optional[List[RuleAnalysis]] = None,
+                        session_ids: Optional[Sequence[Optional[Hashable]]] = None) -> np.ndarray:
+        """
+        Classify a batch of texts in order
+        Args:
+            texts: List of input texts to classify
+            analyses: Precomputed (e.g. cached) analyses, None entries are computed here
+            session_ids: Conversation of every text, None (or a None entry) for no context
+        Returns:
+            Array of shape [len(texts), NUM_INTENTS]
+        """
+        analyses = self.complete_analyses(texts, analyses)
+        if session_ids is None:
+            session_ids = [None] * len(texts)
+        scores = np.zeros((len(texts), IntentMapping.NUM_INTENTS))
+        for row, (text, analysis, session_id) in enumerate(zip(texts, analyses, session_ids)):
+            scores[row, self._intent_axis] = self.score_analysis(text, analysis, session_id)
+        return scores
+
+    def complete_analyses(self, texts: List[str],
+                          analyses: Optional[List[Optional[RuleAnalysis]]] = None) -> List[RuleAnalysis]:
+        """Fill the missing (None) entries of analyses with one analyze_batch call"""
+        if analyses is None:
+            return self.analyze_batch(texts)
+        rows = [row for row, analysis in enumerate(analyses) if analysis is None]
+        analyses = list(analyses)
+        if not rows:
+            return analyses
+        for row, analysis in zip(rows, self.analyze_batch([texts[row] for row in rows])):
+            analyses[row] = analysis
+        return analyses
 
-        # Check each intent
-        for intent, patterns in self.intent_patterns.items():
+    def _score(self, text: str, negated: Optional[bool] = None,
+               session_id: Optional[Hashable] = None) -> List[float]:
+        """Score every intent, in the order of self._compiled_intents"""
+        return self.score_analysis(text, self.analyze(text, negated), session_id)
+
+    def _base_analysis(self, text: str) -> RuleAnalysis:
+        """Pattern, context-term and time checks of analyze, before negation"""
+        lowered = text.lower()
+        context_hits = self._get_context_hits(lowered)
+        time_score = self._check_time_relevance(text)
+
+        # Score patterns, context and time for every intent in one pass
+        has_pattern_match = self._pattern_scanner.search(lowered) is not None
+        base_scores = []
+        for intent, weighted, context_terms, uses_time, negative in self._compiled_intents:
             score = 0.0
+            if has_pattern_match:
+                for pattern, weight in weighted:
+                    matches = len(pattern.findall(lowered))
+                    if matches > 0:
+                        score = max(score, weight * matches)
 
-            # Check high confidence patterns
-            for pattern, weight in patterns['high_confidence']:
-                matches = len(re.findall(pattern, text.lower()))
-                if matches > 0:
-                    score = max(score, weight * matches)
-
-            # Check medium confidence patterns
-            for pattern, weight in patterns['medium_confidence']:
-                matches = len(re.findall(pattern, text.lower()))
-                if matches > 0:
-                    score = max(score, weight * matches)
-
-            # Add context score
-            context_score = self._get_context_score(text, patterns['context_terms'])
-            score += context_score
-
-            # Check time relevance if applicable
-            if 'time_patterns' in patterns:
-                time_score = self._check_time_relevance(text)
+            score += self._get_context_score(context_hits, context_terms)
+            if uses_time:
                 score += time_score
+            base_scores.append(score)
+
+        negative_matches = [sum(1 for neg_pattern in negative if neg_pattern.search(lowered))
+                            for *_, negative in self._compiled_intents]
+        return RuleAnalysis(base_scores, negative_matches, context_hits)
+
+    @staticmethod
+    def _apply_negation(analysis: RuleAnalysis) -> RuleAnalysis:
+        # Reduce score if negation is present
+        return analysis._replace(scores=[score * 0.3 for score in analysis.scores])
+
+    def analyze(self, text: str, negated: Optional[bool] = None) -> RuleAnalysis:
+        """
+        Run the pattern, context-term, time and negation checks, which depend only on the text
+        Args:
+            text: Input text to analyze
+            negated: Result of the negation check if it was already computed elsewhere
+                (e.g. by the NLP executor); parsed here when None
+        Returns:
+            RuleAnalysis to be turned into scores by score_analysis
+        """
+        analysis = self._base_analysis(text)
+        # Negation only scales non-zero scores, so skip the parse when nothing scored
+        if any(analysis.scores) and (negated if negated is not None else self._check_negation(text)):
+            analysis = self._apply_negation(analysis)
+        return analysis
+
+    def analyze_batch(self, texts: List[str]) -> List[RuleAnalysis]:
+        """
+        analyze for many texts; the ones that need the negation check are parsed together with nlp.pipe
+        Args:
+            texts: Input texts to analyze
+        Returns:
+            One RuleAnalysis per text
+        """
+        analyses, rows = self.pattern_analyses(texts)
+        return self.apply_negations(analyses, rows, self.negation_batch([texts[row] for row in rows]))
 
-            # Check negation
-            if self._check_negation(text):
-                score *= 0.3  # Reduce score if negation is present
+    def pattern_analyses(self, texts: List[str]) -> Tuple[List[RuleAnalysis], List[int]]:
+        """
+        First half of analyze_batch: the pattern, context-term and time checks, without any parsing
+        Args:
+            texts: Input texts to analyze
+        Returns:
+            The analyses before negation, and the rows that still need the negation check
+        """
+        analyses = [self._base_analysis(text) for text in texts]
+        # Negation only scales non-zero scores, so only those rows are parsed
+        return analyses, [row for row, analysis in enumerate(analyses) if any(analysis.scores)]
+
+    def negation_batch(self, texts: List[str]) -> List[bool]:
+        """Negation check of several texts, parsed together with nlp.pipe"""
+        return [self.has_negation(doc) for doc in self.nlp.pipe(texts)]
+
+    def apply_negations(self, analyses: List[RuleAnalysis], rows: List[int],
+                        negated: Sequence[bool]) -> List[RuleAnalysis]:
+        """
+        Second half of analyze_batch
+        Args:
+            analyses: Result of pattern_analyses
+            rows: Rows returned by pattern_analyses
+            negated: Negation check of the text of every row, wherever it was parsed
+        Returns:
+            The finished analyses
+        """
+        analyses = list(analyses)
+        for row, row_negated in zip(rows, negated):
+            if row_negated:
+                analyses[row] = self._apply_negation(analyses[row])
+        return analyses
+
+    def score_analysis(self, text: str, analysis: RuleAnalysis,
+                       session_id: Optional[Hashable] = None) -> List[float]:
+        """
+        Apply the conversation context to an analysis and record the text in it
+        Args:
+            text: The analyzed text
+            analysis: Result of analyze(text)
+            session_id: Conversation the text belongs to; without one no context is used or stored
+        Returns:
+            Scores for every intent, in the order of self._compiled_intents
+        """
+        # Store conversation context
+        prev_hits = None
+        if session_id is not None:
+            prev_hits = self.context_store.record(session_id, analysis.context_hits)
 
+        results = []
+        for score, negative_matches, (intent, weighted, context_terms, uses_time, negative) in zip(
+                analysis.scores, analysis.negative_matches, self._compiled_intents):
             # Consider conversation context
-            if len(self.conversation_context) > 1:
-                prev_text = self.conversation_context[-2]
-                context_score = self._get_context_score(prev_text, patterns['context_terms'])
-                score += context_score * 0.2  # Add reduced weight for previous context
+            if prev_hits is not None:
+                score += self._get_context_score(prev_hits, context_terms) * 0.2
 
             # Check for negative patterns if they exist
-            if 'negative_patterns' in patterns:
-                for neg_pattern in patterns['negative_patterns']:
-                    if re.search(neg_pattern, text.lower()):
-                        score *= 0.2  # Significantly reduce score if negative pattern matches
+            for _ in range(negative_matches):
+                score *= 0.2  # Significantly reduce score if negative pattern matches
 
             # Normalize final score
-            results[intent] = min(score, 1.0)
+            results.append(min(score, 1.0))
 
-        return dict(results)
+        return results
 
-    def get_top_intents(self, text: str, threshold: float = 0.3) -> List[Tuple[str, float]]:
+    def get_top_intents(self, text: str, threshold: float = 0.3,
+                        session_id: Optional[Hashable] = None) -> List[Tuple[str, float]]:
         """
         Get top intents above threshold, sorted by confidence
         """
-        predictions = self.classify(text)
+        predictions = self.classify(text, session_id=session_id)
         top_intents = [(intent, score) for intent, score in predictions.items()
                        if score >= threshold]
         return sorted(top_intents, key=lambda x: x[1], reverse=True)
\ No newline at end of file
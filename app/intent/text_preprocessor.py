@@ -1,40 +1,112 @@
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
+import functools
 import re
+from typing import List, Tuple
+from decouple import config
+from ..metrics import timed
+from ..utils.model_registry import model_registry
 
+# "fast" tokenizes with str.split, "nltk" with word_tokenize; both give the same tokens
+PREPROCESS_MODE = config("PREPROCESS_MODE", default="fast")
+LEMMA_CACHE_SIZE = config("LEMMA_CACHE_SIZE", default=50000, cast=int)
 
-class TextPreprocessor:
-    def __init__(self):
-        # Download required NLTK data
-        nltk.download('punkt')
-        nltk.download('stopwords')
-        nltk.download('wordnet')
-        nltk.download('averaged_perceptron_tagger')
+# The only Treebank word_tokenize splits that still apply once everything but letters is removed
+TREEBANK_CONTRACTIONS = {
+    "cannot": ("can", "not"),
+    "gimme": ("gim", "me"),
+    "gonna": ("gon", "na"),
+    "gotta": ("got", "ta"),
+    "lemme": ("lem", "me"),
+    "wanna": ("wan", "na"),
+}
 
-        self.lemmatizer = WordNetLemmatizer()
-        self.stop_words = set(stopwords.words('english'))
+NON_LETTERS = re.compile(r'[^a-zA-Z\s]')
 
-    def preprocess(self, text: str) -> str:
+
+class TextPreprocessor:
+    def __init__(self, mode: str = PREPROCESS_MODE, lemma_cache_size: int = LEMMA_CACHE_SIZE):
         """
-        Preprocess the input text by cleaning, tokenizing, and lemmatizing
         Args:
-            text: Input text to preprocess
-        Returns:
-            Preprocessed text string
+            mode: "fast" (split-based tokenizer) or "nltk" (word_tokenize)
+            lemma_cache_size: Number of distinct tokens whose lemma is memoized
         """
+        if mode not in ("fast", "nltk"):
+            raise ValueError(f"Unknown preprocessing mode: {mode}")
+        self.mode = mode
+        if mode == "nltk":
+            # Fail now rather than on the first message when the Punkt data is missing
+            model_registry.nltk_tokenizer()
+
+        # NLTK data is read from the local NLTK_DATA directory, shared with the other preprocessors
+        resources = model_registry.nltk()
+        self.lemmatizer = resources["lemmatizer"]
+        self.stop_words = resources["stop_words"]
+        # The vocabulary of restaurant chat is small, so nearly every lemma is a cache hit
+        self._lemmatize = functools.lru_cache(maxsize=lemma_cache_size)(self.lemmatizer.lemmatize)
+
+    @staticmethod
+    def _split_tokens(text: str) -> List[str]:
+        """word_tokenize equivalent for lowercase, letters-only text"""
+        tokens = []
+        for token in text.split():
+            parts = TREEBANK_CONTRACTIONS.get(token)
+            if parts:
+                tokens.extend(parts)
+            else:
+                tokens.append(token)
+        return tokens
+
+    def _preprocess(self, text: str, mode: str) -> str:
         # Convert to lowercase
         text = text.lower()
 
         # Remove special characters and numbers
-        text = re.sub(r'[^a-zA-Z\s]', '', text)
+        text = NON_LETTERS.sub('', text)
 
         # Tokenize
-        tokens = word_tokenize(text)
+        tokens = self._split_tokens(text) if mode == "fast" else model_registry.nltk_tokenizer()(text)
 
         # Remove stopwords and lemmatize
-        tokens = [self.lemmatizer.lemmatize(token) for token in tokens
+        tokens = [self._lemmatize(token) for token in tokens
                   if token not in self.stop_words]
 
-        return ' '.join(tokens)
\ No newline at end of file
+        return ' '.join(tokens)
+
+    @timed("preprocess")
+    def preprocess(self, text: str) -> str:
+        """
+        Preprocess the input text by cleaning, tokenizing, and lemmatizing
+        Args:
+            text: Input text to preprocess
+        Returns:
+            Preprocessed text string
+        """
+        return self._preprocess(text, self.mode)
+
+    @timed("preprocess")
+    def preprocess_batch(self, texts: List[str]) -> List[str]:
+        """
+        Preprocess several texts
+        Args:
+            texts: Input texts to preprocess
+        Returns:
+            Preprocessed text strings, in order
+        """
+        return [self._preprocess(text, self.mode) for text in texts]
+
+    def compare_with_nltk(self, texts: List[str]) -> List[Tuple[str, str, str]]:
+        """
+        Check the fast mode against the word_tokenize pipeline
+        Args:
+            texts: Corpus to compare on
+        Returns:
+            (text, fast result, nltk result) for every text where the two differ
+        """
+        mismatches = []
+        for text in texts:
+            fast, reference = self._preprocess(text, "fast"), self._preprocess(text, "nltk")
+            if fast != reference:
+                mismatches.append((text, fast, reference))
+        return mismatches
+
+    def lemma_cache_info(self):
+        return self._lemmatize.cache_info()
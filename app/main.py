@@ -1,32 +1,33 @@
-from fastapi import FastAPI ,Request
-from fastapi.middleware.cors import CORSMiddleware
-from .routers import menu, chat, recommendation
-from .database import init_db
+import asyncio
 import logging
-import sys
+from decouple import config
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from .routers import menu, chat, recommendation, metrics, health
+from .database import cancel_init_db, close_client, start_init_db, restaurant_cache, menu_snapshots
+from .metrics import MetricsMiddleware, registry
+from .services import ollama_service
+from .services.intent_service import intent_service
+from .services.recommendation_cache import recommendation_cache
+from .utils.logging_utils import setup_logging
+from .utils.model_registry import model_registry
+from .utils.nlp_executor import nlp_executor
 
 app = FastAPI()
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),  # Log to console
-    ]
+setup_logging(
+    level=config("LOG_LEVEL", default="INFO"),
+    access_sample_rate=config("ACCESS_LOG_SAMPLE_RATE", default=0.1, cast=float)
 )
 
-def debug_print(message):
-    print(message, flush=True)
-    sys.stdout.flush()
-
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    debug_print("Root endpoint called")
-    debug_print(f"Received request: {request.method} {request.url}")
-    debug_print(f"Headers: {request.headers}")
-    response = await call_next(request)
-    logging.info(f"Response status: {response.status_code}")
-    return response
+registry.register_stats("cache", "restaurant", restaurant_cache.stats)
+registry.register_stats("cache", "menu_snapshot", menu_snapshots.stats)
+registry.register_stats("cache", "recommendation", recommendation_cache.stats)
+registry.register_stats("cache", "menu_response", menu.response_cache.stats)
+registry.register_stats("cache", "intent", intent_service.intent_cache.stats)
+registry.register_stats("intent_context", "chat", intent_service.stats)
+registry.register_stats("bert_batch", "chat", intent_service.batch_stats)
+registry.register_stats("intent_cascade", "chat", intent_service.cascade_stats)
 
 # Add CORS middleware
 app.add_middleware(
@@ -37,13 +38,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so the latency covers the other middleware too
+app.add_middleware(MetricsMiddleware)
+
+def warm_models():
+    model_registry.warmup()
+    intent_service.start()
+
+def log_warmup_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        logging.getLogger(__name__).error("NLP model warmup failed: %s", future.exception())
+
 @app.on_event("startup")
 async def startup_event():
-    await init_db()
+    await start_init_db()
+    await ollama_service.start_client()
+    # Models load off the event loop; /ready answers 503 until the warmup inference is done
+    warmup = asyncio.get_running_loop().run_in_executor(None, warm_models)
+    warmup.add_done_callback(log_warmup_failure)
+    nlp_executor.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await ollama_service.close_client()
+    await nlp_executor.close()
+    await intent_service.close()
+    cancel_init_db()
+    close_client()
 
 app.include_router(menu.router)
 app.include_router(chat.router)
 app.include_router(recommendation.router)
+app.include_router(metrics.router)
+app.include_router(health.router)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,213 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from pymongo import monitoring
+
+# Seconds; covers sub-millisecond cache hits up to multi-second LLM generations
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+access_logger = logging.getLogger("app.access")
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Thread-safe Prometheus histogram with a fixed label set"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labelvalues, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Histograms plus gauge collectors rendered together in the Prometheus text format"""
+
+    def __init__(self):
+        self._histograms: List[Histogram] = []
+        self._collectors: List[Tuple[str, str, str, Callable[[], Dict[str, float]]]] = []
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        histogram = Histogram(name, documentation, labelnames, buckets)
+        self._histograms.append(histogram)
+        return histogram
+
+    def register_stats(self, prefix: str, label: str, stats: Callable[[], Dict[str, float]]):
+        """
+        Export a stats() dictionary as gauges
+        Args:
+            prefix: Metric name prefix, e.g. "cache" exports cache_hits, cache_misses, ...
+            label: Value of the "name" label telling the sources apart
+            stats: Callable returning the current numeric values
+        """
+        self._collectors.append((prefix, "name", label, stats))
+
+    def render(self) -> str:
+        lines = []
+        for histogram in self._histograms:
+            lines.extend(histogram.render())
+
+        gauges: Dict[str, List[str]] = {}
+        for prefix, label_name, label, stats in self._collectors:
+            for key, value in stats().items():
+                if isinstance(value, (int, float)):
+                    gauges.setdefault(f"{prefix}_{key}", []).append(
+                        f'{prefix}_{key}{{{label_name}="{_escape(label)}"}} {float(value)}')
+        for name, samples in sorted(gauges.items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+REQUEST_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "Time to serve an HTTP request, until the last body chunk",
+    ["method", "route", "status"]
+)
+STAGE_LATENCY = registry.histogram(
+    "stage_duration_seconds", "Time spent in one processing stage of a request", ["stage"]
+)
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_LATENCY.observe(seconds, stage)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Time the enclosed block as one observation of the given stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - start, stage)
+
+
+def timed(stage: str):
+    """Decorator timing every call of a sync or async function as the given stage"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    STAGE_LATENCY.observe(time.perf_counter() - start, stage)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                STAGE_LATENCY.observe(time.perf_counter() - start, stage)
+        return wrapper
+    return decorator
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """
+    Records the driver-measured duration of every Mongo command as a mongo_<command> stage;
+    single-document finds are reported as mongo_find_one
+    """
+
+    def __init__(self):
+        self._find_one_requests = set()
+
+    def started(self, event):
+        command = event.command
+        if event.command_name == "find" and command.get("limit") == 1 and command.get("singleBatch"):
+            self._find_one_requests.add(event.request_id)
+
+    def _stage(self, event) -> str:
+        if event.request_id in self._find_one_requests:
+            self._find_one_requests.discard(event.request_id)
+            return "mongo_find_one"
+        return f"mongo_{event.command_name}"
+
+    def succeeded(self, event):
+        STAGE_LATENCY.observe(event.duration_micros / 1e6, self._stage(event))
+
+    def failed(self, event):
+        STAGE_LATENCY.observe(event.duration_micros / 1e6, self._stage(event))
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency and writing a sampled access log.
+    Streaming responses are timed until their last chunk was sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            # The route template keeps the label cardinality bounded
+            route = scope.get("route")
+            REQUEST_LATENCY.observe(elapsed, scope["method"], getattr(route, "path", "unmatched"), str(status))
+            access_logger.log(logging.WARNING if status >= 500 else logging.INFO, "%s %s %d %.1fms",
+                              scope["method"], scope["path"], status, elapsed * 1000.0)
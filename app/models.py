@@ -1,7 +1,10 @@
 from pydantic import BaseModel
+from typing import List, Optional
 
 class ChatMessage(BaseModel):
     message: str
+    # Identifies the conversation, so intent detection can use the guest's previous messages
+    session_id: Optional[str] = None
 
 class MenuItem(BaseModel):
     name: str
@@ -9,6 +12,10 @@ class MenuItem(BaseModel):
     price: float
     image: str
 
+class MenuPage(BaseModel):
+    items: List[MenuItem]
+    next_cursor: Optional[str] = None
+
 class Recommendation(BaseModel):
     name: str
     description: str
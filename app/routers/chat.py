@@ -1,28 +1,30 @@
+import asyncio
+import json
+import logging
+import time
 from bson import ObjectId
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from ..models import ChatMessage
-from ..services.ollama_service import get_ollama_response
-from ..database import db, filter_menu
-from ..utils.nlp_utils import extract_preferences
+from ..services.ollama_service import OllamaError, get_ollama_response, stream_ollama_response
+from ..database import get_restaurant, menu_snapshots
+from ..services.chat_pipeline import (CHAT_LLM_DEADLINE, CHAT_MENU_DEADLINE, CHAT_NLP_DEADLINE,
+                                      CHAT_RESTAURANT_DEADLINE, ChatStages)
+from ..services.intent_service import intent_service
+from ..services.prompt_builder import BuiltPrompt, prompt_builder
+from ..services.recommendation_cache import recommendation_cache
+from ..utils.nlp_executor import nlp_executor
+from ..utils.nlp_utils import preference_extractor
 
-router = APIRouter()
-
-def construct_prompt(user_query: str, menu_items: list, restaurant_info: dict, preferences: dict):
-    prompt = f"""
-    User Query: {user_query}
-    Extracted Preferences: {preferences}
-    Restaurant: {restaurant_info['name']}
-    Cuisine: {', '.join(restaurant_info['cuisine'])}
-
-    Menu Items:
-    {'-' * 40}
-    """
-    for item in menu_items:
-        prompt += f"\n{item['name']} - ${item['price']}\n{item['description']}\n"
+logger = logging.getLogger(__name__)
 
-    prompt += f"\n{'-' * 40}\nBased on the user's query, extracted preferences, and the menu items provided, recommend up to 3 dishes. Explain why each dish is recommended."
+router = APIRouter()
 
-    return prompt
+def construct_prompt(user_query: str, menu_items: list, restaurant_info: dict, preferences: dict,
+                     restaurant_id=None, menu_version: str = None) -> BuiltPrompt:
+    # Token-budgeted prompt; pass the menu snapshot version so rendered menu lines are reused
+    return prompt_builder.build(user_query, menu_items, restaurant_info, preferences,
+                                restaurant_id=restaurant_id, menu_version=menu_version)
 
 def get_mock_recommendation(query: str):
     query = query.lower()
@@ -37,49 +39,124 @@ def get_mock_recommendation(query: str):
     else:
         return "Based on our current popular dishes, I'd recommend trying our Grilled Salmon. It's fresh, healthy, and comes with a delicious lemon butter sauce. If you're in the mood for pasta, our Spaghetti Carbonara is also a fantastic choice!"
 
+def chat_session_id(restaurant_id, chat_message: ChatMessage):
+    # Session ids come from the client, so they are only unique within a restaurant
+    return (str(restaurant_id), chat_message.session_id) if chat_message.session_id else None
+
+async def gather_chat_context(stages: ChatStages, restaurant_id, chat_message: ChatMessage):
+    """
+    Stage 1 of both chat routes: the lookups and the NLP do not depend on each other, so they run
+    concurrently, each within its deadline. Without the spaCy NER the keyword matcher still finds
+    every preference except ingredients.
+    Returns:
+        restaurant, menu snapshot, preferences and intent; None for a lookup that missed its deadline
+    Raises:
+        HTTPException: 404 when the restaurant does not exist
+    """
+    message = chat_message.message
+    restaurant, snapshot, preferences, intent = await asyncio.gather(
+        stages.run("restaurant", get_restaurant(restaurant_id), CHAT_RESTAURANT_DEADLINE),
+        stages.run("menu", menu_snapshots.get(restaurant_id), CHAT_MENU_DEADLINE),
+        stages.run("preferences", nlp_executor.extract_preferences(message), CHAT_NLP_DEADLINE,
+                   fallback=lambda: preference_extractor.extract(message)),
+        stages.run("intent", intent_service.top_intent(message, chat_session_id(restaurant_id, chat_message)),
+                   CHAT_NLP_DEADLINE, fallback=lambda: intent_service.rule_intent(message)),
+    )
+    if restaurant is None and "restaurant" not in stages.fallbacks:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    return restaurant, snapshot, preferences, intent
+
 @router.post("/api/chat/{restaurant_id}")
 async def chat_recommendation(restaurant_id: str, chat_message: ChatMessage):
-    # Extract preferences from the user's message
-    # preferences = extract_preferences(chat_message.message)
-    #
-    # # Fetch restaurant info
-    # restaurant = await db.restaurants.find_one({"_id": restaurant_id})
-    # if not restaurant:
-    #     raise HTTPException(status_code=404, detail="Restaurant not found")
-    #
-    # # Filter menu based on extracted preferences
-    # filtered_menu = await filter_menu(restaurant_id, preferences)
-    #
-    # # Construct prompt for Ollama
-    # prompt = construct_prompt(chat_message.message, filtered_menu, restaurant, preferences)
-    #
-    # # Get recommendation from Ollama
-    # ai_response = await get_ollama_response(prompt)
+    total_start = time.perf_counter()
     restaurant_id = ObjectId(restaurant_id)
-    print(restaurant_id)
-    restaurant = await db.restaurants.find_one({"_id": restaurant_id})
-    print(restaurant)
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found")
+    message = chat_message.message
+    stages = ChatStages()
+
+    restaurant, snapshot, preferences, intent = await gather_chat_context(stages, restaurant_id, chat_message)
+
+    if restaurant is None or snapshot is None:
+        # Nothing to build a prompt from
+        recommendation = get_mock_recommendation(message)
+    else:
+        # Stage 2: prompt and generation, shared with concurrent identical requests and cached.
+        # A generation that misses the deadline keeps running and is cached for the next guest.
+        async def generate():
+            prompt_start = time.perf_counter()
+            prompt = construct_prompt(message, snapshot.filter(preferences), restaurant, preferences,
+                                      restaurant_id=restaurant_id, menu_version=snapshot.version)
+            stages.time("prompt", prompt_start)
+            logger.info("Prompt for %s: %d tokens, %d items, %d dropped",
+                        restaurant_id, prompt.tokens, prompt.items, prompt.dropped)
+            return await get_ollama_response(prompt.text)
+
+        cache_key = recommendation_cache.key(restaurant_id, snapshot.version, preferences, intent)
+        recommendation = await stages.run("llm", recommendation_cache.get_or_generate(cache_key, generate),
+                                          CHAT_LLM_DEADLINE, fallback=lambda: get_mock_recommendation(message))
 
-    # Get mock recommendation
-    recommendation = get_mock_recommendation(chat_message.message)
-    # Format and return the response
     return {
         "text": recommendation,
-        "sender": "bot"
+        "sender": "bot",
+        **stages.report(total_start),
     }
 
+def sse_event(data: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@router.post("/api/chat/{restaurant_id}/stream")
+async def chat_recommendation_stream(restaurant_id: str, chat_message: ChatMessage):
+    # Server-sent events: one "data" event per generated token, then a "done" event
+    restaurant_id = ObjectId(restaurant_id)
+    stages = ChatStages()
+    restaurant, snapshot, preferences, intent = await gather_chat_context(stages, restaurant_id, chat_message)
+
+    if restaurant is None or snapshot is None:
+        # Nothing to build a prompt from; answer in one event, like a cached recommendation
+        cached = get_mock_recommendation(chat_message.message)
+    else:
+        cache_key = recommendation_cache.key(restaurant_id, snapshot.version, preferences, intent)
+        cached = recommendation_cache.get(cache_key)
+    if cached is None:
+        prompt = construct_prompt(chat_message.message, snapshot.filter(preferences), restaurant, preferences,
+                                  restaurant_id=restaurant_id, menu_version=snapshot.version)
+        logger.info("Prompt for %s: %d tokens, %d items, %d dropped",
+                    restaurant_id, prompt.tokens, prompt.items, prompt.dropped)
+
+    async def events():
+        if cached is not None:
+            yield sse_event({"text": cached, "sender": "bot"})
+            yield sse_event({}, event="done")
+            return
+
+        tokens = []
+        try:
+            async for token in stream_ollama_response(prompt.text):
+                tokens.append(token)
+                yield sse_event({"text": token, "sender": "bot"})
+        except OllamaError as e:
+            if tokens:
+                yield sse_event({"detail": str(e)}, event="error")
+                return
+            # Nothing reached the guest yet, so answer with the canned recommendation instead
+            yield sse_event({"text": get_mock_recommendation(chat_message.message), "sender": "bot"})
+        else:
+            if tokens:
+                recommendation_cache.put(cache_key, "".join(tokens))
+        yield sse_event({"prompt_tokens": prompt.tokens}, event="done")
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @router.get("/api/ai-prompts/{restaurant_id}")
 async def get_ai_prompts(restaurant_id: str):
     restaurant_id = ObjectId(restaurant_id)
-    restaurant = await db.restaurants.find_one({"_id": restaurant_id})
+    restaurant = await get_restaurant(restaurant_id)
     if not restaurant:
         raise HTTPException(status_code=404, detail="Restaurant not found")
 
     # Fetch AI prompts from the restaurant document
     ai_prompts = restaurant.get('ai_prompts')
-    print(restaurant)
 
     # If no prompts are found in the restaurant document, use default prompts
     if not ai_prompts:
@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.utils.model_registry import model_registry
+
+router = APIRouter()
+
+
+@router.get("/health", include_in_schema=False)
+async def health():
+    return {"status": "ok"}
+
+
+@router.get("/ready", include_in_schema=False)
+async def ready():
+    # Not ready until the NLP models are loaded and warmed, so no request pays for the cold start
+    status = model_registry.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
@@ -1,35 +1,113 @@
+import base64
+import json
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException
-from typing import List
-from app.models import MenuItem
-from app.database import db
+from bson.errors import InvalidId
+from decouple import config
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from app.models import MenuItem, MenuPage
+from app.database import db, get_restaurant, menu_snapshots
+from app.utils.response_cache import ResponseCache, cached_json_response
 
 router = APIRouter()
 
-@router.get("/api/cuisines/{restaurant_id}")
-async def get_cuisines(restaurant_id: str):
+# Encoded menu and cuisine bodies; tablets poll these, so most requests end in a 304
+response_cache = ResponseCache(max_entries=config("MENU_RESPONSE_CACHE_SIZE", default=4096, cast=int))
+MENU_MAX_ITEMS = 1000
+
+# Only the fields MenuItem needs, plus the keyset sort key
+MENU_ITEM_PROJECTION = {"name": 1, "description": 1, "price": 1, "image": 1, "popularity": 1}
+MENU_PAGE_SORT = [("popularity", -1), ("_id", -1)]
+
+def encode_cursor(item: dict) -> str:
+    raw = json.dumps([item.get("popularity"), str(item["_id"])])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        popularity, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        last_id = ObjectId(last_id)
+    except (ValueError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Items after (popularity, _id) in descending keyset order; missing popularity sorts last
+    same_popularity = {"popularity": popularity, "_id": {"$lt": last_id}}
+    if popularity is None:
+        return same_popularity
+    return {"$or": [{"popularity": {"$lt": popularity}}, {"popularity": None}, same_popularity]}
+
+@router.get("/api/cuisines/{restaurant_id}", response_model=List[str])
+async def get_cuisines(restaurant_id: str, request: Request):
     restaurant_id = ObjectId(restaurant_id)
-    restaurant = await db.restaurants.find_one({"_id": restaurant_id})
+    restaurant = await get_restaurant(restaurant_id)
     if not restaurant:
         raise HTTPException(status_code=404, detail="Restaurant not found")
-    return restaurant.get("cuisine", [])
+    cuisines = restaurant.get("cuisine", [])
+    # The cuisine list is tiny, so it serves as its own version
+    encoded = response_cache.get_or_encode(("cuisines", restaurant_id), repr(cuisines), lambda: cuisines)
+    return cached_json_response(request, encoded)
 
 @router.get("/api/menu/{restaurant_id}/{cuisine}", response_model=List[MenuItem])
-async def get_menu(restaurant_id: str, cuisine: str):
+async def get_menu(restaurant_id: str, cuisine: str, request: Request):
+    # Served from the in-memory menu snapshot, so an unchanged menu is answered without Mongo
     restaurant_id = ObjectId(restaurant_id)
-    menu_items = await db.dishes.find({"restaurantId": restaurant_id, "cuisine": cuisine}).to_list(1000)
-    if not menu_items:
+    snapshot = await menu_snapshots.get(restaurant_id)
+
+    def build():
+        menu_items = snapshot.by_cuisine(cuisine, MENU_MAX_ITEMS)
+        return [jsonable_encoder(MenuItem(**item)) for item in menu_items]
+
+    encoded = response_cache.get_or_encode(("menu", restaurant_id, cuisine), snapshot.version, build)
+    if encoded.body == b"[]":
         raise HTTPException(status_code=404, detail="Menu not found" + restaurant_id.__str__() +cuisine )
-    return [MenuItem(**item) for item in menu_items]
+    return cached_json_response(request, encoded)
+
+@router.get("/api/menu/{restaurant_id}/{cuisine}/page", response_model=MenuPage)
+async def get_menu_page(restaurant_id: str, cuisine: str, cursor: Optional[str] = None,
+                        limit: int = Query(50, ge=1, le=500), stream: bool = False):
+    """
+    Menu items ordered by popularity, paginated with a keyset cursor on (popularity, _id).
+    With stream=true every item after the cursor is sent as NDJSON while Mongo yields it
+    and limit is ignored.
+    """
+    restaurant_id = ObjectId(restaurant_id)
+    query = {"restaurantId": restaurant_id, "cuisine": cuisine}
+    if cursor:
+        query.update(decode_cursor(cursor))
+
+    if stream:
+        items = db.dishes.find(query, MENU_ITEM_PROJECTION).sort(MENU_PAGE_SORT).__aiter__()
+        try:
+            first = await items.__anext__()
+        except StopAsyncIteration:
+            if cursor:
+                return StreamingResponse(iter(()), media_type="application/x-ndjson")
+            raise HTTPException(status_code=404, detail="Menu not found" + restaurant_id.__str__() + cuisine)
+
+        async def ndjson():
+            yield json.dumps(jsonable_encoder(MenuItem(**first))) + "\n"
+            async for item in items:
+                yield json.dumps(jsonable_encoder(MenuItem(**item))) + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    # One extra item tells whether another page exists
+    menu_items = await db.dishes.find(query, MENU_ITEM_PROJECTION).sort(MENU_PAGE_SORT).limit(limit + 1).to_list(limit + 1)
+    if not menu_items and not cursor:
+        raise HTTPException(status_code=404, detail="Menu not found" + restaurant_id.__str__() + cuisine)
+
+    next_cursor = encode_cursor(menu_items[limit - 1]) if len(menu_items) > limit else None
+    return MenuPage(items=[MenuItem(**item) for item in menu_items[:limit]], next_cursor=next_cursor)
 
 @router.get("/api/restaurant/{restaurant_id}")
 async def get_restaurant_info(restaurant_id: str):
     restaurant_id = ObjectId(restaurant_id)
-    print("Restaurant:", restaurant_id)
-    restaurant = await db.restaurants.find_one({"_id": restaurant_id})
+    restaurant = await get_restaurant(restaurant_id)
     if not restaurant:
         raise HTTPException(status_code=404, detail="Restaurant not found" + restaurant_id.__str__())
     return {
         "name": restaurant["name"],
         "logo": restaurant.get("logo", "🍽️")  # Default to a plate emoji if no logo
-    }
\ No newline at end of file
+    }
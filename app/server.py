@@ -0,0 +1,189 @@
+"""
+Production entry point: load the models once, then fork workers that share them copy-on-write.
+
+    python -m app.server
+
+The master imports the app, loads spaCy and the NLTK data, and freezes everything allocated so far
+(gc.freeze), so the workers' garbage collector never writes to those pages. It then binds the
+listening socket and forks WEB_CONCURRENCY workers. Each worker runs uvicorn on the shared socket;
+its event loop, Motor client, Ollama and Triton pools and NLP thread are created after the fork,
+in the app startup hook.
+
+Signals to the master:
+    SIGTERM, SIGINT  graceful shutdown: workers stop accepting, finish their requests and exit
+    SIGHUP           rolling restart: every worker is replaced by a fresh fork of the master
+Workers that die are replaced, with a growing delay when they keep dying right after start.
+The master never reloads code or models; deploy a new version by restarting the container.
+"""
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Dict, List
+
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+HOST = config("HOST", default="0.0.0.0")
+PORT = config("PORT", default=8000, cast=int)
+WEB_CONCURRENCY = config("WEB_CONCURRENCY", default=os.cpu_count() or 1, cast=int)
+BACKLOG = config("BACKLOG", default=2048, cast=int)
+# Seconds a worker gets to finish its requests after SIGTERM before it is killed
+GRACEFUL_TIMEOUT = config("GRACEFUL_TIMEOUT", default=30.0, cast=float)
+# A worker exiting sooner than this after its start counts as a crash, and crashes delay the restart
+MIN_WORKER_LIFETIME = 5.0
+MAX_RESTART_DELAY = 30.0
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+
+def run_worker(app, sock: socket.socket) -> int:
+    """Serve the app on the inherited socket until SIGTERM; returns the exit status"""
+    import uvicorn
+
+    gc.enable()
+    # Own process group: a Ctrl-C in the terminal reaches only the master, which stops the workers once
+    os.setpgid(0, 0)
+    signal.signal(signal.SIGHUP, signal.SIG_DFL)
+    # uvicorn installs its own SIGTERM/SIGINT handlers for the graceful shutdown
+    server = uvicorn.Server(uvicorn.Config(app, log_config=None, access_log=False,
+                                           timeout_graceful_shutdown=GRACEFUL_TIMEOUT))
+    server.run(sockets=[sock])
+    return 0 if server.started else 1
+
+
+class Master:
+    """Forks the workers and keeps their number up until it is told to stop"""
+
+    def __init__(self, app, sock: socket.socket, workers: int):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        # Running workers and when they started
+        self.children: Dict[int, float] = {}
+        # Workers sent SIGTERM and when
+        self.retiring: Dict[int, float] = {}
+        self.signals: List[int] = []
+        self.stopping = False
+        self.crashes = 0
+        self.next_spawn = 0.0
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                status = run_worker(self.app, self.sock)
+            except BaseException:
+                logger.exception("Worker %d failed", os.getpid())
+            finally:
+                # Never return into the master's loop; _exit skips the atexit hooks, so flush the logs first
+                from .utils.logging_utils import stop_logging
+                stop_logging()
+                os._exit(status)
+        self.children[pid] = time.monotonic()
+        logger.info("Started worker %d", pid)
+
+    def retire(self, pid: int):
+        self.children.pop(pid, None)
+        self.retiring[pid] = time.monotonic()
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if self.retiring.pop(pid, None) is not None:
+                logger.info("Worker %d stopped", pid)
+                continue
+            started = self.children.pop(pid, None)
+            if started is None:
+                continue
+            logger.warning("Worker %d exited unexpectedly with status %d", pid, os.waitstatus_to_exitcode(status))
+            self.crashes = self.crashes + 1 if time.monotonic() - started < MIN_WORKER_LIFETIME else 0
+            if self.crashes:
+                self.next_spawn = time.monotonic() + min(MAX_RESTART_DELAY, 0.5 * 2 ** self.crashes)
+
+    def handle_signals(self):
+        while self.signals:
+            signum = self.signals.pop(0)
+            if signum in (signal.SIGTERM, signal.SIGINT) and not self.stopping:
+                logger.info("Shutting down %d workers", len(self.children))
+                self.stopping = True
+                for pid in list(self.children):
+                    self.retire(pid)
+            elif signum == signal.SIGHUP and not self.stopping:
+                logger.info("Rolling restart of %d workers", len(self.children))
+                for pid in list(self.children):
+                    self.spawn()
+                    self.retire(pid)
+
+    def kill_stragglers(self):
+        now = time.monotonic()
+        for pid, since in self.retiring.items():
+            if now - since > GRACEFUL_TIMEOUT + 5:
+                logger.warning("Killing worker %d, it did not stop within %.0fs", pid, GRACEFUL_TIMEOUT)
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def run(self):
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, lambda received, frame: self.signals.append(received))
+
+        while not self.stopping or self.children or self.retiring:
+            self.reap()
+            self.handle_signals()
+            if not self.stopping and len(self.children) < self.workers and time.monotonic() >= self.next_spawn:
+                self.spawn()
+                continue
+            self.kill_stragglers()
+            time.sleep(0.1)
+        self.sock.close()
+
+
+def main():
+    # Objects allocated from here on are shared with the workers; collecting them would write
+    # to their pages and copy them, so collection stays off until the heap is frozen
+    gc.disable()
+    from .main import app
+    from .utils.model_registry import model_registry
+    from .utils.nlp_executor import NLP_PROCESS_WORKERS
+
+    try:
+        model_registry.warmup()
+    except Exception as e:
+        # Same as a single uvicorn process: serve anyway, /ready reports the missing models
+        logger.error("NLP model warmup failed: %s", e)
+    if NLP_PROCESS_WORKERS > 0:
+        logger.warning("NLP_PROCESS_WORKERS=%d starts processes that load their own models in every worker; "
+                       "use 0 with app.server", NLP_PROCESS_WORKERS)
+
+    gc.collect()
+    gc.freeze()
+
+    sock = bind_socket(HOST, PORT, BACKLOG)
+    logger.info("Listening on %s:%d with %d workers, models loaded: %s",
+                HOST, PORT, WEB_CONCURRENCY, model_registry.status()["models"])
+    Master(app, sock, WEB_CONCURRENCY).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from decouple import config
+
+from ..metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+# Seconds each chat stage may take before its fallback is used instead
+CHAT_RESTAURANT_DEADLINE = config("CHAT_RESTAURANT_DEADLINE", default=0.5, cast=float)
+CHAT_MENU_DEADLINE = config("CHAT_MENU_DEADLINE", default=0.5, cast=float)
+CHAT_NLP_DEADLINE = config("CHAT_NLP_DEADLINE", default=0.3, cast=float)
+CHAT_LLM_DEADLINE = config("CHAT_LLM_DEADLINE", default=8.0, cast=float)
+
+
+class ChatStages:
+    """
+    Runs the stages of one chat request, each bounded by its own deadline.
+    A stage that times out or fails is replaced by its fallback, so the request always
+    finishes within the sum of the deadlines on its critical path.
+    """
+
+    def __init__(self):
+        # Milliseconds per stage, in the order the stages finished
+        self.timings: Dict[str, float] = {}
+        # Stages whose result came from the fallback
+        self.fallbacks: List[str] = []
+
+    async def run(self, name: str, awaitable: Awaitable[Any], deadline: float,
+                  fallback: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        Await one stage
+        Args:
+            name: Stage name, used in the timings and as the chat_<name> stage metric
+            awaitable: The stage's work
+            deadline: Seconds the stage may take
+            fallback: Produces the result when the stage times out or raises; None if not given
+        Returns:
+            The stage result, or the fallback result
+        """
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(awaitable, deadline)
+        except asyncio.TimeoutError:
+            logger.warning("Chat stage %s missed its %.0fms deadline", name, deadline * 1000)
+        except Exception as e:
+            logger.warning("Chat stage %s failed: %s", name, e)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings[name] = round(elapsed * 1000, 2)
+            observe_stage(f"chat_{name}", elapsed)
+
+        self.fallbacks.append(name)
+        return fallback() if fallback is not None else None
+
+    def time(self, name: str, start: float):
+        """Record a synchronous stage that started at perf_counter() value start"""
+        elapsed = time.perf_counter() - start
+        self.timings[name] = round(elapsed * 1000, 2)
+        observe_stage(f"chat_{name}", elapsed)
+
+    def report(self, total_start: float) -> Dict[str, Any]:
+        """
+        Returns:
+            Stage timings in milliseconds including the "total", and the stages that fell back
+        """
+        return {
+            "timings": dict(self.timings, total=round((time.perf_counter() - total_start) * 1000, 2)),
+            "fallbacks": self.fallbacks,
+        }
@@ -0,0 +1,148 @@
+import logging
+from typing import Dict, Hashable, Optional
+
+from decouple import config
+
+from ..intent.context_store import ConversationContextStore
+from ..intent.hybrid_classifier import HybridIntentClassifier
+from ..intent.intent_cache import IntentCache
+from ..intent.intent_mapping import IntentMapping
+from ..utils.nlp_executor import nlp_executor
+from .chat_pipeline import CHAT_NLP_DEADLINE
+
+logger = logging.getLogger(__name__)
+
+# Not Triton's default HTTP port 8000: the app itself listens there (see PORT in app.server),
+# so run tritonserver with --http-port 8010 or point TRITON_URL at it
+TRITON_URL = config("TRITON_URL", default="localhost:8010")
+INTENT_MODEL_VERSION = config("INTENT_MODEL_VERSION", default="1")
+# Well inside the chat intent stage deadline, which also covers the batching wait and the rule scores:
+# a slow Triton then degrades the intent to rule-only scores instead of the stage missing its deadline
+INTENT_BERT_TIMEOUT = config("INTENT_BERT_TIMEOUT", default=round(CHAT_NLP_DEADLINE * 2 / 3, 3), cast=float)
+INTENT_THRESHOLD = config("INTENT_THRESHOLD", default=0.3, cast=float)
+# Concurrent chat messages are sent to Triton together, up to this many per request
+INTENT_BATCH_SIZE = config("INTENT_BATCH_SIZE", default=32, cast=int)
+INTENT_BATCH_WAIT_MS = config("INTENT_BATCH_WAIT_MS", default=2.0, cast=float)
+# Skip BERT for messages the rules settle on their own; check the settings with evaluate_cascade first
+INTENT_CASCADE = config("INTENT_CASCADE", default=False, cast=bool)
+INTENT_CASCADE_THRESHOLD = config("INTENT_CASCADE_THRESHOLD", default=0.9, cast=float)
+INTENT_CASCADE_MARGIN = config("INTENT_CASCADE_MARGIN", default=0.3, cast=float)
+
+
+class IntentService:
+    """One HybridIntentClassifier shared by every request, with per-session conversation context"""
+
+    def __init__(self, triton_url: str = TRITON_URL, model_version: str = INTENT_MODEL_VERSION,
+                 bert_timeout: float = INTENT_BERT_TIMEOUT, threshold: float = INTENT_THRESHOLD,
+                 cascade: bool = INTENT_CASCADE, cascade_threshold: float = INTENT_CASCADE_THRESHOLD,
+                 cascade_margin: float = INTENT_CASCADE_MARGIN):
+        """
+        Args:
+            triton_url: URL of the Triton inference server
+            model_version: Version of the Triton intent_classifier model
+            bert_timeout: Deadline in seconds for the BERT call, after which rule scores are used alone
+            threshold: Minimum confidence for top_intent to report an intent
+            cascade: Skip BERT when the rule-based scores are decisive
+            cascade_threshold: Minimum top rule score for a decisive result
+            cascade_margin: Minimum lead of the top rule score over the runner-up
+        """
+        self.triton_url = triton_url
+        self.model_version = model_version
+        self.bert_timeout = bert_timeout
+        self.threshold = threshold
+        self.cascade = cascade
+        self.cascade_threshold = cascade_threshold
+        self.cascade_margin = cascade_margin
+        self.context_store = ConversationContextStore()
+        # Owned here rather than by the lazily built classifier, so its stats can be registered at import
+        self.intent_cache = IntentCache()
+        self._classifier: Optional[HybridIntentClassifier] = None
+        if bert_timeout + INTENT_BATCH_WAIT_MS / 1000.0 >= CHAT_NLP_DEADLINE:
+            logger.warning("INTENT_BERT_TIMEOUT %.3fs does not fit in CHAT_NLP_DEADLINE %.3fs; "
+                           "slow BERT calls will drop the chat intent", bert_timeout, CHAT_NLP_DEADLINE)
+
+    @property
+    def classifier(self) -> HybridIntentClassifier:
+        # Built on first use, after the model registry has loaded spaCy and the NLTK data
+        if self._classifier is None:
+            self._classifier = HybridIntentClassifier(triton_url=self.triton_url, bert_timeout=self.bert_timeout,
+                                                      model_version=self.model_version,
+                                                      cascade=self.cascade,
+                                                      cascade_threshold=self.cascade_threshold,
+                                                      cascade_margin=self.cascade_margin,
+                                                      cache=self.intent_cache,
+                                                      context_store=self.context_store,
+                                                      batch_size=INTENT_BATCH_SIZE,
+                                                      batch_wait_ms=INTENT_BATCH_WAIT_MS,
+                                                      # Batched spaCy parse on the NLP executor's pool
+                                                      # instead of the rule scoring thread
+                                                      negation_parser=nlp_executor.negation)
+        return self._classifier
+
+    def start(self):
+        """Build the classifier ahead of the first request; blocking, so call it off the event loop"""
+        self.classifier
+
+    async def top_intent(self, text: str, session_id: Optional[Hashable] = None) -> Optional[str]:
+        """
+        Classify a chat message in the context of its conversation
+        Args:
+            text: Guest message
+            session_id: Conversation the message belongs to, None to classify it on its own
+        Returns:
+            Name of the most likely intent, or None below the threshold or when classification failed
+        """
+        try:
+            scores = await self.classifier.aclassify(text, session_id)
+        except Exception as e:
+            # The intent only refines the answer, so a broken classifier must not fail the chat
+            logger.warning("Intent classification failed: %s", e)
+            return None
+        return self._select(scores)
+
+    def rule_intent(self, text: str) -> Optional[str]:
+        """
+        Rule-only intent of a chat message, without BERT, conversation context or the spaCy
+        negation parse; the fallback when top_intent misses its deadline. Pattern matching only,
+        so it is cheap enough for the event loop and never touches the spaCy pipeline that the
+        abandoned classification may still be using.
+        Args:
+            text: Guest message
+        Returns:
+            Name of the most likely intent, or None below the threshold, on failure or before the classifier is built
+        """
+        if self._classifier is None:
+            return None
+        try:
+            scores = IntentMapping.to_dict(self._classifier.rule_only_matrix([text])[0])
+        except Exception as e:
+            logger.warning("Rule-only intent classification failed: %s", e)
+            return None
+        return self._select(scores)
+
+    def _select(self, scores: Dict[str, float]) -> Optional[str]:
+        intent, confidence = max(scores.items(), key=lambda item: item[1])
+        return intent if confidence >= self.threshold else None
+
+    def stats(self) -> Dict[str, float]:
+        return self.context_store.stats()
+
+    def batch_stats(self) -> Dict[str, float]:
+        """Batch sizes and queue waits of the Triton micro-batcher, empty before the classifier is built"""
+        if self._classifier is None:
+            return {}
+        return self._classifier.bert_batcher.stats()
+
+    def cascade_stats(self) -> Dict[str, float]:
+        """How often the cascade answered without BERT, empty before the classifier is built"""
+        if self._classifier is None:
+            return {}
+        return self._classifier.cascade_stats.snapshot()
+
+    async def close(self):
+        if self._classifier is not None:
+            await self._classifier.aclose()
+            self._classifier = None
+
+
+intent_service = IntentService()
@@ -0,0 +1,180 @@
+import hashlib
+from bisect import bisect_right
+from numbers import Real
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import bson
+
+from ..utils.cache import AsyncTTLCache
+
+# (exclusive lower bound, inclusive upper bound) of every price_range preference
+PRICE_BANDS = {
+    "low": (None, 15),
+    "medium": (15, 30),
+    "high": (30, None),
+}
+
+
+def _as_list(value) -> list:
+    """Mongo matches scalar fields and array fields alike"""
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, Real) and not isinstance(value, bool)
+
+
+class MenuSnapshot:
+    """
+    Immutable, columnar copy of one restaurant's dishes.
+    Rows are ordered by popularity (descending, missing last); every filter is a bitmap
+    over those rows held in a Python int, so the first set bits are the most popular matches.
+    """
+
+    def __init__(self, dishes: List[dict]):
+        order = sorted(range(len(dishes)), key=lambda i: (not _is_number(dishes[i].get("popularity")),
+                                                         -(dishes[i].get("popularity") or 0)))
+        self.dishes = [dishes[i] for i in order]
+        self.all_rows = (1 << len(self.dishes)) - 1
+        self.version = self._content_hash(dishes)
+
+        self.dietary: Dict[str, int] = {}
+        self.cuisine: Dict[str, int] = {}
+        self.ingredients: Dict[str, int] = {}
+        prices: List[Tuple[float, int]] = []
+        spiciness: List[Tuple[float, int]] = []
+
+        for row, dish in enumerate(self.dishes):
+            bit = 1 << row
+            for flag, value in (dish.get("dietaryFlags") or {}).items():
+                if value is True:
+                    self.dietary[flag] = self.dietary.get(flag, 0) | bit
+            for cuisine in _as_list(dish.get("cuisine")):
+                self.cuisine[cuisine] = self.cuisine.get(cuisine, 0) | bit
+            for ingredient in _as_list(dish.get("ingredients")):
+                self.ingredients[ingredient] = self.ingredients.get(ingredient, 0) | bit
+            if _is_number(dish.get("price")):
+                prices.append((dish["price"], row))
+            if _is_number(dish.get("spiciness")):
+                spiciness.append((dish["spiciness"], row))
+
+        self.price_values, self.price_prefix = self._sorted_column(prices)
+        self.spiciness_values, self.spiciness_prefix = self._sorted_column(spiciness)
+
+    @staticmethod
+    def _content_hash(dishes: List[dict]) -> str:
+        # load_dishes does not sort, so order by _id first: the same dishes always give the same version
+        digest = hashlib.blake2b(digest_size=8)
+        for dish in sorted(dishes, key=lambda dish: str(dish.get("_id"))):
+            digest.update(bson.encode(dish))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _sorted_column(values: List[Tuple[float, int]]) -> Tuple[List[float], List[int]]:
+        """
+        Sort a numeric column and build prefix bitmaps over it:
+        prefix[i] holds the rows of the i smallest values
+        """
+        values.sort()
+        prefix = [0]
+        for _, row in values:
+            prefix.append(prefix[-1] | (1 << row))
+        return [value for value, _ in values], prefix
+
+    @staticmethod
+    def _range(values: List[float], prefix: List[int], lower: Optional[float], upper: Optional[float]) -> int:
+        """Rows with lower < value <= upper, either bound optional"""
+        start = bisect_right(values, lower) if lower is not None else 0
+        end = bisect_right(values, upper) if upper is not None else len(values)
+        return prefix[end] ^ prefix[start] if end > start else 0
+
+    def _any_of(self, index: Dict[Any, int], keys: Iterable) -> int:
+        bits = 0
+        for key in keys:
+            bits |= index.get(key, 0)
+        return bits
+
+    def filter(self, preferences: dict, limit: int = 15) -> List[dict]:
+        """
+        Answer the filter_menu query from memory
+        Args:
+            preferences: Preferences dict as returned by extract_preferences
+            limit: Maximum number of dishes to return
+        Returns:
+            Matching dish documents, most popular first
+        """
+        bits = self.all_rows
+
+        for pref in preferences["dietary"]:
+            bits &= self.dietary.get(f"is{pref}", 0)
+
+        if preferences["cuisine"]:
+            bits &= self._any_of(self.cuisine, preferences["cuisine"])
+
+        if preferences["price_range"] in PRICE_BANDS:
+            lower, upper = PRICE_BANDS[preferences["price_range"]]
+            bits &= self._range(self.price_values, self.price_prefix, lower, upper)
+
+        if preferences["ingredients"]["exclude"]:
+            bits &= ~self._any_of(self.ingredients, preferences["ingredients"]["exclude"])
+
+        if preferences["spiciness"]:
+            bits &= self._range(self.spiciness_values, self.spiciness_prefix, None, preferences["spiciness"])
+
+        return self._take(bits, limit)
+
+    def by_cuisine(self, cuisine: str, limit: int) -> List[dict]:
+        """
+        Dishes of one cuisine, matched like Mongo's {"cuisine": cuisine} (scalar or array field)
+        Args:
+            cuisine: Cuisine name
+            limit: Maximum number of dishes to return
+        Returns:
+            Matching dish documents, most popular first
+        """
+        return self._take(self.cuisine.get(cuisine, 0), limit)
+
+    def _take(self, bits: int, limit: int) -> List[dict]:
+        """Dishes of the lowest (most popular) set bits"""
+        matches = []
+        while bits and len(matches) < limit:
+            lowest = bits & -bits
+            matches.append(self.dishes[lowest.bit_length() - 1])
+            bits ^= lowest
+        return matches
+
+
+class MenuSnapshotStore:
+    """Per-restaurant MenuSnapshot cache with TTL refresh, single-flight builds and invalidation"""
+
+    def __init__(self, loader: Callable[[Any], Awaitable[List[dict]]], ttl: float = 300.0,
+                 max_restaurants: int = 1024):
+        """
+        Args:
+            loader: Coroutine function returning every dish document of a restaurant
+            ttl: Seconds before a snapshot is rebuilt from the database
+            max_restaurants: Maximum number of snapshots kept in memory
+        """
+        self._loader = loader
+        self._cache = AsyncTTLCache(max_entries=max_restaurants, ttl=ttl)
+
+    async def _build(self, restaurant_id) -> MenuSnapshot:
+        return MenuSnapshot(await self._loader(restaurant_id))
+
+    async def get(self, restaurant_id) -> MenuSnapshot:
+        """Return the restaurant's snapshot, building it on first use or after expiry"""
+        return await self._cache.get_or_load(restaurant_id, lambda: self._build(restaurant_id))
+
+    def invalidate(self, restaurant_id):
+        """Drop the restaurant's snapshot so the next read rebuilds it"""
+        self._cache.invalidate(restaurant_id)
+
+    def stats(self) -> Dict[str, float]:
+        return self._cache.stats()
+
+    async def refresh(self, restaurant_id) -> MenuSnapshot:
+        """Rebuild the restaurant's snapshot now"""
+        self.invalidate(restaurant_id)
+        return await self.get(restaurant_id)
@@ -1,18 +1,113 @@
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Optional
+
 import httpx
 from decouple import config
 
+from ..metrics import observe_stage, timed
+
 OLLAMA_API = config("OLLAMA_API", default="http://localhost:11434/api/generate")
+OLLAMA_MODEL = config("OLLAMA_MODEL", default="llama2")
+OLLAMA_CONNECT_TIMEOUT = config("OLLAMA_CONNECT_TIMEOUT", default=5.0, cast=float)
+# Longest silence tolerated between two chunks, i.e. also the time to first token
+OLLAMA_READ_TIMEOUT = config("OLLAMA_READ_TIMEOUT", default=120.0, cast=float)
+OLLAMA_MAX_CONNECTIONS = config("OLLAMA_MAX_CONNECTIONS", default=20, cast=int)
+# Generations allowed to run at once; further requests wait for a slot
+OLLAMA_MAX_CONCURRENCY = config("OLLAMA_MAX_CONCURRENCY", default=8, cast=int)
+
+_client: Optional[httpx.AsyncClient] = None
+_slots: Optional[asyncio.Semaphore] = None
+
+
+class OllamaError(Exception):
+    pass
+
+
+async def start_client():
+    """Open the shared, pooled Ollama client; called from the app startup hook"""
+    global _client, _slots
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(OLLAMA_READ_TIMEOUT, connect=OLLAMA_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=OLLAMA_MAX_CONNECTIONS,
+                                max_keepalive_connections=OLLAMA_MAX_CONNECTIONS),
+        )
+        _slots = asyncio.Semaphore(OLLAMA_MAX_CONCURRENCY)
+
 
+async def close_client():
+    """Close the shared client and its connections; called from the app shutdown hook"""
+    global _client, _slots
+    if _client is not None:
+        await _client.aclose()
+        _client, _slots = None, None
+
+
+async def _get_client() -> httpx.AsyncClient:
+    # Scripts and tests that skip the startup hook still get a pooled client
+    if _client is None:
+        await start_client()
+    return _client
+
+
+@timed("ollama_generation")
 async def get_ollama_response(prompt: str) -> str:
-    async with httpx.AsyncClient() as client:
-        response = await client.post(OLLAMA_API, json={
-            "model": "llama2",
-            "prompt": prompt,
-            "stream": False
-        })
+    client = await _get_client()
+    async with _slots:
+        try:
+            response = await client.post(OLLAMA_API, json={
+                "model": OLLAMA_MODEL,
+                "prompt": prompt,
+                "stream": False
+            })
+        except httpx.HTTPError as e:
+            raise OllamaError(f"Error communicating with Ollama: {e}") from e
 
     if response.status_code != 200:
-        raise Exception("Error communicating with Ollama")
+        raise OllamaError("Error communicating with Ollama")
 
     ollama_response = response.json()
-    return ollama_response["response"]
\ No newline at end of file
+    return ollama_response["response"]
+
+
+async def stream_ollama_response(prompt: str) -> AsyncIterator[str]:
+    """
+    Generate a response token by token
+    Args:
+        prompt: Prompt sent to the model
+    Returns:
+        Async iterator over the text fragments as Ollama produces them
+    """
+    client = await _get_client()
+    async with _slots:
+        start = time.perf_counter()
+        first_token = True
+        try:
+            async with client.stream("POST", OLLAMA_API, json={
+                "model": OLLAMA_MODEL,
+                "prompt": prompt,
+                "stream": True
+            }) as response:
+                if response.status_code != 200:
+                    raise OllamaError("Error communicating with Ollama")
+
+                # Ollama streams one JSON object per line
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise OllamaError(chunk["error"])
+                    if chunk.get("response"):
+                        if first_token:
+                            observe_stage("ollama_first_token", time.perf_counter() - start)
+                            first_token = False
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        break
+        except httpx.HTTPError as e:
+            raise OllamaError(f"Error communicating with Ollama: {e}") from e
+        finally:
+            observe_stage("ollama_generation", time.perf_counter() - start)
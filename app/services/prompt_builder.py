@@ -0,0 +1,144 @@
+import math
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from decouple import config
+
+PROMPT_TOKEN_BUDGET = config("PROMPT_TOKEN_BUDGET", default=768, cast=int)
+PROMPT_DESCRIPTION_CHARS = config("PROMPT_DESCRIPTION_CHARS", default=140, cast=int)
+PROMPT_CACHE_SIZE = config("PROMPT_CACHE_SIZE", default=256, cast=int)
+
+# Identical for every request at a restaurant, so the model server can reuse its KV cache for it
+INSTRUCTIONS = (
+    "You are the menu assistant of {name}, a restaurant serving {cuisine} food. "
+    "Recommend up to 3 dishes from the menu below that best match the guest's request "
+    "and explain in one or two sentences why each dish fits. Only recommend dishes listed on the menu."
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough Llama token count: about 4 characters per token for English text"""
+    return math.ceil(len(text) / 4)
+
+
+class BuiltPrompt(NamedTuple):
+    text: str
+    tokens: int
+    items: int
+    dropped: int
+
+
+class PromptBuilder:
+    """
+    Builds compact, token-budgeted recommendation prompts.
+    Menu lines are rendered once per restaurant and menu snapshot version and then reused.
+    """
+
+    def __init__(self, token_budget: int = 768, description_chars: int = 140, max_menus: int = 256):
+        """
+        Args:
+            token_budget: Estimated token limit of the whole prompt; low-ranked items are dropped to stay below it
+            description_chars: Dish descriptions are cut to this many characters
+            max_menus: Number of restaurant menus whose rendered lines are kept
+        """
+        self.token_budget = token_budget
+        self.description_chars = description_chars
+        self.max_menus = max_menus
+        self._menus: "OrderedDict[Tuple[str, Optional[str]], Dict[Any, Tuple[str, int]]]" = OrderedDict()
+
+    def _menu_lines(self, restaurant_id, menu_version: Optional[str]) -> Dict[Any, Tuple[str, int]]:
+        key = (str(restaurant_id), menu_version)
+        lines = self._menus.get(key)
+        if lines is None:
+            lines = self._menus[key] = {}
+            while len(self._menus) > self.max_menus:
+                self._menus.popitem(last=False)
+        self._menus.move_to_end(key)
+        return lines
+
+    def _render_item(self, item: dict) -> str:
+        price = item.get("price")
+        line = f"- {item['name']}" + (f" (${price:.2f})" if isinstance(price, (int, float)) else "")
+        description = " ".join((item.get("description") or "").split())
+        if len(description) > self.description_chars:
+            description = description[:self.description_chars].rsplit(" ", 1)[0] + "..."
+        return f"{line}: {description}" if description else line
+
+    @staticmethod
+    def _relevance(item: dict, include: List[str]) -> int:
+        """Number of wanted ingredients the dish mentions"""
+        if not include:
+            return 0
+        text = " ".join([item.get("name", ""), item.get("description") or "",
+                         " ".join(map(str, item.get("ingredients") or []))]).lower()
+        return sum(ingredient in text for ingredient in include)
+
+    @staticmethod
+    def _describe_preferences(preferences: Dict[str, Any]) -> str:
+        parts = []
+        if preferences.get("dietary"):
+            parts.append("dietary: " + ", ".join(sorted(preferences["dietary"])))
+        if preferences.get("cuisine"):
+            parts.append("cuisine: " + ", ".join(sorted(preferences["cuisine"])))
+        if preferences.get("price_range"):
+            parts.append(f"price: {preferences['price_range']}")
+        if preferences.get("spiciness"):
+            parts.append(f"spiciness up to {preferences['spiciness']} of 4")
+        ingredients = preferences.get("ingredients") or {}
+        if ingredients.get("include"):
+            parts.append("wants: " + ", ".join(sorted(ingredients["include"])))
+        if ingredients.get("exclude"):
+            parts.append("avoid: " + ", ".join(sorted(ingredients["exclude"])))
+        if preferences.get("occasion"):
+            parts.append(f"occasion: {preferences['occasion']}")
+        return "; ".join(parts) or "none"
+
+    def build(self, user_query: str, menu_items: List[dict], restaurant_info: dict, preferences: Dict[str, Any],
+              restaurant_id=None, menu_version: Optional[str] = None) -> BuiltPrompt:
+        """
+        Build the recommendation prompt
+        Args:
+            user_query: Guest's message
+            menu_items: Candidate dishes, most popular first
+            restaurant_info: Restaurant document
+            preferences: Preferences dict as returned by extract_preferences
+            restaurant_id: Restaurant id used to cache the rendered menu lines
+            menu_version: Menu snapshot version; lines are cached only when it is given
+        Returns:
+            BuiltPrompt with the text, its estimated token count and how many items were kept and dropped
+        """
+        header = INSTRUCTIONS.format(name=restaurant_info["name"],
+                                     cuisine=", ".join(restaurant_info.get("cuisine") or []) or "various")
+        footer = (f"\nGuest preferences: {self._describe_preferences(preferences)}\n"
+                  f"Guest request: {user_query.strip()}\nRecommendations:")
+        remaining = self.token_budget - estimate_tokens(header) - estimate_tokens(footer) - 2
+
+        lines = self._menu_lines(restaurant_id, menu_version) if menu_version else {}
+        include = (preferences.get("ingredients") or {}).get("include") or []
+        # Stable sort: dishes with wanted ingredients first, popularity order otherwise
+        ranked = sorted(menu_items, key=lambda item: -self._relevance(item, include))
+
+        kept = []
+        for item in ranked:
+            key = item.get("_id", item.get("name"))
+            rendered = lines.get(key)
+            if rendered is None:
+                line = self._render_item(item)
+                rendered = (line, estimate_tokens(line) + 1)
+                if menu_version:
+                    lines[key] = rendered
+            if rendered[1] > remaining:
+                break
+            kept.append(rendered[0])
+            remaining -= rendered[1]
+
+        text = "\n".join([header, "", "Menu:", *kept]) + "\n" + footer
+        return BuiltPrompt(text=text, tokens=estimate_tokens(text), items=len(kept),
+                           dropped=len(menu_items) - len(kept))
+
+
+prompt_builder = PromptBuilder(
+    token_budget=PROMPT_TOKEN_BUDGET,
+    description_chars=PROMPT_DESCRIPTION_CHARS,
+    max_menus=PROMPT_CACHE_SIZE
+)
@@ -0,0 +1,74 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from decouple import config
+
+from ..utils.cache import AsyncTTLCache
+
+
+def canonical_preferences(preferences: Dict[str, Any]) -> Tuple:
+    """
+    Reduce a preferences dict to a hashable value that is equal for equivalent preferences:
+    list order and duplicates are ignored (extract_preferences dedupes through a set),
+    and empty values count as "no preference" just like they do in filter_menu
+    Args:
+        preferences: Preferences dict as returned by extract_preferences
+    Returns:
+        Nested tuple usable as a cache key
+    """
+    def freeze(value):
+        if isinstance(value, dict):
+            return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+        if isinstance(value, (list, tuple, set)):
+            return tuple(sorted(set(value)))
+        return value or None
+
+    return freeze(preferences)
+
+
+class RecommendationCache:
+    """
+    TTL and size bounded cache of generated recommendations.
+    Keyed on the restaurant, the menu snapshot version the prompt was built from,
+    the canonical preferences and the detected intent, so a menu change retires old answers.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl: float = 900.0):
+        """
+        Args:
+            max_entries: Maximum number of cached recommendations
+            ttl: Seconds a recommendation is served before it is generated again
+        """
+        self._cache = AsyncTTLCache(max_entries=max_entries, ttl=ttl)
+
+    @staticmethod
+    def key(restaurant_id, menu_version: str, preferences: Dict[str, Any],
+            intent: Optional[str] = None) -> Hashable:
+        return (str(restaurant_id), menu_version, canonical_preferences(preferences), intent)
+
+    def get(self, key: Hashable) -> Optional[str]:
+        """Return a cached recommendation, counting the lookup as a hit or a miss"""
+        return self._cache.get(key)
+
+    def put(self, key: Hashable, text: str):
+        """Store a recommendation produced outside get_or_generate, e.g. a finished stream"""
+        self._cache.put(key, text)
+
+    async def get_or_generate(self, key: Hashable, generate: Callable[[], Awaitable[str]]) -> str:
+        """
+        Return the cached recommendation or generate it; concurrent identical requests share one generation
+        Args:
+            key: Key built with RecommendationCache.key
+            generate: Coroutine factory running the LLM on a miss
+        Returns:
+            Recommendation text
+        """
+        return await self._cache.get_or_load(key, generate)
+
+    def stats(self) -> Dict[str, float]:
+        return self._cache.stats()
+
+
+recommendation_cache = RecommendationCache(
+    max_entries=config("RECOMMENDATION_CACHE_SIZE", default=2048, cast=int),
+    ttl=config("RECOMMENDATION_CACHE_TTL", default=900.0, cast=float)
+)
@@ -0,0 +1,139 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class AsyncTTLCache:
+    """
+    Size-bounded LRU cache with a per-entry TTL for asyncio code.
+    Concurrent misses for the same key share a single load (single-flight).
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0):
+        """
+        Args:
+            max_entries: Maximum number of cached keys
+            ttl: Seconds an entry stays valid after it was loaded
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.shared_loads = 0
+        self.evictions = 0
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """
+        Return a fresh cached value without loading it
+        Args:
+            key: Cache key
+        Returns:
+            The cached value, or None if missing or expired
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Like peek, but counted in the hit/miss statistics
+        Args:
+            key: Cache key
+        Returns:
+            The cached value, or None if missing or expired
+        """
+        value = self.peek(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        """
+        Store a value, evicting the least recently used entries beyond max_entries
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value, or load it once no matter how many callers miss at the same time.
+        None results are handed to the waiting callers but not cached.
+        Args:
+            key: Cache key
+            loader: Coroutine factory producing the value on a miss
+        Returns:
+            The cached or freshly loaded value
+        """
+        value = self.peek(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(loader())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._loaded(key, done))
+        else:
+            self.shared_loads += 1
+
+        # A cancelled caller must not cancel the load the other callers are waiting on
+        return await asyncio.shield(task)
+
+    def _loaded(self, key: Hashable, task: asyncio.Future):
+        """Store the result of a finished load unless the key was invalidated meanwhile"""
+        failed = task.cancelled() or task.exception() is not None
+        if self._inflight.get(key) is not task:
+            return
+        del self._inflight[key]
+        if not failed and task.result() is not None:
+            self.put(key, task.result())
+
+    def invalidate(self, key: Hashable):
+        """
+        Drop a key, including any load in progress, so the next read fetches it again
+        Args:
+            key: Cache key
+        """
+        self._entries.pop(key, None)
+        self._inflight.pop(key, None)
+
+    def clear(self):
+        """Drop every entry"""
+        self._entries.clear()
+        self._inflight.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns:
+            Dictionary with size and hit/miss counters
+        """
+        lookups = self.hits + self.misses + self.shared_loads
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared_loads": self.shared_loads,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.shared_loads) / lookups if lookups else 0.0,
+        }
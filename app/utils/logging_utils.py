@@ -0,0 +1,73 @@
+import atexit
+import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_queue: Optional[queue.SimpleQueue] = None
+_handler: Optional[logging.Handler] = None
+_listener: Optional[QueueListener] = None
+_fork_hooks_registered = False
+
+
+class SamplingFilter(logging.Filter):
+    """Pass a random fraction of records below WARNING; warnings and errors always pass"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+def _start_listener():
+    global _listener
+    if _listener is None and _queue is not None:
+        _listener = QueueListener(_queue, _handler, respect_handler_level=True)
+        _listener.start()
+
+
+def stop_logging():
+    """Stop the listener thread once it has written every queued record"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def setup_logging(level: str = "INFO", access_sample_rate: float = 1.0) -> QueueListener:
+    """
+    Route all logging through a queue so request handlers never block on console I/O;
+    a background listener thread does the writing
+    Args:
+        level: Root log level
+        access_sample_rate: Fraction of successful access log lines ("app.access") that are kept
+    Returns:
+        The started QueueListener, stopped automatically at exit
+    """
+    global _queue, _handler, _fork_hooks_registered
+    stop_logging()
+    _queue = queue.SimpleQueue()
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(_queue))
+    root.setLevel(level)
+
+    logging.getLogger("app.access").addFilter(SamplingFilter(access_sample_rate))
+
+    _start_listener()
+    if not _fork_hooks_registered:
+        # A forked child gets no copy of the listener thread, so stop it around fork() and start one on both sides
+        os.register_at_fork(before=stop_logging, after_in_parent=_start_listener, after_in_child=_start_listener)
+        atexit.register(stop_logging)
+        _fork_hooks_registered = True
+    return _listener
@@ -0,0 +1,121 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+SPACY_MODEL = config("SPACY_MODEL", default="en_core_web_sm")
+# Callers read token text, the dependency parse (negation) and entities: the tagger, parser
+# and NER (with the tok2vec they listen to) stay, the pipes producing lemmas and POS are not loaded
+SPACY_EXCLUDE = ("lemmatizer", "attribute_ruler")
+# Local NLTK data directory, prepared at build time with
+# python -m nltk.downloader -d $NLTK_DATA punkt punkt_tab stopwords wordnet
+NLTK_DATA = config("NLTK_DATA", default="")
+NLTK_RESOURCES = {
+    "corpora/stopwords": "stopwords",
+    "corpora/wordnet": "wordnet",
+}
+# Only word_tokenize reads the Punkt tables, i.e. TextPreprocessor in "nltk" mode
+NLTK_TOKENIZER_RESOURCES = {
+    "tokenizers/punkt_tab": "punkt_tab",
+}
+
+WARMUP_TEXT = "I'd like a vegetarian Italian dish without mushrooms, not too spicy, for tonight."
+
+
+def _require_nltk_data(resources: Dict[str, str]):
+    """Raise a LookupError naming the download command for the first missing NLTK resource"""
+    import nltk
+
+    for resource, package in resources.items():
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            raise LookupError(f"NLTK resource '{package}' not found in {nltk.data.path}; "
+                              f"install it with: python -m nltk.downloader -d <NLTK_DATA> {package}")
+
+
+class ModelRegistry:
+    """Loads each NLP model once per process and shares it between all callers"""
+
+    def __init__(self):
+        self._models: Dict[str, Any] = {}
+        self._load_seconds: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.ready = False
+
+    def _get(self, name: str, loader: Callable[[], Any]) -> Any:
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        with self._lock:
+            if name not in self._models:
+                start = time.perf_counter()
+                self._models[name] = loader()
+                self._load_seconds[name] = time.perf_counter() - start
+                logger.info("Loaded %s in %.2fs", name, self._load_seconds[name])
+            return self._models[name]
+
+    def spacy(self):
+        """Shared spaCy pipeline without the unused pipes"""
+        def load():
+            import spacy
+            return spacy.load(SPACY_MODEL, exclude=list(SPACY_EXCLUDE))
+        return self._get("spacy", load)
+
+    def nltk(self) -> Dict[str, Any]:
+        """
+        Shared NLTK resources, read from NLTK_DATA (or NLTK's default paths) without downloading
+        Returns:
+            Dictionary with the "lemmatizer" and the English "stop_words" set
+        """
+        def load():
+            import nltk
+            from nltk.corpus import stopwords
+            from nltk.stem import WordNetLemmatizer
+
+            if NLTK_DATA and NLTK_DATA not in nltk.data.path:
+                nltk.data.path.insert(0, NLTK_DATA)
+            _require_nltk_data(NLTK_RESOURCES)
+
+            lemmatizer = WordNetLemmatizer()
+            # WordNet is read lazily on the first lemmatize call; force it here instead
+            lemmatizer.lemmatize("dishes")
+            return {"lemmatizer": lemmatizer, "stop_words": set(stopwords.words('english'))}
+        return self._get("nltk", load)
+
+    def nltk_tokenizer(self) -> Callable[[str], List[str]]:
+        """NLTK's word_tokenize, once its Punkt data has been found"""
+        # Sets up the NLTK data path; called before _get, whose lock is not reentrant
+        self.nltk()
+
+        def load():
+            from nltk.tokenize import word_tokenize
+            _require_nltk_data(NLTK_TOKENIZER_RESOURCES)
+            word_tokenize(WARMUP_TEXT)
+            return word_tokenize
+        return self._get("nltk_tokenizer", load)
+
+    def warmup(self):
+        """Load every model and run one inference through it, then mark the process ready"""
+        from ..intent.text_preprocessor import PREPROCESS_MODE
+
+        self.spacy()(WARMUP_TEXT)
+        lemmatizer = self.nltk()["lemmatizer"]
+        # The fast preprocessing mode never tokenizes with NLTK, so its Punkt data is not required
+        tokenize = self.nltk_tokenizer() if PREPROCESS_MODE == "nltk" else str.split
+        for token in tokenize(WARMUP_TEXT.lower()):
+            lemmatizer.lemmatize(token)
+        self.ready = True
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "models": {name: round(seconds, 3) for name, seconds in self._load_seconds.items()},
+        }
+
+
+model_registry = ModelRegistry()
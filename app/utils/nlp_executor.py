@@ -0,0 +1,154 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from decouple import config
+
+from ..intent.rule_based_classifier import RuleBasedIntentClassifier
+from ..metrics import stage_timer
+from .model_registry import WARMUP_TEXT, model_registry
+from .nlp_utils import extract_preferences_batch
+
+# 0 runs spaCy on one background thread of this process; N > 0 starts N worker processes, each
+# with its own copy of the model. 0 is the default because app.server already gets its parallelism
+# from WEB_CONCURRENCY forked workers, which share one copy of the model. Raise it when serving
+# from a single uvicorn process, where the spaCy parses would otherwise share one GIL.
+NLP_PROCESS_WORKERS = config("NLP_PROCESS_WORKERS", default=0, cast=int)
+NLP_BATCH_SIZE = config("NLP_BATCH_SIZE", default=16, cast=int)
+NLP_BATCH_WAIT_MS = config("NLP_BATCH_WAIT_MS", default=2.0, cast=float)
+
+
+def _init_worker():
+    """Load and warm spaCy once in every worker process"""
+    model_registry.spacy()(WARMUP_TEXT)
+
+
+def _ping() -> bool:
+    return True
+
+
+def negation_batch(texts: List[str]) -> List[bool]:
+    return [RuleBasedIntentClassifier.has_negation(doc) for doc in model_registry.spacy().pipe(texts)]
+
+
+class _PipeBatcher:
+    """Collects texts from concurrent callers and hands them to one batch call"""
+
+    def __init__(self, run_batch: Callable[[List[str]], Awaitable[list]], max_batch_size: int, max_wait: float):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight = set()
+
+    async def submit(self, text: str) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self.flush)
+
+        return await future
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            task = asyncio.ensure_future(self._dispatch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]):
+        try:
+            results = await self.run_batch([text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def close(self):
+        self.flush()
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+
+class NLPExecutor:
+    """
+    Runs the CPU-bound spaCy work off the event loop.
+    Concurrent requests are batched through nlp.pipe; with worker processes the batches
+    run in parallel on several cores, each worker holding its own preloaded model.
+    """
+
+    def __init__(self, workers: int = 0, max_batch_size: int = 16, max_wait_ms: float = 2.0):
+        """
+        Args:
+            workers: Number of worker processes, 0 for a single background thread in this process
+            max_batch_size: Texts per nlp.pipe call
+            max_wait_ms: Longest time a text waits for its batch to fill up
+        """
+        self.workers = workers
+        self._pool: Optional[Executor] = None
+        self._preferences = _PipeBatcher(lambda texts: self._run(extract_preferences_batch, texts),
+                                         max_batch_size, max_wait_ms / 1000.0)
+        self._negation = _PipeBatcher(lambda texts: self._run(negation_batch, texts),
+                                      max_batch_size, max_wait_ms / 1000.0)
+
+    def start(self):
+        """Create the pool; worker processes are started and warmed right away"""
+        if self._pool is not None:
+            return
+        if self.workers > 0:
+            # spawn: forking a process that already runs the event loop and thread pools is unsafe
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_init_worker)
+            for _ in range(self.workers):
+                self._pool.submit(_ping)
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nlp")
+
+    async def _run(self, func: Callable[[List[str]], list], texts: List[str]) -> list:
+        self.start()
+        return await asyncio.get_running_loop().run_in_executor(self._pool, func, texts)
+
+    async def extract_preferences(self, text: str) -> Dict[str, Any]:
+        """Async extract_preferences; same result as the synchronous function"""
+        with stage_timer("extract_preferences"):
+            return await self._preferences.submit(text)
+
+    async def negation(self, texts: List[str]) -> List[bool]:
+        """
+        Negation check of several texts, batched with those of concurrent callers;
+        the negation_parser of HybridIntentClassifier
+        """
+        with stage_timer("negation"):
+            return list(await asyncio.gather(*(self._negation.submit(text) for text in texts)))
+
+    async def close(self):
+        """Finish the queued work and stop the pool"""
+        await self._preferences.close()
+        await self._negation.close()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+nlp_executor = NLPExecutor(
+    workers=NLP_PROCESS_WORKERS,
+    max_batch_size=NLP_BATCH_SIZE,
+    max_wait_ms=NLP_BATCH_WAIT_MS
+)
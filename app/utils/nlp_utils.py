@@ -1,74 +1,152 @@
-import spacy
-from typing import Dict, Any
+import functools
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from ..metrics import timed
+from .model_registry import model_registry
 
-nlp = spacy.load("en_core_web_sm")
+# Preference vocabularies; a key of several words also matches when they are joined by hyphens
+# ("gluten-free", "gluten free") and a trailing plural "s" is ignored ("vegans", "birthdays")
+DIETARY_KEYWORDS = {
+    "vegetarian": "Vegetarian",
+    "vegan": "Vegan",
+    "gluten-free": "GlutenFree",
+    "dairy-free": "DairyFree",
+    "halal": "Halal",
+    "kosher": "Kosher",
+}
+CUISINE_TYPES = ["italian", "chinese", "indian", "mexican", "japanese", "thai", "french", "greek"]
+PRICE_RANGES = {
+    "cheap": "low", "affordable": "low", "inexpensive": "low",
+    "moderate": "medium", "mid-range": "medium",
+    "expensive": "high", "high-end": "high", "luxurious": "high",
+}
+SPICINESS_LEVELS = {"mild": 1, "medium": 2, "spicy": 3, "very spicy": 4}
+OCCASION_TYPES = ["date", "birthday", "anniversary", "business", "family"]
+# Words that turn the ingredients of a query into exclusions
+EXCLUSION_CUES = ["no", "without", "exclude"]
 
+INGREDIENT_LABELS = ("PRODUCT", "FOOD")
+WORDS = re.compile(r"[a-z]+")
 
-def extract_preferences(query: str) -> Dict[str, Any]:
-    doc = nlp(query)
-
-    preferences = {
-        "dietary": [],
-        "cuisine": [],
-        "ingredients": {"include": [], "exclude": []},
-        "price_range": None,
-        "spiciness": None,
-        "occasion": None
-    }
-
-    dietary_keywords = {
-        "vegetarian": "Vegetarian",
-        "vegan": "Vegan",
-        "gluten-free": "GlutenFree",
-        "dairy-free": "DairyFree",
-        "halal": "Halal",
-        "kosher": "Kosher"
-    }
-
-    cuisine_types = ["italian", "chinese", "indian", "mexican", "japanese", "thai", "french", "greek"]
-    spiciness_levels = {"mild": 1, "medium": 2, "spicy": 3, "very spicy": 4}
-    occasion_types = ["date", "birthday", "anniversary", "business", "family"]
-
-    for token in doc:
-        # Check for dietary preferences
-        for keyword, preference in dietary_keywords.items():
-            if keyword in token.text.lower():
-                preferences["dietary"].append(preference)
-
-        # Check for cuisine types
-        if token.text.lower() in cuisine_types:
-            preferences["cuisine"].append(token.text.lower())
-
-        # Check for price range
-        if token.text.lower() in ["cheap", "affordable", "inexpensive"]:
-            preferences["price_range"] = "low"
-        elif token.text.lower() in ["moderate", "mid-range"]:
-            preferences["price_range"] = "medium"
-        elif token.text.lower() in ["expensive", "high-end", "luxurious"]:
-            preferences["price_range"] = "high"
-
-        # Check for spiciness
-        for level, value in spiciness_levels.items():
-            if level in token.text.lower():
-                preferences["spiciness"] = value
-
-        # Check for occasion
-        for occasion in occasion_types:
-            if occasion in token.text.lower():
-                preferences["occasion"] = occasion
-
-    # Extract ingredients to include or exclude
-    for ent in doc.ents:
-        if ent.label_ == "PRODUCT" or ent.label_ == "FOOD":
-            if any(excl in doc.text.lower() for excl in ["no", "without", "exclude"]):
-                preferences["ingredients"]["exclude"].append(ent.text.lower())
+
+class PreferenceExtractor:
+    """Matches the preference vocabularies in one left-to-right pass over the words of a query"""
+
+    def __init__(self):
+        # Word tuple -> (category, value); lookups are hashed, so cost does not grow with the vocabulary
+        self._phrases: Dict[Tuple[str, ...], Tuple[str, Any]] = {}
+        self._add("dietary", DIETARY_KEYWORDS.items())
+        self._add("cuisine", ((cuisine, cuisine) for cuisine in CUISINE_TYPES))
+        self._add("price_range", PRICE_RANGES.items())
+        self._add("spiciness", SPICINESS_LEVELS.items())
+        self._add("occasion", ((occasion, occasion) for occasion in OCCASION_TYPES))
+        self._add("exclude", ((cue, True) for cue in EXCLUSION_CUES))
+        self._max_words = max(len(words) for words in self._phrases)
+
+    def _add(self, category: str, entries: Iterable[Tuple[str, Any]]):
+        for phrase, value in entries:
+            self._phrases[tuple(WORDS.findall(phrase))] = (category, value)
+
+    def _lookup(self, words: List[str], start: int, length: int) -> Optional[Tuple[str, Any]]:
+        key = tuple(words[start:start + length])
+        match = self._phrases.get(key)
+        if match is None and key[-1].endswith("s"):
+            match = self._phrases.get(key[:-1] + (key[-1][:-1],))
+        return match
+
+    def match(self, text: str) -> Dict[str, Any]:
+        """
+        Find the vocabulary phrases in a text; the longest phrase wins where several start at a word,
+        and a later mention overrides an earlier one for the single-valued categories
+        Args:
+            text: Query text
+        Returns:
+            Preferences dict without ingredients, plus "exclude" telling whether an exclusion cue occurs
+        """
+        found = {"dietary": {}, "cuisine": {}, "price_range": None, "spiciness": None, "occasion": None,
+                 "exclude": False}
+        words = WORDS.findall(text.lower())
+        position = 0
+        while position < len(words):
+            for length in range(min(self._max_words, len(words) - position), 0, -1):
+                match = self._lookup(words, position, length)
+                if match is not None:
+                    break
+            else:
+                position += 1
+                continue
+
+            category, value = match
+            if category in ("dietary", "cuisine"):
+                found[category][value] = None
             else:
-                preferences["ingredients"]["include"].append(ent.text.lower())
+                found[category] = value
+            position += length
+
+        found["dietary"] = list(found["dietary"])
+        found["cuisine"] = list(found["cuisine"])
+        return found
+
+    def extract(self, text: str, entities: Iterable = ()) -> Dict[str, Any]:
+        """
+        Build the preferences dict of a query
+        Args:
+            text: Query text
+            entities: spaCy entities of the query; PRODUCT and FOOD ones are taken as ingredients
+        Returns:
+            Preferences dict
+        """
+        found = self.match(text)
+        ingredients = {ent.text.lower(): None for ent in entities if ent.label_ in INGREDIENT_LABELS}
+        include, exclude = ([], list(ingredients)) if found.pop("exclude") else (list(ingredients), [])
+        return {
+            "dietary": found["dietary"],
+            "cuisine": found["cuisine"],
+            "ingredients": {"include": include, "exclude": exclude},
+            "price_range": found["price_range"],
+            "spiciness": found["spiciness"],
+            "occasion": found["occasion"],
+        }
+
+    def extract_batch(self, texts: List[str], entities: Optional[List[Iterable]] = None) -> List[Dict[str, Any]]:
+        """Preferences dicts of several queries, in order"""
+        if entities is None:
+            return [self.extract(text) for text in texts]
+        return [self.extract(text, ents) for text, ents in zip(texts, entities)]
+
+
+preference_extractor = PreferenceExtractor()
+
+
+@functools.lru_cache(maxsize=4)
+def _ner_disable(nlp) -> Optional[List[str]]:
+    """
+    Pipes that can be skipped when only entities are needed
+    Returns:
+        Names of the pipes to disable, or None if the pipeline has no NER
+    """
+    if "ner" not in nlp.pipe_names:
+        return None
+    disable = [name for name in nlp.pipe_names if name != "ner"]
+    # Keep a shared tok2vec if NER reads its output (transformer-style pipelines)
+    for name in list(disable):
+        if "ner" in getattr(nlp.get_pipe(name), "listening_components", ()):
+            disable.remove(name)
+    return disable
+
+
+@timed("extract_preferences")
+def extract_preferences(query: str) -> Dict[str, Any]:
+    nlp = model_registry.spacy()
+    disable = _ner_disable(nlp)
+    entities = nlp(query, disable=disable).ents if disable is not None else ()
+    return preference_extractor.extract(query, entities)
 
-    # Remove duplicates
-    preferences["dietary"] = list(set(preferences["dietary"]))
-    preferences["cuisine"] = list(set(preferences["cuisine"]))
-    preferences["ingredients"]["include"] = list(set(preferences["ingredients"]["include"]))
-    preferences["ingredients"]["exclude"] = list(set(preferences["ingredients"]["exclude"]))
 
-    return preferences
\ No newline at end of file
+def extract_preferences_batch(queries: List[str]) -> List[Dict[str, Any]]:
+    # nlp.pipe batches NER over all queries; the tagger and parser are not run
+    nlp = model_registry.spacy()
+    disable = _ner_disable(nlp)
+    if disable is None:
+        return preference_extractor.extract_batch(queries)
+    return preference_extractor.extract_batch(queries, [doc.ents for doc in nlp.pipe(queries, disable=disable)])
@@ -0,0 +1,111 @@
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # Optional: the standard library produces the same JSON, only slower
+    orjson = None
+
+
+def json_dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON, encoded with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class EncodedResponse(NamedTuple):
+    body: bytes
+    etag: str
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names the given ETag (weak comparison, as RFC 9110 asks for)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class ResponseCache:
+    """
+    LRU cache of encoded JSON response bodies.
+    Every entry remembers the version of the data it was encoded from; a lookup with another
+    version re-encodes it, so a menu change retires the old body on the next request.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        """
+        Args:
+            max_entries: Maximum number of cached bodies
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[Hashable, EncodedResponse]]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_encode(self, key: Hashable, version: Hashable, build: Callable[[], Any]) -> EncodedResponse:
+        """
+        Return the encoded body of key at version, encoding build() on a miss
+        Args:
+            key: What the response is for, e.g. ("menu", restaurant_id, cuisine)
+            version: Version of the underlying data
+            build: Produces the JSON-compatible value to encode
+        Returns:
+            Body bytes and their ETag
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        body = json_dumps(build())
+        encoded = EncodedResponse(body, '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"')
+        self._entries[key] = (version, encoded)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return encoded
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns:
+            Dictionary with size and hit/miss counters
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": sum(len(encoded.body) for _, encoded in self._entries.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def cached_json_response(request: Request, encoded: EncodedResponse) -> Response:
+    """
+    Response for an encoded body: 304 without a body when the client already holds this ETag
+    Args:
+        request: The incoming request, read for If-None-Match
+        encoded: Result of ResponseCache.get_or_encode
+    """
+    # no-cache: clients may keep the body but must revalidate, which is the cheap 304 path
+    headers = {"ETag": encoded.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), encoded.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=encoded.body, media_type="application/json", headers=headers)
@@ -0,0 +1,102 @@
+"""
+Stand-ins for the Ollama and Triton HTTP APIs with configurable latency.
+
+    python -m benchmarks.fakes --ollama-port 11435 --triton-port 8765 --first-token-ms 300 --token-ms 20
+"""
+import argparse
+import asyncio
+import json
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from app.intent.intent_mapping import IntentMapping
+
+REPLY = ("I recommend the chef's special: it is light, full of fresh vegetables and one of our most "
+         "popular dishes. For something heartier, try the house curry.").split(" ")
+
+
+def ollama_app(first_token_ms: float = 300.0, token_ms: float = 20.0, tokens: int = 40) -> Starlette:
+    """Fake /api/generate: waits first_token_ms, then emits one token every token_ms"""
+    words = [REPLY[i % len(REPLY)] + " " for i in range(tokens)]
+
+    async def generate(request: Request):
+        body = await request.json()
+        if not body.get("stream", True):
+            await asyncio.sleep((first_token_ms + token_ms * (tokens - 1)) / 1000.0)
+            return JSONResponse({"model": body.get("model"), "response": "".join(words), "done": True})
+
+        async def lines():
+            await asyncio.sleep(first_token_ms / 1000.0)
+            for index, word in enumerate(words):
+                if index:
+                    await asyncio.sleep(token_ms / 1000.0)
+                yield json.dumps({"response": word, "done": False}) + "\n"
+            yield json.dumps({"response": "", "done": True}) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    return Starlette(routes=[Route("/api/generate", generate, methods=["POST"])])
+
+
+def triton_app(latency_ms: float = 15.0, per_item_ms: float = 0.5) -> Starlette:
+    """Fake KServe v2 infer endpoint of the intent_classifier model"""
+
+    async def infer(request: Request):
+        body = await request.body()
+        # Binary tensor requests put the JSON header first and give its length in this header
+        header_length = request.headers.get("Inference-Header-Content-Length")
+        header = json.loads(body[:int(header_length)] if header_length else body)
+        batch = header["inputs"][0]["shape"][0]
+        await asyncio.sleep((latency_ms + per_item_ms * batch) / 1000.0)
+
+        probabilities = []
+        for row in range(batch):
+            scores = [0.02] * IntentMapping.NUM_INTENTS
+            scores[row % IntentMapping.NUM_INTENTS] = 0.8
+            probabilities.extend(scores)
+        return JSONResponse({
+            "model_name": "intent_classifier",
+            "model_version": request.path_params.get("version", "1"),
+            "outputs": [
+                {"name": "intents", "datatype": "INT64", "shape": [batch],
+                 "data": [row % IntentMapping.NUM_INTENTS for row in range(batch)]},
+                {"name": "probabilities", "datatype": "FP32", "shape": [batch, IntentMapping.NUM_INTENTS],
+                 "data": probabilities},
+            ],
+        })
+
+    return Starlette(routes=[
+        Route("/v2/models/{model}/versions/{version}/infer", infer, methods=["POST"]),
+        Route("/v2/models/{model}/infer", infer, methods=["POST"]),
+    ])
+
+
+async def serve(ollama_port: int, triton_port: int, args: argparse.Namespace):
+    servers = [
+        uvicorn.Server(uvicorn.Config(ollama_app(args.first_token_ms, args.token_ms, args.tokens),
+                                      host="127.0.0.1", port=ollama_port, log_level="warning")),
+        uvicorn.Server(uvicorn.Config(triton_app(args.triton_ms, args.triton_item_ms),
+                                      host="127.0.0.1", port=triton_port, log_level="warning")),
+    ]
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ollama-port", type=int, default=11435)
+    parser.add_argument("--triton-port", type=int, default=8765)
+    parser.add_argument("--first-token-ms", type=float, default=300.0, help="Ollama time to first token")
+    parser.add_argument("--token-ms", type=float, default=20.0, help="Ollama time between tokens")
+    parser.add_argument("--tokens", type=int, default=40, help="Tokens per Ollama response")
+    parser.add_argument("--triton-ms", type=float, default=15.0, help="Triton latency per request")
+    parser.add_argument("--triton-item-ms", type=float, default=0.5, help="Additional Triton latency per batch item")
+    args = parser.parse_args()
+    asyncio.run(serve(args.ollama_port, args.triton_port, args))
+
+
+if __name__ == "__main__":
+    main()
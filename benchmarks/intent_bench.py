@@ -0,0 +1,269 @@
+"""
+Microbenchmarks of the intent pipeline on a fixed, versioned utterance corpus.
+
+    python -m benchmarks.intent_bench run --output intent.json
+    python -m benchmarks.intent_bench run --baseline intent_baseline.json --threshold 0.15
+    python -m benchmarks.intent_bench compare intent_baseline.json intent.json
+
+Times TextPreprocessor.preprocess, RuleBasedIntentClassifier.classify, extract_preferences and
+HybridIntentClassifier.batch_classify, then repeats one pass of each under tracemalloc for peak and
+retained memory. BERT is replaced by MockBERTClient, so no Triton server is needed; the spaCy model and
+the NLTK data must be installed as for the app.
+
+Corpus files are never edited once results have been recorded with them; add utterances_v2.txt instead.
+"""
+import argparse
+import gc
+import hashlib
+import os
+import sys
+import time
+import tracemalloc
+import zlib
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+
+from benchmarks import stats
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus", "utterances_v1.txt")
+BATCH_SIZES = [1, 8, 32, 128]
+GROUPS = ["preprocess", "rule_classify", "extract_preferences", "hybrid_batch_classify"]
+
+
+def load_corpus(path: str = CORPUS) -> List[str]:
+    """One utterance per line; blank lines and lines starting with # are skipped"""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+class MockBERTClient:
+    """Stands in for BERTIntentClient with fixed, per-text pseudo-random probabilities"""
+
+    def __init__(self, latency_ms: float = 0.0):
+        """
+        Args:
+            latency_ms: Simulated inference time per call
+        """
+        from app.intent.intent_mapping import IntentMapping
+        self.latency_ms = latency_ms
+        self.num_intents = IntentMapping.NUM_INTENTS
+        self.calls = 0
+        self._rows: Dict[str, np.ndarray] = {}
+
+    def _row(self, text: str) -> np.ndarray:
+        row = self._rows.get(text)
+        if row is None:
+            scores = np.random.default_rng(zlib.crc32(text.encode("utf-8"))).random(self.num_intents)
+            row = self._rows[text] = (scores / scores.sum()).astype(np.float32)
+        return row
+
+    def get_batch_probabilities(self, texts: List[str]) -> np.ndarray:
+        self.calls += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        return np.stack([self._row(text) for text in texts])
+
+
+def batches(items: Sequence, size: int) -> List[Sequence]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def measure(call: Callable, inputs: Sequence, items_per_input: Callable[[object], int], repeat: int) -> Dict[str, float]:
+    """
+    Time call(x) for every input, repeat times over the inputs, then once more under tracemalloc
+    Args:
+        call: Function under test
+        inputs: Arguments, one per call
+        items_per_input: Number of utterances an argument stands for (1, or the batch length)
+        repeat: Passes over the inputs
+    Returns:
+        Per-call latency in microseconds, throughput in utterances per second and memory of one pass
+    """
+    # Untimed pass: loads models and fills the caches the steady state relies on
+    for argument in inputs:
+        call(argument)
+
+    latencies = []
+    items = 0
+    # Like timeit, keep the collector from charging its pauses to whichever call happens to trigger it
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            for argument in inputs:
+                start = time.perf_counter_ns()
+                call(argument)
+                latencies.append(time.perf_counter_ns() - start)
+                items += items_per_input(argument)
+    finally:
+        gc.enable()
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        baseline_size, _ = tracemalloc.get_traced_memory()
+        for argument in inputs:
+            call(argument)
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    retained = after.compare_to(before, "filename")
+
+    values = sorted(latencies)
+    total_ns = sum(values)
+    return {
+        "calls": len(values),
+        "mean_us": total_ns / len(values) / 1000.0,
+        "p50_us": stats.percentile(values, 50) / 1000.0,
+        "p95_us": stats.percentile(values, 95) / 1000.0,
+        "per_item_us": total_ns / items / 1000.0,
+        "items_per_s": items / (total_ns / 1e9) if total_ns else 0.0,
+        "peak_kib": max(0, peak - baseline_size) / 1024.0,
+        "retained_kib": max(0, sum(stat.size_diff for stat in retained)) / 1024.0,
+        "retained_blocks": sum(stat.count_diff for stat in retained),
+    }
+
+
+def bench_preprocess(corpus: List[str], args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    from app.intent.text_preprocessor import TextPreprocessor
+    results = {}
+    for mode in ("fast", "nltk"):
+        preprocessor = TextPreprocessor(mode=mode)
+        results[mode] = measure(preprocessor.preprocess, corpus, lambda _: 1, args.repeat)
+    results["fast_batch"] = measure(TextPreprocessor(mode="fast").preprocess_batch,
+                                    batches(corpus, max(args.batch_sizes)), len, args.repeat)
+    return results
+
+
+def bench_rule_classify(corpus: List[str], args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    from app.intent.rule_based_classifier import RuleBasedIntentClassifier
+    from app.intent.text_preprocessor import TextPreprocessor
+    # The classifier sees preprocessed text in the hybrid pipeline, so that is what it is timed on
+    processed = TextPreprocessor().preprocess_batch(corpus)
+    classifier = RuleBasedIntentClassifier()
+    sessions = [f"session-{i % 64}" for i in range(len(processed))]
+    return {
+        "raw": measure(classifier.classify, corpus, lambda _: 1, args.repeat),
+        "preprocessed": measure(classifier.classify, processed, lambda _: 1, args.repeat),
+        # Interleaved conversations, exercising the per-session context store
+        "sessions": measure(lambda row: classifier.classify(processed[row], session_id=sessions[row]),
+                            range(len(processed)), lambda _: 1, args.repeat),
+    }
+
+
+def bench_extract_preferences(corpus: List[str], args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    from app.utils.nlp_utils import extract_preferences, extract_preferences_batch
+    results = {"single": measure(extract_preferences, corpus, lambda _: 1, args.repeat)}
+    for size in args.batch_sizes:
+        if size > 1:
+            results[f"b{size}"] = measure(extract_preferences_batch, batches(corpus, size), len, args.repeat)
+    return results
+
+
+def bench_hybrid(corpus: List[str], args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    from app.intent.hybrid_classifier import HybridIntentClassifier
+    from app.intent.intent_cache import IntentCache
+
+    def classifier(cache: IntentCache) -> HybridIntentClassifier:
+        # Nothing listens on port 1; the Triton clients are built but never called
+        hybrid = HybridIntentClassifier(triton_url="127.0.0.1:1", cache=cache)
+        hybrid.bert_client = MockBERTClient(args.bert_latency_ms)
+        return hybrid
+
+    # A cache that holds nothing makes every call a miss: rules and BERT run for every text
+    uncached = classifier(IntentCache(max_entries=0))
+    cached = classifier(IntentCache())
+    results = {}
+    for size in args.batch_sizes:
+        inputs = batches(corpus, size)
+        results[f"b{size}"] = measure(uncached.batch_classify, inputs, len, args.repeat)
+        results[f"b{size}_cached"] = measure(cached.batch_classify, inputs, len, args.repeat)
+    return results
+
+
+BENCHMARKS = {
+    "preprocess": bench_preprocess,
+    "rule_classify": bench_rule_classify,
+    "extract_preferences": bench_extract_preferences,
+    "hybrid_batch_classify": bench_hybrid,
+}
+
+
+def preprocess_mismatches(corpus: List[str]) -> int:
+    """Number of corpus texts where the fast preprocessing differs from the word_tokenize pipeline"""
+    from app.intent.text_preprocessor import TextPreprocessor
+    mismatches = TextPreprocessor().compare_with_nltk(corpus)
+    for text, fast, reference in mismatches:
+        print(f"MISMATCH {text!r}: fast {fast!r} != nltk {reference!r}", file=sys.stderr)
+    return len(mismatches)
+
+
+def run(args: argparse.Namespace) -> int:
+    unknown = [group for group in args.groups if group not in BENCHMARKS]
+    if unknown:
+        raise SystemExit(f"Unknown benchmarks: {', '.join(unknown)} (choose from {', '.join(BENCHMARKS)})")
+
+    corpus = load_corpus(args.corpus)
+    with open(args.corpus, "rb") as f:
+        corpus_hash = hashlib.sha256(f.read()).hexdigest()[:16]
+
+    results = {}
+    for group in args.groups:
+        results[group] = BENCHMARKS[group](corpus, args)
+        for variant, metrics in results[group].items():
+            print(f"{group:22s} {variant:14s} {metrics['items_per_s']:10.0f} utt/s  "
+                  f"p50 {metrics['p50_us']:9.1f}us  p95 {metrics['p95_us']:9.1f}us  "
+                  f"peak {metrics['peak_kib']:8.1f}KiB  retained {metrics['retained_kib']:7.1f}KiB", flush=True)
+
+    mismatches = preprocess_mismatches(corpus)
+    report = {
+        "meta": dict(stats.environment(), kind="intent_bench", corpus=os.path.basename(args.corpus),
+                     corpus_sha256=corpus_hash, utterances=len(corpus), preprocess_mismatches=mismatches,
+                     config={key: value for key, value in vars(args).items()
+                             if key not in ("func", "output", "baseline", "corpus")}),
+        "results": results,
+    }
+    if args.output:
+        stats.save(args.output, report)
+
+    status = 1 if mismatches else 0
+    if args.baseline:
+        baseline = stats.load(args.baseline)
+        if baseline.get("meta", {}).get("corpus_sha256") != corpus_hash:
+            print("WARNING: the baseline was recorded on a different corpus", file=sys.stderr)
+        status = max(status, stats.report_regressions(baseline, report, args.threshold))
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the microbenchmarks")
+    run_parser.add_argument("--corpus", default=CORPUS)
+    run_parser.add_argument("--groups", nargs="+", default=GROUPS)
+    run_parser.add_argument("--batch-sizes", nargs="+", type=int, default=BATCH_SIZES)
+    run_parser.add_argument("--repeat", type=int, default=5, help="Timed passes over the corpus")
+    run_parser.add_argument("--bert-latency-ms", type=float, default=0.0, help="Simulated BERT time per call")
+    run_parser.add_argument("--output", help="Write the JSON report here")
+    run_parser.add_argument("--baseline", help="Compare against this report and fail on regressions")
+    run_parser.add_argument("--threshold", type=float, default=0.10)
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser("compare", help="Compare two JSON reports")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.10)
+    compare_parser.set_defaults(func=lambda args: stats.report_regressions(
+        stats.load(args.baseline), stats.load(args.current), args.threshold))
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+End-to-end load test of app.main:app against local stand-ins for MongoDB, Triton and Ollama.
+
+Run every route at several concurrency levels and write a JSON report:
+
+    python -m benchmarks.load_test run --in-memory --concurrency 1 8 32 --requests 300 --output bench.json
+    python -m benchmarks.load_test run --mongod /usr/bin/mongod ...      # throwaway local mongod
+    python -m benchmarks.load_test run --mongo-url mongodb://localhost:27017 ...
+
+Compare two reports; exits with status 1 when a latency or throughput metric regressed:
+
+    python -m benchmarks.load_test compare baseline.json bench.json --threshold 0.1
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks import stats
+from benchmarks.seed import MESSAGES, generate
+
+RequestSpec = Tuple[str, str, Optional[dict]]
+
+
+def route_specs(data: Dict[str, list]) -> Dict[str, Callable[[int], RequestSpec]]:
+    """
+    Request factories per route; the i-th request of a run cycles through the seeded ids
+    Returns:
+        Route name -> function(i) returning (method, path, json body)
+    """
+    restaurants = data["restaurants"]
+    menus = sorted({(str(dish["restaurantId"]), dish["cuisine"]) for dish in data["dishes"]})
+    users = [user["_id"] for user in data["users"]]
+
+    def restaurant(i: int) -> str:
+        return str(restaurants[i % len(restaurants)]["_id"])
+
+    return {
+        "menu": lambda i: ("GET", "/api/menu/{}/{}".format(*menus[i % len(menus)]), None),
+        "menu_page": lambda i: ("GET", "/api/menu/{}/{}/page?limit=20".format(*menus[i % len(menus)]), None),
+        "cuisines": lambda i: ("GET", f"/api/cuisines/{restaurant(i)}", None),
+        "restaurant": lambda i: ("GET", f"/api/restaurant/{restaurant(i)}", None),
+        "chat": lambda i: ("POST", f"/api/chat/{restaurant(i)}", {"message": MESSAGES[i % len(MESSAGES)]}),
+        "chat_stream": lambda i: ("POST", f"/api/chat/{restaurant(i)}/stream",
+                                  {"message": MESSAGES[i % len(MESSAGES)]}),
+        "ai_prompts": lambda i: ("GET", f"/api/ai-prompts/{restaurant(i)}", None),
+        "recommendation": lambda i: ("GET", f"/recommendation/{users[i % len(users)]}", None),
+    }
+
+
+DEFAULT_ROUTES = ["menu", "cuisines", "chat", "ai_prompts", "recommendation"]
+
+
+async def drive(base_url: str, spec: Callable[[int], RequestSpec], concurrency: int, requests: int,
+                timeout: float) -> Dict[str, float]:
+    """Send `requests` requests with `concurrency` clients in flight and summarize the latencies"""
+    latencies: List[float] = []
+    errors = 0
+    counter = itertools.count()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        async def worker():
+            nonlocal errors
+            while True:
+                i = next(counter)
+                if i >= requests:
+                    return
+                method, path, body = spec(i)
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                    await response.aread()
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                latencies.append(time.perf_counter() - start)
+                errors += failed
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return stats.summarize_latencies(latencies, errors, elapsed)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(check: Callable[[], bool], timeout: float, what: str):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if check():
+                return
+        except Exception:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{what} did not come up within {timeout:.0f}s")
+
+
+def http_ok(url: str) -> bool:
+    return httpx.get(url, timeout=1.0).status_code < 500
+
+
+def port_open(port: int) -> bool:
+    with socket.socket() as sock:
+        return sock.connect_ex(("127.0.0.1", port)) == 0
+
+
+class Stack:
+    """Starts and stops the fake backends, an optional mongod and the app, each in its own process"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.processes: List[subprocess.Popen] = []
+        self.tempdir: Optional[str] = None
+        self.app_url = ""
+
+    def _spawn(self, command: List[str], env: Optional[dict] = None) -> subprocess.Popen:
+        process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL,
+                                   stderr=None if self.args.verbose else subprocess.DEVNULL)
+        self.processes.append(process)
+        return process
+
+    def start(self):
+        args = self.args
+        ollama_port, triton_port, app_port = free_port(), free_port(), free_port()
+        self._spawn([sys.executable, "-m", "benchmarks.fakes", "--ollama-port", str(ollama_port),
+                     "--triton-port", str(triton_port), "--first-token-ms", str(args.ollama_first_token_ms),
+                     "--token-ms", str(args.ollama_token_ms), "--triton-ms", str(args.triton_ms)])
+        wait_for(lambda: port_open(ollama_port) and port_open(triton_port), 30, "Fake Ollama/Triton")
+
+        mongo_url = args.mongo_url or "mongodb://127.0.0.1:1"
+        if args.mongod:
+            self.tempdir = tempfile.mkdtemp(prefix="bench-mongod-")
+            mongo_port = free_port()
+            self._spawn([args.mongod, "--dbpath", self.tempdir, "--port", str(mongo_port),
+                         "--bind_ip", "127.0.0.1", "--quiet"])
+            wait_for(lambda: port_open(mongo_port), 60, "mongod")
+            mongo_url = f"mongodb://127.0.0.1:{mongo_port}"
+
+        env = dict(os.environ,
+                   MONGODB_URL=mongo_url,
+                   OLLAMA_API=f"http://127.0.0.1:{ollama_port}/api/generate",
+                   TRITON_URL=f"127.0.0.1:{triton_port}",
+                   ACCESS_LOG_SAMPLE_RATE="0",
+                   DB_PLAN_CHECK="off" if args.in_memory else os.environ.get("DB_PLAN_CHECK", "warn"))
+        command = [sys.executable, "-m", "benchmarks.serve_app", "--port", str(app_port), "--seed", str(args.seed),
+                   "--restaurants", str(args.restaurants), "--dishes", str(args.dishes), "--users", str(args.users)]
+        if args.in_memory:
+            command.append("--in-memory")
+        self._spawn(command, env=env)
+        self.app_url = f"http://127.0.0.1:{app_port}"
+        wait_for(lambda: http_ok(self.app_url + "/health"), 120, "The app")
+
+    def stop(self):
+        for process in reversed(self.processes):
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if self.tempdir:
+            shutil.rmtree(self.tempdir, ignore_errors=True)
+
+
+async def run_all(base_url: str, specs: Dict[str, Callable[[int], RequestSpec]], args: argparse.Namespace) -> Dict:
+    results = {}
+    for route in args.routes:
+        results[route] = {}
+        for concurrency in args.concurrency:
+            # Warm caches and connections so the measurement reflects steady state
+            await drive(base_url, specs[route], concurrency, min(args.warmup, args.requests), args.timeout)
+            summary = await drive(base_url, specs[route], concurrency, args.requests, args.timeout)
+            results[route][f"c{concurrency}"] = summary
+            print(f"{route:15s} c={concurrency:<4d} {summary['throughput_rps']:8.1f} req/s  "
+                  f"p50 {summary['p50_ms']:7.1f}ms  p95 {summary['p95_ms']:7.1f}ms  "
+                  f"p99 {summary['p99_ms']:7.1f}ms  errors {summary['errors']}", flush=True)
+    return results
+
+
+def run(args: argparse.Namespace) -> int:
+    if not (args.in_memory or args.mongod or args.mongo_url):
+        args.in_memory = True
+    data = generate(args.seed, args.restaurants, args.dishes, args.users)
+    specs = route_specs(data)
+    unknown = [route for route in args.routes if route not in specs]
+    if unknown:
+        raise SystemExit(f"Unknown routes: {', '.join(unknown)} (choose from {', '.join(specs)})")
+
+    stack = Stack(args)
+    try:
+        if args.url:
+            stack.app_url = args.url.rstrip("/")
+        else:
+            stack.start()
+        results = asyncio.run(run_all(stack.app_url, specs, args))
+    finally:
+        stack.stop()
+
+    report = {
+        "meta": dict(stats.environment(), kind="load_test", config={
+            key: value for key, value in vars(args).items() if key not in ("func", "output", "baseline")
+        }),
+        "results": results,
+    }
+    if args.output:
+        stats.save(args.output, report)
+    if args.baseline:
+        return stats.report_regressions(stats.load(args.baseline), report, args.threshold)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Start the stack and measure the routes")
+    backend = run_parser.add_mutually_exclusive_group()
+    backend.add_argument("--in-memory", action="store_true", help="mongomock-motor inside the app (default)")
+    backend.add_argument("--mongod", help="Path of a mongod binary to start on a temporary data directory")
+    backend.add_argument("--mongo-url", help="Existing MongoDB; the benchmark documents are upserted into it")
+    backend.add_argument("--url", help="Measure an already running app seeded with the same --seed")
+    run_parser.add_argument("--routes", nargs="+", default=DEFAULT_ROUTES)
+    run_parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    run_parser.add_argument("--requests", type=int, default=300, help="Requests per route and concurrency level")
+    run_parser.add_argument("--warmup", type=int, default=20)
+    run_parser.add_argument("--timeout", type=float, default=30.0)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--restaurants", type=int, default=20)
+    run_parser.add_argument("--dishes", type=int, default=60)
+    run_parser.add_argument("--users", type=int, default=50)
+    run_parser.add_argument("--ollama-first-token-ms", type=float, default=300.0)
+    run_parser.add_argument("--ollama-token-ms", type=float, default=20.0)
+    run_parser.add_argument("--triton-ms", type=float, default=15.0)
+    run_parser.add_argument("--output", help="Write the JSON report here")
+    run_parser.add_argument("--baseline", help="Compare against this report and fail on regressions")
+    run_parser.add_argument("--threshold", type=float, default=0.10)
+    run_parser.add_argument("--verbose", action="store_true", help="Show the output of the started processes")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser("compare", help="Compare two JSON reports")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.10)
+    compare_parser.set_defaults(func=lambda args: stats.report_regressions(
+        stats.load(args.baseline), stats.load(args.current), args.threshold))
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
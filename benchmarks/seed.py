@@ -0,0 +1,103 @@
+import random
+from typing import Any, Dict, List
+
+from bson import ObjectId
+from pymongo import ReplaceOne
+
+CUISINES = ["italian", "chinese", "indian", "mexican", "japanese", "thai", "french", "greek"]
+INGREDIENTS = ["garlic", "onion", "tomato", "basil", "mozzarella", "chicken", "beef", "pork", "shrimp", "salmon",
+               "tofu", "rice", "noodles", "peanuts", "cashews", "coriander", "chili", "lime", "coconut milk",
+               "mushrooms", "spinach", "chickpeas", "lentils", "feta", "olives", "eggplant", "cream", "butter"]
+DISH_WORDS = {
+    "italian": ["Lasagna", "Risotto", "Carbonara", "Margherita", "Gnocchi", "Tiramisu", "Osso Buco"],
+    "chinese": ["Kung Pao Chicken", "Mapo Tofu", "Dumplings", "Chow Mein", "Peking Duck", "Fried Rice"],
+    "indian": ["Butter Chicken", "Chana Masala", "Palak Paneer", "Biryani", "Dal Makhani", "Samosa"],
+    "mexican": ["Tacos al Pastor", "Enchiladas", "Guacamole", "Chiles Rellenos", "Pozole", "Quesadilla"],
+    "japanese": ["Ramen", "Sushi Platter", "Katsu Curry", "Tempura", "Okonomiyaki", "Miso Soup"],
+    "thai": ["Pad Thai", "Green Curry", "Tom Yum", "Massaman Curry", "Som Tam", "Mango Sticky Rice"],
+    "french": ["Coq au Vin", "Ratatouille", "Bouillabaisse", "Croque Monsieur", "Creme Brulee", "Quiche"],
+    "greek": ["Moussaka", "Souvlaki", "Spanakopita", "Greek Salad", "Gyros", "Baklava"],
+}
+DIETARY_FLAGS = ["isVegetarian", "isVegan", "isGlutenFree", "isDairyFree", "isHalal", "isKosher"]
+
+# Guest messages in the style of the ai_prompts shown by the frontend
+MESSAGES = [
+    "What do you suggest for a light meal?",
+    "What's good for someone who likes spicy food?",
+    "Can you recommend a vegetarian option?",
+    "What's your most popular dish?",
+    "What's a good choice for a quick bite?",
+    "I want something cheap and vegan, no peanuts please",
+    "Do you have gluten-free Italian dishes?",
+    "Something mild for a family dinner",
+    "We're celebrating an anniversary, what's expensive and special?",
+    "I'd like a very spicy Thai curry without shrimp",
+    "Any affordable Indian food that is halal?",
+    "Can I book a table for four tonight?",
+]
+
+
+def _object_id(rng: random.Random) -> ObjectId:
+    return ObjectId(bytes(rng.getrandbits(8) for _ in range(12)))
+
+
+def generate(seed: int = 42, restaurants: int = 20, dishes_per_restaurant: int = 60,
+             users: int = 50) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Build a deterministic data set; the same seed always yields the same documents and ids
+    Returns:
+        Documents per collection: "restaurants", "dishes" and "users"
+    """
+    rng = random.Random(seed)
+    data = {"restaurants": [], "dishes": [], "users": []}
+
+    for r in range(restaurants):
+        restaurant_id = _object_id(rng)
+        cuisines = rng.sample(CUISINES, rng.randint(1, 3))
+        data["restaurants"].append({
+            "_id": restaurant_id,
+            "name": f"Benchmark Bistro {r}",
+            "cuisine": cuisines,
+            "address": f"{rng.randint(1, 300)} Market Street",
+        })
+        for d in range(dishes_per_restaurant):
+            cuisine = rng.choice(cuisines)
+            vegan = rng.random() < 0.15
+            data["dishes"].append({
+                "_id": _object_id(rng),
+                "restaurantId": restaurant_id,
+                "name": f"{rng.choice(DISH_WORDS[cuisine])} #{d}",
+                "description": " ".join(rng.choice(INGREDIENTS) for _ in range(rng.randint(6, 18))).capitalize()
+                               + ", cooked to order and served with the chef's seasonal garnish.",
+                "price": round(rng.uniform(6, 48), 2),
+                "image": f"https://images.example.com/dishes/{r}/{d}.jpg",
+                "cuisine": cuisine,
+                "popularity": rng.randint(0, 1000) if rng.random() < 0.95 else None,
+                "spiciness": rng.randint(0, 4),
+                "ingredients": rng.sample(INGREDIENTS, rng.randint(3, 8)),
+                "dietaryFlags": {flag: (vegan if flag in ("isVegan", "isVegetarian") and vegan else rng.random() < 0.3)
+                                 for flag in DIETARY_FLAGS},
+            })
+
+    for u in range(users):
+        data["users"].append({
+            "_id": f"bench-user-{u:04d}",
+            "name": f"Guest {u}",
+            "preferences": {
+                "favoriteCuisines": rng.sample(CUISINES, rng.randint(1, 3)),
+                "maxPrice": rng.choice([15, 20, 30, 50]),
+            },
+        })
+    return data
+
+
+async def seed_database(db, data: Dict[str, List[Dict[str, Any]]]):
+    """
+    Upsert the documents by _id, so seeding is idempotent and leaves other documents alone
+    Args:
+        db: Motor (or mongomock-motor) database
+        data: Result of generate
+    """
+    for collection, documents in data.items():
+        if documents:
+            await db[collection].bulk_write([ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in documents])
@@ -0,0 +1,48 @@
+"""
+Run app.main:app for benchmarking, seeded with the benchmark data set.
+
+    python -m benchmarks.serve_app --port 8100 --in-memory
+
+--in-memory needs the mongomock-motor package. Without the flag the app uses MONGODB_URL as usual and the
+benchmark documents are upserted there.
+"""
+import argparse
+
+import uvicorn
+
+from benchmarks.seed import generate, seed_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--in-memory", action="store_true", help="Use mongomock-motor instead of MongoDB")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--restaurants", type=int, default=20)
+    parser.add_argument("--dishes", type=int, default=60, help="Dishes per restaurant")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--no-seed", action="store_true", help="Use the data already in the database")
+    args = parser.parse_args()
+
+    import app.database as database
+    if args.in_memory:
+        from mongomock_motor import AsyncMongoMockClient
+        # Must happen before app.main imports the routers, which bind database.db
+        database.db = AsyncMongoMockClient().restaurant_app
+
+    from app.main import app
+
+    if not args.no_seed:
+        data = generate(args.seed, args.restaurants, args.dishes, args.users)
+
+        async def seed():
+            await seed_database(database.db, data)
+
+        app.add_event_handler("startup", seed)
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import json
+import math
+import os
+import platform
+import subprocess
+import time
+from typing import Any, Dict, List, Sequence
+
+# Metric name suffixes where a bigger number is worse / better; anything else is informational
+LOWER_IS_BETTER = ("_ms", "_us", "_kib", "_bytes", "error_rate")
+HIGHER_IS_BETTER = ("_rps", "_per_s")
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize_latencies(latencies: List[float], errors: int, elapsed: float) -> Dict[str, float]:
+    """
+    Args:
+        latencies: Seconds per completed request
+        errors: Number of failed requests
+        elapsed: Wall-clock seconds of the whole run
+    Returns:
+        Throughput and latency percentiles in milliseconds
+    """
+    values = sorted(latencies)
+    total = len(values)
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": errors / total if total else 0.0,
+        "throughput_rps": total / elapsed if elapsed > 0 else 0.0,
+        "mean_ms": 1000.0 * sum(values) / total if total else 0.0,
+        "p50_ms": 1000.0 * percentile(values, 50),
+        "p95_ms": 1000.0 * percentile(values, 95),
+        "p99_ms": 1000.0 * percentile(values, 99),
+        "max_ms": 1000.0 * values[-1] if values else 0.0,
+    }
+
+
+def environment() -> Dict[str, Any]:
+    """Facts about the machine and checkout a result was produced on"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def save(path: str, report: Dict[str, Any]):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.10) -> List[str]:
+    """
+    Compare two reports of the form {"results": {group: {variant: {metric: value}}}}
+    Args:
+        baseline: Earlier report
+        current: New report
+        threshold: Relative change tolerated before a metric counts as a regression
+    Returns:
+        One human-readable line per regressed metric
+    """
+    regressions = []
+    for group, variants in current.get("results", {}).items():
+        for variant, metrics in variants.items():
+            reference = baseline.get("results", {}).get(group, {}).get(variant)
+            if not reference:
+                continue
+            for metric, value in metrics.items():
+                old = reference.get(metric)
+                if not isinstance(value, (int, float)) or not isinstance(old, (int, float)):
+                    continue
+                if metric.endswith(LOWER_IS_BETTER) and value > old * (1 + threshold) and value - old > 1e-9:
+                    regressions.append(f"{group}/{variant} {metric}: {old:.4g} -> {value:.4g}")
+                elif metric.endswith(HIGHER_IS_BETTER) and value < old * (1 - threshold):
+                    regressions.append(f"{group}/{variant} {metric}: {old:.4g} -> {value:.4g}")
+    return regressions
+
+
+def report_regressions(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> int:
+    """Print the regressions of current against baseline; returns the exit status, 1 if any metric regressed"""
+    regressions = compare(baseline, current, threshold)
+    for line in regressions:
+        print("REGRESSION", line)
+    if not regressions:
+        print(f"No regressions beyond {threshold:.0%}")
+    return 1 if regressions else 0
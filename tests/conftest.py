@@ -0,0 +1,37 @@
+import pytest
+
+
+class FakeClock:
+    """Stands in for the time module of the module under test; only monotonic() is provided"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+class FakeLemmatizer:
+    """Stands in for WordNetLemmatizer, which needs NLTK data that tests cannot rely on"""
+
+    def lemmatize(self, token):
+        return token
+
+
+@pytest.fixture
+def nlp_models(monkeypatch):
+    """Blank spaCy pipeline and minimal NLTK resources in the model registry, so classifiers build offline"""
+    import spacy
+    from app.utils.model_registry import model_registry
+
+    monkeypatch.setitem(model_registry._models, "spacy", spacy.blank("en"))
+    monkeypatch.setitem(model_registry._models, "nltk", {
+        "lemmatizer": FakeLemmatizer(),
+        "stop_words": {"a", "an", "the", "i", "we", "to", "please"},
+    })
+    return model_registry
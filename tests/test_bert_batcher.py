@@ -0,0 +1,110 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.intent.bert_batcher import BERTMicroBatcher
+from app.intent.intent_mapping import IntentMapping
+
+
+def probability_row(text: str) -> np.ndarray:
+    row = np.zeros(IntentMapping.NUM_INTENTS)
+    row[len(text) % IntentMapping.NUM_INTENTS] = 1.0
+    return row
+
+
+class FakeAsyncClient:
+    def __init__(self, latency: float = 0.01, available: bool = True):
+        self.latency = latency
+        self.available = available
+        self.calls = []
+
+    async def get_batch_probabilities(self, texts):
+        self.calls.append(list(texts))
+        await asyncio.sleep(self.latency)
+        if not self.available:
+            return None
+        return np.stack([probability_row(text) for text in texts])
+
+
+class FakeSyncClient:
+    def __init__(self):
+        self.calls = []
+
+    def get_batch_probabilities(self, texts):
+        self.calls.append(list(texts))
+        return np.stack([probability_row(text) for text in texts])
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_request():
+    client = FakeAsyncClient()
+    batcher = BERTMicroBatcher(client, max_batch_size=32, max_wait_ms=5)
+    texts = ["a", "bb", "ccc", "dddd"]
+
+    rows = await asyncio.gather(*[batcher.get_batch_probabilities([text]) for text in texts])
+
+    assert client.calls == [texts]
+    for text, row in zip(texts, rows):
+        np.testing.assert_array_equal(row[0], probability_row(text))
+    assert batcher.stats()["batches"] == 1
+    assert batcher.stats()["requests"] == 4
+
+
+@pytest.mark.asyncio
+async def test_full_batch_dispatches_without_waiting():
+    client = FakeAsyncClient(latency=0)
+    batcher = BERTMicroBatcher(client, max_batch_size=2, max_wait_ms=10000)
+
+    result = await asyncio.wait_for(batcher.get_batch_probabilities(["a", "b", "c", "d"]), 1.0)
+
+    assert client.calls == [["a", "b"], ["c", "d"]]
+    assert result.shape == (4, IntentMapping.NUM_INTENTS)
+
+
+@pytest.mark.asyncio
+async def test_unavailable_backend_gives_none_and_empty_intents():
+    batcher = BERTMicroBatcher(FakeAsyncClient(available=False), max_wait_ms=1)
+
+    assert await batcher.get_batch_probabilities(["a", "b"]) is None
+    assert await batcher.get_intent("a") == {}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_affect_the_batch():
+    client = FakeAsyncClient(latency=0.05)
+    batcher = BERTMicroBatcher(client, max_wait_ms=1)
+
+    cancelled = asyncio.ensure_future(batcher.get_batch_probabilities(["gone"]))
+    kept = asyncio.ensure_future(batcher.get_batch_probabilities(["kept"]))
+    await asyncio.sleep(0.01)
+    cancelled.cancel()
+
+    np.testing.assert_array_equal((await kept)[0], probability_row("kept"))
+    assert client.calls == [["gone", "kept"]]
+    await batcher.close()
+
+
+@pytest.mark.asyncio
+async def test_caller_cancelled_while_queued_is_not_sent():
+    client = FakeAsyncClient(latency=0)
+    batcher = BERTMicroBatcher(client, max_wait_ms=20)
+
+    cancelled = asyncio.ensure_future(batcher.get_intent("gone"))
+    kept = asyncio.ensure_future(batcher.get_intent("kept"))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    assert await kept == IntentMapping.to_dict(probability_row("kept"))
+    assert client.calls == [["kept"]]
+
+
+@pytest.mark.asyncio
+async def test_sync_client_runs_in_executor():
+    client = FakeSyncClient()
+    batcher = BERTMicroBatcher(client, max_wait_ms=1)
+
+    rows = await asyncio.gather(batcher.get_intent("a"), batcher.get_intent("bb"))
+
+    assert client.calls == [["a", "bb"]]
+    assert rows == [IntentMapping.to_dict(probability_row("a")), IntentMapping.to_dict(probability_row("bb"))]
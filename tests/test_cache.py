@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from app.utils import cache as cache_module
+from app.utils.cache import AsyncTTLCache
+
+
+@pytest.fixture(autouse=True)
+def cache_clock(monkeypatch, clock):
+    monkeypatch.setattr(cache_module, "time", clock)
+
+
+class Loader:
+    def __init__(self, value="restaurant", delay: float = 0.0):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.value
+
+
+@pytest.mark.asyncio
+async def test_loads_once_then_hits():
+    cache = AsyncTTLCache()
+    loader = Loader()
+
+    assert await cache.get_or_load("r1", loader) == "restaurant"
+    assert await cache.get_or_load("r1", loader) == "restaurant"
+    assert loader.calls == 1
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load():
+    cache = AsyncTTLCache()
+    loader = Loader(delay=0.01)
+
+    results = await asyncio.gather(*[cache.get_or_load("r1", loader) for _ in range(10)])
+
+    assert results == ["restaurant"] * 10
+    assert loader.calls == 1
+    assert cache.stats()["shared_loads"] == 9
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_the_shared_load():
+    cache = AsyncTTLCache()
+    loader = Loader(delay=0.02)
+
+    first = asyncio.ensure_future(cache.get_or_load("r1", loader))
+    second = asyncio.ensure_future(cache.get_or_load("r1", loader))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "restaurant"
+    assert cache.peek("r1") == "restaurant"
+
+
+@pytest.mark.asyncio
+async def test_expired_entry_is_reloaded(clock):
+    cache = AsyncTTLCache(ttl=60)
+    loader = Loader()
+    await cache.get_or_load("r1", loader)
+
+    clock.now += 61
+    await cache.get_or_load("r1", loader)
+    assert loader.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_none_and_failures_are_not_cached():
+    cache = AsyncTTLCache()
+    missing = Loader(value=None)
+    assert await cache.get_or_load("r1", missing) is None
+    assert await cache.get_or_load("r1", missing) is None
+    assert missing.calls == 2
+
+    async def failing():
+        raise RuntimeError("mongo down")
+
+    with pytest.raises(RuntimeError):
+        await cache.get_or_load("r2", failing)
+    assert await cache.get_or_load("r2", Loader()) == "restaurant"
+
+
+@pytest.mark.asyncio
+async def test_invalidate_during_load_discards_the_result():
+    cache = AsyncTTLCache()
+    stale = asyncio.ensure_future(cache.get_or_load("r1", Loader("old", delay=0.01)))
+    await asyncio.sleep(0)
+    cache.invalidate("r1")
+
+    assert await stale == "old"
+    assert cache.peek("r1") is None
+    assert await cache.get_or_load("r1", Loader("new")) == "new"
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AsyncTTLCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.peek("a")
+    cache.put("c", 3)
+
+    assert cache.peek("b") is None
+    assert cache.peek("a") == 1
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from app.services.chat_pipeline import CHAT_NLP_DEADLINE, ChatStages
+from app.services.intent_service import INTENT_BATCH_WAIT_MS, INTENT_BERT_TIMEOUT
+
+
+async def answer(value, delay: float = 0.0):
+    await asyncio.sleep(delay)
+    return value
+
+
+async def fail():
+    raise RuntimeError("backend down")
+
+
+@pytest.mark.asyncio
+async def test_stage_result_and_timing():
+    stages = ChatStages()
+
+    assert await stages.run("menu", answer("snapshot"), 1.0, fallback=lambda: "fallback") == "snapshot"
+    assert stages.fallbacks == []
+    assert "menu" in stages.timings
+
+
+@pytest.mark.asyncio
+async def test_missed_deadline_uses_the_fallback():
+    stages = ChatStages()
+
+    result = await stages.run("intent", answer("bert", delay=1.0), 0.01, fallback=lambda: "rules")
+
+    assert result == "rules"
+    assert stages.fallbacks == ["intent"]
+    assert stages.timings["intent"] < 500
+
+
+@pytest.mark.asyncio
+async def test_failed_stage_uses_the_fallback_or_none():
+    stages = ChatStages()
+
+    assert await stages.run("preferences", fail(), 1.0, fallback=lambda: {}) == {}
+    assert await stages.run("restaurant", fail(), 1.0) is None
+    assert stages.fallbacks == ["preferences", "restaurant"]
+
+
+@pytest.mark.asyncio
+async def test_stages_run_concurrently():
+    stages = ChatStages()
+
+    results = await asyncio.wait_for(asyncio.gather(
+        stages.run("a", answer(1, delay=0.1), 1.0),
+        stages.run("b", answer(2, delay=0.1), 1.0),
+    ), 0.19)
+
+    assert results == [1, 2]
+    assert set(stages.report(0.0)["timings"]) == {"a", "b", "total"}
+
+
+def test_bert_timeout_fits_in_the_intent_stage_deadline():
+    assert INTENT_BERT_TIMEOUT + INTENT_BATCH_WAIT_MS / 1000.0 < CHAT_NLP_DEADLINE
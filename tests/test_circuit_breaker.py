@@ -0,0 +1,104 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.intent import circuit_breaker
+from app.intent.bert_client import AsyncBERTIntentClient
+from app.intent.circuit_breaker import CircuitBreaker
+from app.intent.intent_mapping import IntentMapping
+
+
+@pytest.fixture(autouse=True)
+def breaker_clock(monkeypatch, clock):
+    # Only the breaker's clock; the event loop keeps the real one
+    monkeypatch.setattr(circuit_breaker, "time", clock)
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10)
+    for _ in range(2):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+
+    clock.now += 10
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    clock.now += 10
+    assert breaker.allow_request()
+
+
+def test_lost_probe_is_replaced_after_reset_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.allow_request()
+
+    # The probe never reports back
+    clock.now += 9
+    assert not breaker.allow_request()
+    clock.now += 1
+    assert breaker.allow_request()
+
+
+class SlowBERTClient(AsyncBERTIntentClient):
+    def __init__(self, breaker: CircuitBreaker):
+        super().__init__("127.0.0.1:1", timeout=5.0, breaker=breaker)
+        self.delay = 1.0
+
+    async def _infer(self, texts):
+        await asyncio.sleep(self.delay)
+        return np.ones((len(texts), IntentMapping.NUM_INTENTS))
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_does_not_leave_the_circuit_half_open(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    client = SlowBERTClient(breaker)
+    breaker.record_failure()
+    clock.now += 10
+
+    # The probe is cancelled by the caller's deadline
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(client.get_batch_probabilities(["probe"]), 0.01)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # After the next cool-down a new probe goes through and closes the circuit
+    clock.now += 10
+    client.delay = 0
+    assert (await client.get_batch_probabilities(["probe"])).shape == (1, IntentMapping.NUM_INTENTS)
+    assert breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,83 @@
+import pytest
+
+from app.intent import context_store
+from app.intent.context_store import ConversationContextStore
+
+MENU = frozenset({"menu"})
+PRICE = frozenset({"price"})
+SPICY = frozenset({"spicy"})
+
+
+@pytest.fixture(autouse=True)
+def store_clock(monkeypatch, clock):
+    monkeypatch.setattr(context_store, "time", clock)
+
+
+def test_record_returns_the_previous_turn_of_the_session():
+    store = ConversationContextStore()
+
+    assert store.record("s1", MENU) is None
+    assert store.record("s1", PRICE) == MENU
+    assert store.record("s1", SPICY) == PRICE
+
+
+def test_sessions_are_isolated():
+    store = ConversationContextStore()
+    store.record("s1", MENU)
+
+    assert store.record("s2", PRICE) is None
+    assert store.record("s1", SPICY) == MENU
+
+
+def test_idle_sessions_expire(clock):
+    store = ConversationContextStore(idle_ttl=60)
+    store.record("s1", MENU)
+
+    clock.now += 61
+    assert store.record("s1", PRICE) is None
+    assert store.stats()["expirations"] == 1
+
+
+def test_least_recently_active_session_is_evicted():
+    store = ConversationContextStore(max_sessions=2)
+    store.record("s1", MENU)
+    store.record("s2", MENU)
+    store.record("s1", PRICE)
+    store.record("s3", MENU)
+
+    assert store.stats()["sessions"] == 2
+    assert store.stats()["evictions"] == 1
+    assert store.record("s1", SPICY) == PRICE
+    assert store.record("s2", PRICE) is None
+
+
+def test_memory_stays_bounded_with_many_sessions():
+    store = ConversationContextStore(max_turns=3, max_bytes=20000)
+    for session in range(1000):
+        for hits in (MENU, PRICE, SPICY, MENU):
+            store.record(session, hits)
+
+    stats = store.stats()
+    assert 0 < stats["bytes"] <= 20000
+    assert stats["sessions"] < 1000
+
+
+def test_ring_buffer_keeps_the_byte_count_exact():
+    store = ConversationContextStore(max_turns=2)
+    store.record("s1", MENU)
+    one_turn = store.stats()["bytes"]
+    for hits in (PRICE, SPICY, MENU, PRICE):
+        store.record("s1", hits)
+
+    assert store.stats()["bytes"] - one_turn == ConversationContextStore._turn_size(MENU)
+
+
+def test_forget_and_clear():
+    store = ConversationContextStore()
+    store.record("s1", MENU)
+    store.record("s2", MENU)
+
+    store.forget("s1")
+    assert store.record("s1", PRICE) is None
+    store.clear()
+    assert store.stats() == {"sessions": 0, "bytes": 0, "evictions": 0, "expirations": 0}
@@ -0,0 +1,279 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+import pytest_asyncio
+
+from app.intent.hybrid_classifier import HybridIntentClassifier
+from app.intent.intent_mapping import IntentMapping
+
+DECISIVE = "reserve a table"
+UNDECIDED = "food"
+
+
+class CountingBERTClient:
+    """Sync BERT client returning fixed probabilities and recording every request"""
+
+    def __init__(self, probabilities=None):
+        self.probabilities = probabilities
+        self.calls = []
+
+    def get_batch_probabilities(self, texts):
+        self.calls.append(list(texts))
+        if self.probabilities is None:
+            return None
+        return np.tile(self.probabilities, (len(texts), 1))
+
+
+class FakeAsyncBERTClient:
+    """AsyncBERTIntentClient stand-in with the same fixed probabilities as CountingBERTClient"""
+
+    def __init__(self, probabilities=None):
+        self.probabilities = probabilities
+        self.calls = []
+        self.started = threading.Event()
+
+    async def get_batch_probabilities(self, texts):
+        self.calls.append(list(texts))
+        self.started.set()
+        await asyncio.sleep(0.01)
+        if self.probabilities is None:
+            return None
+        return np.tile(self.probabilities, (len(texts), 1))
+
+
+def peaked():
+    row = np.full(IntentMapping.NUM_INTENTS, 0.05)
+    row[IntentMapping.get_intent_index("ORDER_RELATED")] = 1.0
+    return row / row.sum()
+
+
+def uniform():
+    return np.full(IntentMapping.NUM_INTENTS, 1.0 / IntentMapping.NUM_INTENTS)
+
+
+def scores(*pairs):
+    row = np.zeros(IntentMapping.NUM_INTENTS)
+    for intent, score in pairs:
+        row[IntentMapping.get_intent_index(intent)] = score
+    return row
+
+
+@pytest.fixture
+def hybrid(nlp_models):
+    classifier = HybridIntentClassifier(cascade=True, cascade_threshold=0.9, cascade_margin=0.3)
+    classifier.bert_client = CountingBERTClient(uniform())
+    yield classifier
+    classifier._rule_executor.shutdown(wait=False)
+
+
+def test_is_decisive_needs_both_threshold_and_margin(hybrid):
+    matrix = np.stack([
+        scores(("RESERVATION_RELATED", 1.0), ("ORDER_RELATED", 0.2)),
+        scores(("RESERVATION_RELATED", 0.8)),
+        scores(("RESERVATION_RELATED", 1.0), ("ORDER_RELATED", 0.8)),
+        scores(("RESERVATION_RELATED", 0.9), ("ORDER_RELATED", 0.6)),
+    ])
+    assert hybrid._is_decisive(matrix).tolist() == [True, False, False, True]
+
+
+def test_undecided_records_the_skipped_rows(hybrid):
+    matrix = np.stack([scores(("PAYMENT_RELATED", 1.0)), scores(("PAYMENT_RELATED", 0.5)), scores()])
+    assert hybrid._undecided(matrix).tolist() == [False, True, True]
+    assert hybrid.cascade_stats.snapshot() == {"classified": 3, "skipped": 1, "skip_rate": 1 / 3}
+
+
+def test_batch_classify_sends_only_undecided_rows_to_bert(hybrid):
+    results = hybrid.batch_classify([DECISIVE, UNDECIDED, DECISIVE])
+
+    assert hybrid.bert_client.calls == [[UNDECIDED]]
+    assert hybrid.cascade_stats.snapshot()["skipped"] == 2
+    # The decisive rows keep their rule scores, the undecided one is fused with BERT
+    assert results[0]["RESERVATION_RELATED"] == 1.0
+    rule_only = hybrid.rule_based.classify_matrix([UNDECIDED])[0]
+    fused = IntentMapping.to_dict(0.3 * rule_only + 0.7 * uniform())
+    assert results[1] == pytest.approx(fused)
+
+
+def test_batch_classify_skips_bert_when_every_row_is_decisive(hybrid):
+    hybrid.batch_classify([DECISIVE])
+    assert hybrid.bert_client.calls == []
+
+
+def test_without_cascade_every_row_goes_to_bert(hybrid):
+    hybrid.cascade = False
+    hybrid.batch_classify([DECISIVE, UNDECIDED])
+    # BERT sees the preprocessed texts, without stopwords
+    assert hybrid.bert_client.calls == [["reserve table", UNDECIDED]]
+    assert hybrid.cascade_stats.snapshot()["classified"] == 0
+
+
+def test_evaluate_cascade_raises_without_bert(hybrid):
+    hybrid.bert_client = CountingBERTClient(None)
+    with pytest.raises(RuntimeError):
+        hybrid.evaluate_cascade([DECISIVE, UNDECIDED])
+
+
+def test_evaluate_cascade_reports_skips_and_agreement(hybrid):
+    report = hybrid.evaluate_cascade([DECISIVE, UNDECIDED])
+    assert report["skipped"] == 1
+    assert report["agreement_rate"] == 1.0
+
+
+@pytest_asyncio.fixture
+async def async_hybrid(nlp_models):
+    classifier = HybridIntentClassifier()
+    classifier.bert_client = CountingBERTClient(peaked())
+    classifier.bert_batcher.client = FakeAsyncBERTClient(peaked())
+    yield classifier
+    await classifier.aclose()
+
+
+TEXTS = ["reserve a table tonight", "can I order food", "how do we pay", "hello there"]
+
+
+@pytest.mark.asyncio
+async def test_sync_and_async_paths_fuse_identically(async_hybrid):
+    sync_scores = async_hybrid.batch_classify_matrix(TEXTS)
+    async_hybrid.cache.invalidate()
+    async_scores = await async_hybrid.abatch_classify_matrix(TEXTS)
+
+    np.testing.assert_allclose(async_scores, sync_scores)
+    rule_scores = async_hybrid.rule_based.classify_matrix(async_hybrid.preprocessor.preprocess_batch(TEXTS))
+    np.testing.assert_allclose(async_scores, 0.3 * rule_scores + 0.7 * peaked())
+    assert async_hybrid.bert_client.calls and async_hybrid.bert_batcher.client.calls
+
+
+@pytest.mark.asyncio
+async def test_async_path_falls_back_to_rules_without_bert(async_hybrid):
+    async_hybrid.bert_batcher.client = FakeAsyncBERTClient(None)
+    scores = await async_hybrid.abatch_classify_matrix(TEXTS)
+
+    rule_scores = async_hybrid.rule_based.classify_matrix(async_hybrid.preprocessor.preprocess_batch(TEXTS))
+    np.testing.assert_allclose(scores, rule_scores)
+
+
+@pytest.mark.asyncio
+async def test_rule_scoring_overlaps_the_bert_call(async_hybrid):
+    bert = async_hybrid.bert_batcher.client
+    rule_pass = async_hybrid._rule_pass
+    overlapped = []
+
+    def waiting_rule_pass(*args):
+        # Only returns True if the BERT request went out while rule scoring was still running
+        overlapped.append(bert.started.wait(timeout=2.0))
+        return rule_pass(*args)
+
+    async_hybrid._rule_pass = waiting_rule_pass
+    await async_hybrid.abatch_classify_matrix(TEXTS)
+    assert overlapped == [True]
+
+
+class CountingAnalyzer:
+    """Wraps RuleBasedIntentClassifier.analyze_batch and records the texts it analyzes"""
+
+    def __init__(self, analyze_batch):
+        self.analyze_batch = analyze_batch
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return self.analyze_batch(texts)
+
+
+@pytest.mark.asyncio
+async def test_cache_hit_skips_triton_and_analysis(async_hybrid):
+    analyzer = CountingAnalyzer(async_hybrid.rule_based.analyze_batch)
+    async_hybrid.rule_based.analyze_batch = analyzer
+    bert = async_hybrid.bert_batcher.client
+
+    first = await async_hybrid.abatch_classify_matrix(["can I order food"])
+    assert len(bert.calls) == len(analyzer.calls) == 1
+
+    # Different raw text, same preprocessed text
+    second = await async_hybrid.abatch_classify_matrix(["Can I order FOOD?"])
+    assert len(bert.calls) == len(analyzer.calls) == 1
+    np.testing.assert_allclose(second, first)
+
+    async_hybrid.batch_classify_matrix(["can I order food"])
+    assert async_hybrid.bert_client.calls == [] and len(analyzer.calls) == 1
+    assert async_hybrid.cache.stats()["hits"] == 2
+
+
+def test_intent_service_shares_its_cache_with_the_classifier(nlp_models):
+    from app.services.intent_service import IntentService
+
+    service = IntentService()
+    try:
+        assert service.classifier.cache is service.intent_cache
+    finally:
+        service.classifier._rule_executor.shutdown(wait=False)
+
+
+class FakeNegationParser:
+    """Async negation_parser that treats "not" as the only negation and records its calls"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    async def __call__(self, texts):
+        self.calls.append(list(texts))
+        if self.fail:
+            raise RuntimeError("executor down")
+        return ["not" in text.split() for text in texts]
+
+
+NEGATION_TEXTS = ["not reserve a table", "reserve a table", "hello there"]
+
+
+def expected_rule_scores(hybrid, texts):
+    processed = hybrid.preprocessor.preprocess_batch(texts)
+    analyses = [hybrid.rule_based.analyze(text, negated="not" in text.split()) for text in processed]
+    return hybrid.rule_based.classify_matrix(processed, analyses)
+
+
+@pytest.mark.asyncio
+async def test_negation_parse_goes_through_the_negation_parser(async_hybrid):
+    parser = FakeNegationParser()
+    async_hybrid.negation_parser = parser
+    async_hybrid.rule_based.negation_batch = lambda texts: pytest.fail("parsed in-process")
+    async_hybrid.bert_batcher.client = FakeAsyncBERTClient(None)
+
+    scores = await async_hybrid.abatch_classify_matrix(NEGATION_TEXTS)
+
+    # Only the texts that scored are parsed
+    assert parser.calls == [["not reserve table", "reserve table"]]
+    np.testing.assert_allclose(scores, expected_rule_scores(async_hybrid, NEGATION_TEXTS))
+    assert scores[0].max() < scores[1].max()
+
+    await async_hybrid.abatch_classify_matrix(NEGATION_TEXTS)
+    assert len(parser.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_negation_parser_falls_back_to_the_in_process_parse(async_hybrid):
+    async_hybrid.negation_parser = FakeNegationParser(fail=True)
+    async_hybrid.rule_based.negation_batch = lambda texts: ["not" in text.split() for text in texts]
+    async_hybrid.bert_batcher.client = FakeAsyncBERTClient(None)
+
+    scores = await async_hybrid.abatch_classify_matrix(NEGATION_TEXTS)
+    np.testing.assert_allclose(scores, expected_rule_scores(async_hybrid, NEGATION_TEXTS))
+
+
+def test_rule_only_matrix_skips_the_negation_parse(hybrid):
+    hybrid.rule_based.negation_batch = lambda texts: pytest.fail("parsed on the event loop")
+    scores = hybrid.rule_only_matrix(["not reserve a table"])
+    assert scores[0].max() == 1.0
+    assert hybrid.bert_client.calls == []
+
+
+def test_rule_only_matrix_reuses_cached_analyses(hybrid):
+    hybrid.rule_based.negation_batch = lambda texts: ["not" in text.split() for text in texts]
+    hybrid.batch_classify_matrix(["not reserve a table"])
+    hybrid.rule_based.negation_batch = lambda texts: pytest.fail("parsed on the event loop")
+
+    # The cached analysis carries the negation the full classification found
+    np.testing.assert_allclose(hybrid.rule_only_matrix(["not reserve a table"]),
+                               expected_rule_scores(hybrid, ["not reserve a table"]))
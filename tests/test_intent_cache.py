@@ -0,0 +1,71 @@
+import pytest
+
+from app.intent import intent_cache
+from app.intent.intent_cache import IntentCache
+
+
+@pytest.fixture(autouse=True)
+def cache_clock(monkeypatch, clock):
+    monkeypatch.setattr(intent_cache, "time", clock)
+
+
+def test_hit_and_miss():
+    cache = IntentCache()
+    assert cache.get("vegan dish", "1") is None
+    cache.put("vegan dish", "1", "scores", size=10)
+
+    assert cache.get("vegan dish", "1") == "scores"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_are_per_model_version():
+    cache = IntentCache()
+    cache.put("vegan dish", "1", "v1 scores", size=10)
+
+    assert cache.get("vegan dish", "2") is None
+    assert cache.get("vegan dish", "1") == "v1 scores"
+
+
+def test_expired_entries_miss(clock):
+    cache = IntentCache(ttl=60)
+    cache.put("vegan dish", "1", "scores", size=10)
+
+    clock.now += 61
+    assert cache.get("vegan dish", "1") is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = IntentCache(max_entries=2)
+    cache.put("a", "1", "A", size=10)
+    cache.put("b", "1", "B", size=10)
+    cache.get("a", "1")
+    cache.put("c", "1", "C", size=10)
+
+    assert cache.get("b", "1") is None
+    assert cache.get("a", "1") == "A"
+    assert cache.get("c", "1") == "C"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_budget_is_enforced():
+    cache = IntentCache(max_bytes=1000)
+    for text in ("a", "b", "c"):
+        cache.put(text, "1", text.upper(), size=400)
+
+    assert cache.stats()["bytes"] <= 1000
+    assert cache.get("a", "1") is None
+    # A value larger than the whole budget is not stored at all
+    cache.put("huge", "1", "H", size=2000)
+    assert cache.get("huge", "1") is None
+
+
+def test_invalidate_drops_everything():
+    cache = IntentCache()
+    cache.put("a", "1", "A", size=10)
+    cache.invalidate()
+
+    assert cache.get("a", "1") is None
+    assert cache.stats()["bytes"] == 0
@@ -0,0 +1,47 @@
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.routers.menu import MENU_PAGE_SORT, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    item = {"_id": ObjectId(), "popularity": 42}
+    query = decode_cursor(encode_cursor(item))
+
+    assert query == {"$or": [{"popularity": {"$lt": 42}}, {"popularity": None},
+                             {"popularity": 42, "_id": {"$lt": item["_id"]}}]}
+
+
+def test_cursor_after_missing_popularity_only_continues_among_missing():
+    item = {"_id": ObjectId()}
+    assert decode_cursor(encode_cursor(item)) == {"popularity": None, "_id": {"$lt": item["_id"]}}
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "bm90IGpzb24=", "WzEsICJub3QtYW4taWQiXQ=="])
+def test_invalid_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_pages_cover_every_dish_once_in_order():
+    mongomock = pytest.importorskip("mongomock")
+    dishes = mongomock.MongoClient().db.dishes
+    popularities = [5, 3, 3, 3, None, 9, None, 1, 3, 7]
+    for popularity in popularities:
+        dish = {"_id": ObjectId(), "name": "dish"}
+        if popularity is not None:
+            dish["popularity"] = popularity
+        dishes.insert_one(dish)
+    expected = [dish["_id"] for dish in dishes.find().sort(MENU_PAGE_SORT)]
+
+    seen, query = [], {}
+    while True:
+        page = list(dishes.find(query).sort(MENU_PAGE_SORT).limit(3))
+        seen.extend(dish["_id"] for dish in page)
+        if len(page) < 3:
+            break
+        query = decode_cursor(encode_cursor(page[-1]))
+
+    assert seen == expected
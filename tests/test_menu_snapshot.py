@@ -0,0 +1,63 @@
+from bson import ObjectId
+
+from app.services.menu_snapshot import MenuSnapshot
+
+NO_PREFERENCES = {"dietary": [], "cuisine": [], "price_range": None,
+                  "ingredients": {"include": [], "exclude": []}, "spiciness": None}
+
+
+def dish(name, **fields):
+    return {"_id": ObjectId(), "name": name, **fields}
+
+
+def preferences(**overrides):
+    return dict(NO_PREFERENCES, **overrides)
+
+
+def test_version_does_not_depend_on_load_order():
+    dishes = [dish("a", popularity=3), dish("b", popularity=1), dish("c")]
+
+    assert MenuSnapshot(dishes).version == MenuSnapshot(list(reversed(dishes))).version
+
+
+def test_version_changes_with_the_content():
+    dishes = [dish("a", price=10), dish("b", price=20)]
+    changed = [dict(dishes[0], price=11), dishes[1]]
+
+    assert MenuSnapshot(dishes).version != MenuSnapshot(changed).version
+
+
+def test_rows_are_ordered_by_popularity_with_missing_last():
+    dishes = [dish("none"), dish("low", popularity=1), dish("high", popularity=9)]
+
+    assert [d["name"] for d in MenuSnapshot(dishes).dishes] == ["high", "low", "none"]
+
+
+def test_filter_matches_scalar_and_array_cuisines():
+    snapshot = MenuSnapshot([dish("pasta", cuisine="italian", popularity=2),
+                             dish("fusion", cuisine=["italian", "japanese"], popularity=5),
+                             dish("sushi", cuisine="japanese", popularity=9)])
+
+    assert [d["name"] for d in snapshot.filter(preferences(cuisine=["italian"]))] == ["fusion", "pasta"]
+
+
+def test_filter_applies_every_preference():
+    snapshot = MenuSnapshot([
+        dish("veggie curry", dietaryFlags={"isVegetarian": True}, price=12, spiciness=2,
+             ingredients=["rice"], popularity=5),
+        dish("hot curry", dietaryFlags={"isVegetarian": True}, price=12, spiciness=5,
+             ingredients=["rice"], popularity=6),
+        dish("nut salad", dietaryFlags={"isVegetarian": True}, price=10, spiciness=0,
+             ingredients=["peanuts"], popularity=7),
+        dish("steak", price=40, spiciness=0, popularity=9),
+    ])
+
+    matches = snapshot.filter(preferences(dietary=["Vegetarian"], price_range="low", spiciness=3,
+                                          ingredients={"include": [], "exclude": ["peanuts"]}))
+    assert [d["name"] for d in matches] == ["veggie curry"]
+
+
+def test_filter_limit_keeps_the_most_popular():
+    snapshot = MenuSnapshot([dish(str(popularity), popularity=popularity) for popularity in range(20)])
+
+    assert [d["name"] for d in snapshot.filter(NO_PREFERENCES, limit=3)] == ["19", "18", "17"]
@@ -0,0 +1,103 @@
+from collections import namedtuple
+
+import pytest
+
+from app.utils.nlp_utils import PreferenceExtractor
+
+Entity = namedtuple("Entity", ["text", "label_"])
+NUTS = [Entity("Nuts", "FOOD")]
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    return PreferenceExtractor()
+
+
+# Queries the old per-token substring scan already got right; the phrase table must agree
+@pytest.mark.parametrize("text, field, expected", [
+    ("cheap vegan italian food", "dietary", ["Vegan"]),
+    ("cheap vegan italian food", "cuisine", ["italian"]),
+    ("cheap vegan italian food", "price_range", "low"),
+    ("something expensive and spicy for a birthday", "price_range", "high"),
+    ("something expensive and spicy for a birthday", "spiciness", 3),
+    ("something expensive and spicy for a birthday", "occasion", "birthday"),
+    ("Thai or Indian, halal please", "cuisine", ["thai", "indian"]),
+    ("Thai or Indian, halal please", "dietary", ["Halal"]),
+    ("mild, actually no, spicy", "spiciness", 3),
+    ("hello", "dietary", []),
+    ("hello", "price_range", None),
+])
+def test_unchanged_outputs(extractor, text, field, expected):
+    assert extractor.extract(text)[field] == expected
+
+
+def test_no_excludes_the_ingredients(extractor):
+    assert extractor.extract("no nuts", NUTS)["ingredients"] == {"include": [], "exclude": ["nuts"]}
+    assert extractor.extract("nuts", NUTS)["ingredients"] == {"include": ["nuts"], "exclude": []}
+
+
+@pytest.mark.parametrize("cue", ["without", "exclude", "excludes"])
+def test_exclusion_cues(extractor, cue):
+    assert extractor.extract(f"pasta {cue} nuts", NUTS)["ingredients"]["exclude"] == ["nuts"]
+
+
+@pytest.mark.parametrize("text", ["I know nuts are good", "nothing with nuts is bad"])
+def test_cues_inside_other_words_do_not_exclude(extractor, text):
+    # The old scan looked for "no" anywhere in the text and excluded these
+    assert extractor.extract(text, NUTS)["ingredients"] == {"include": ["nuts"], "exclude": []}
+
+
+def test_ingredients_come_only_from_food_and_product_entities(extractor):
+    entities = [Entity("Nuts", "FOOD"), Entity("Paris", "GPE"), Entity("Nuts", "PRODUCT")]
+    assert extractor.extract("nuts in paris", entities)["ingredients"]["include"] == ["nuts"]
+
+
+@pytest.mark.parametrize("text", ["gluten-free", "gluten free", "Gluten Free pizza"])
+def test_hyphenated_keys_match_with_or_without_the_hyphen(extractor, text):
+    # spaCy split "gluten-free" into three tokens, so the old scan never found it
+    assert extractor.extract(text)["dietary"] == ["GlutenFree"]
+
+
+@pytest.mark.parametrize("text, field, expected", [
+    # The old scan matched the "spicy" token alone and answered 3
+    ("very spicy curry", "spiciness", 4),
+    ("something mid-range", "price_range", "medium"),
+    ("a high-end dinner", "price_range", "high"),
+    ("dairy free and vegan", "dietary", ["DairyFree", "Vegan"]),
+])
+def test_multi_word_keys(extractor, text, field, expected):
+    assert extractor.extract(text)[field] == expected
+
+
+@pytest.mark.parametrize("text, field, expected", [
+    ("food for vegans", "dietary", ["Vegan"]),
+    ("we celebrate birthdays", "occasion", "birthday"),
+    ("good for dates", "occasion", "date"),
+])
+def test_plural_s_is_stripped(extractor, text, field, expected):
+    assert extractor.extract(text)[field] == expected
+
+
+@pytest.mark.parametrize("text, field, expected", [
+    # Substrings of other words matched before
+    ("any update on the menu", "occasion", None),
+    ("veganism aside", "dietary", []),
+    ("a businesslike place", "occasion", None),
+])
+def test_keys_match_whole_words(extractor, text, field, expected):
+    assert extractor.extract(text)[field] == expected
+
+
+def test_match_reports_the_exclusion_cue_and_keeps_first_mention_order(extractor):
+    found = extractor.match("No Italian, vegan, then Chinese or italian again")
+    assert found["exclude"] is True
+    assert found["cuisine"] == ["italian", "chinese"]
+    assert found["dietary"] == ["Vegan"]
+    assert extractor.match("italian")["exclude"] is False
+
+
+def test_extract_batch_matches_extract(extractor):
+    texts = ["no nuts", "cheap thai"]
+    assert extractor.extract_batch(texts, [NUTS, []]) == [extractor.extract("no nuts", NUTS),
+                                                         extractor.extract("cheap thai")]
+    assert extractor.extract_batch(texts) == [extractor.extract(text) for text in texts]
@@ -0,0 +1,74 @@
+from bson import ObjectId
+
+from app.services.prompt_builder import PromptBuilder, estimate_tokens
+
+RESTAURANT = {"name": "Trattoria", "cuisine": ["italian"]}
+PREFERENCES = {"dietary": ["Vegetarian"], "cuisine": [], "price_range": "low",
+               "ingredients": {"include": [], "exclude": ["mushroom"]}, "spiciness": None, "occasion": None}
+
+
+def menu(count: int, description: str = "A plate of food") -> list:
+    return [{"_id": ObjectId(), "name": f"Dish {i}", "price": 10 + i, "description": description}
+            for i in range(count)]
+
+
+def test_prompt_lists_menu_preferences_and_request():
+    prompt = PromptBuilder().build("something light", menu(2), RESTAURANT, PREFERENCES)
+
+    assert "Trattoria" in prompt.text and "italian" in prompt.text
+    assert "- Dish 0 ($10.00): A plate of food" in prompt.text
+    assert "dietary: Vegetarian; price: low; avoid: mushroom" in prompt.text
+    assert "Guest request: something light" in prompt.text
+    assert (prompt.items, prompt.dropped) == (2, 0)
+    assert prompt.tokens == estimate_tokens(prompt.text)
+
+
+def test_token_budget_drops_the_lowest_ranked_items():
+    builder = PromptBuilder(token_budget=200)
+    prompt = builder.build("dinner", menu(50), RESTAURANT, PREFERENCES)
+
+    assert prompt.tokens <= 200
+    assert prompt.items + prompt.dropped == 50
+    assert prompt.dropped > 0
+    assert "- Dish 0 " in prompt.text
+    assert "- Dish 49 " not in prompt.text
+
+
+def test_long_descriptions_are_cut_at_a_word():
+    prompt = PromptBuilder(description_chars=20).build(
+        "dinner", menu(1, "slow cooked ragu with fresh pasta and parmesan"), RESTAURANT, PREFERENCES)
+
+    assert "- Dish 0 ($10.00): slow cooked ragu..." in prompt.text
+
+
+def test_wanted_ingredients_rank_first():
+    items = menu(3)
+    items[2]["ingredients"] = ["basil"]
+    preferences = dict(PREFERENCES, ingredients={"include": ["basil"], "exclude": []})
+
+    prompt = PromptBuilder().build("dinner", items, RESTAURANT, preferences)
+
+    assert prompt.text.index("Dish 2") < prompt.text.index("Dish 0") < prompt.text.index("Dish 1")
+
+
+def test_menu_lines_are_cached_per_menu_version():
+    builder = PromptBuilder()
+    items = menu(1)
+    restaurant_id = ObjectId()
+    builder.build("dinner", items, RESTAURANT, PREFERENCES, restaurant_id=restaurant_id, menu_version="v1")
+
+    # A cached line is reused while the version is unchanged, and rebuilt for a new version
+    items[0]["description"] = "changed"
+    same = builder.build("dinner", items, RESTAURANT, PREFERENCES, restaurant_id=restaurant_id, menu_version="v1")
+    new = builder.build("dinner", items, RESTAURANT, PREFERENCES, restaurant_id=restaurant_id, menu_version="v2")
+
+    assert "A plate of food" in same.text
+    assert "changed" in new.text
+
+
+def test_prompt_prefix_is_the_same_for_every_guest():
+    builder = PromptBuilder()
+    first = builder.build("pasta please", menu(3), RESTAURANT, PREFERENCES)
+    second = builder.build("something vegan", menu(3), RESTAURANT, PREFERENCES)
+
+    assert first.text.split("\nGuest preferences")[0] == second.text.split("\nGuest preferences")[0]
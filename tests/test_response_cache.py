@@ -0,0 +1,117 @@
+import json
+
+import pytest
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import menu
+from app.services.menu_snapshot import MenuSnapshot
+from app.utils.response_cache import ResponseCache, etag_matches, json_dumps
+
+
+def test_body_is_encoded_once_per_version():
+    cache = ResponseCache()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return [{"name": "Pasta"}]
+
+    first = cache.get_or_encode("menu", "v1", build)
+    again = cache.get_or_encode("menu", "v1", build)
+    changed = cache.get_or_encode("menu", "v2", lambda: [{"name": "Pizza"}])
+
+    assert len(builds) == 1
+    assert again == first
+    assert json.loads(first.body) == [{"name": "Pasta"}]
+    assert changed.etag != first.etag
+    assert cache.stats()["hits"] == 1
+
+
+def test_same_body_gets_the_same_etag():
+    cache = ResponseCache()
+
+    assert cache.get_or_encode("a", "v1", lambda: [1, 2]).etag == cache.get_or_encode("b", "v7", lambda: [1, 2]).etag
+
+
+def test_least_recently_used_body_is_evicted():
+    cache = ResponseCache(max_entries=1)
+    cache.get_or_encode("a", "v1", lambda: 1)
+    cache.get_or_encode("b", "v1", lambda: 2)
+
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["evictions"] == 1
+
+
+@pytest.mark.parametrize("header, matches", [
+    (None, False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"other", "abc"', True),
+    ('"other"', False),
+    ("*", True),
+])
+def test_etag_matches(header, matches):
+    assert etag_matches(header, '"abc"') is matches
+
+
+def test_json_dumps_is_compact_utf8():
+    assert json_dumps({"name": "Crème brûlée", "price": 7.5}) == '{"name":"Crème brûlée","price":7.5}'.encode()
+
+
+class SnapshotStore:
+    def __init__(self, snapshot: MenuSnapshot):
+        self.snapshot = snapshot
+
+    async def get(self, restaurant_id):
+        return self.snapshot
+
+
+@pytest.fixture
+def client(monkeypatch):
+    dishes = [
+        {"_id": ObjectId(), "name": "Lasagna", "description": "Baked", "price": 12.0, "image": "l.jpg",
+         "cuisine": "italian", "popularity": 5},
+        {"_id": ObjectId(), "name": "Ramen Carbonara", "description": "Fusion", "price": 14.0, "image": "r.jpg",
+         "cuisine": ["italian", "japanese"], "popularity": 8},
+        {"_id": ObjectId(), "name": "Sushi", "description": "Raw", "price": 20.0, "image": "s.jpg",
+         "cuisine": "japanese", "popularity": 9},
+    ]
+    store = SnapshotStore(MenuSnapshot(dishes))
+    monkeypatch.setattr(menu, "menu_snapshots", store)
+    monkeypatch.setattr(menu, "response_cache", ResponseCache())
+
+    app = FastAPI()
+    app.include_router(menu.router)
+    test_client = TestClient(app)
+    test_client.store = store
+    return test_client
+
+
+def test_menu_includes_dishes_with_several_cuisines(client):
+    response = client.get(f"/api/menu/{ObjectId()}/italian")
+
+    assert response.status_code == 200
+    assert [item["name"] for item in response.json()] == ["Ramen Carbonara", "Lasagna"]
+
+
+def test_unknown_cuisine_is_a_404(client):
+    assert client.get(f"/api/menu/{ObjectId()}/greek").status_code == 404
+
+
+def test_matching_etag_gets_a_304_until_the_menu_changes(client):
+    url = f"/api/menu/{ObjectId()}/japanese"
+    first = client.get(url)
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "no-cache"
+
+    revalidated = client.get(url, headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+
+    dishes = [dict(dish, price=dish["price"] + 1) for dish in client.store.snapshot.dishes]
+    client.store.snapshot = MenuSnapshot(dishes)
+    changed = client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
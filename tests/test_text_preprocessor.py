@@ -0,0 +1,42 @@
+import pytest
+
+from app.intent.text_preprocessor import TextPreprocessor
+from app.utils.model_registry import model_registry
+from benchmarks.intent_bench import load_corpus
+
+EDGE_CASES = [
+    "",
+    "   \t\n ",
+    "I can't eat nuts, don't add them!",
+    "I'd like what we're having; they'll love it",
+    "cannot CANNOT Cannot",
+    "gonna wanna gotta gimme lemme",
+    "I'm gonna order... and you?",
+    "hello,world.how-are you?!",
+    "mother-in-law's favourite dish",
+    "$12.99 or 15% off -- 2-for-1 deals",
+    "\"quoted\" 'single' `backtick` (parens) [brackets] {braces}",
+    "café naïve jalapeño crème brûlée",
+    "vegan!!! gluten-free??? spicy...",
+    "o'clock rock'n'roll y'all",
+    "e.g. i.e. etc. U.S.A. Mr. Smith",
+    "tab\tseparated\nnew line",
+]
+
+
+@pytest.fixture(scope="module")
+def preprocessor():
+    try:
+        model_registry.nltk_tokenizer()
+    except LookupError as e:
+        pytest.skip(f"NLTK data not installed: {e}")
+    return TextPreprocessor(mode="fast")
+
+
+def test_fast_mode_matches_word_tokenize_on_the_corpus(preprocessor):
+    assert preprocessor.compare_with_nltk(load_corpus()) == []
+
+
+@pytest.mark.parametrize("text", EDGE_CASES)
+def test_fast_mode_matches_word_tokenize_on_edge_cases(preprocessor, text):
+    assert preprocessor.compare_with_nltk([text]) == []